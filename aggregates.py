@@ -0,0 +1,487 @@
+import json
+import os
+
+import pandas as pd
+
+import cohorts
+import excel_reader
+import instrument
+import memo
+import upload_cache
+from data_processor import CUSTOMER_ID_COL, ORDER_DATE_COL, PRODUCT_COL, QUANTITY_COL, REGION_COL, clean_sales_data, day_start, prepare, read_sales_file
+
+# Bump when the cube layout or cleaning rules change so persisted cubes are rebuilt
+AGGREGATES_VERSION = 6
+
+# Files at least this large are never loaded whole: they are read in CHUNK_ROWS-row
+# chunks and each chunk is folded into running aggregates, so peak memory is bounded
+# by the chunk size plus the (small) cube rather than by the file size.
+STREAMING_THRESHOLD_BYTES = 200 * 1024 * 1024
+CHUNK_ROWS = 250_000
+# An .xlsx file is a zip archive, and its cells load as Python objects: a workbook
+# takes many times its file size in memory, so it streams from a smaller size.
+EXCEL_SIZE_FACTOR = 10
+
+# In-process memo of prepared (cleaned) frames and aggregates, keyed by content hash
+# and shared by every session of this server. Reruns triggered by widgets reuse
+# them instead of re-reading and re-cleaning the upload.
+PREPARED_CACHE_BYTES = int(os.environ.get("BIZPULSE_PREPARED_CACHE_MB", "512")) * 1024 * 1024
+AGGREGATES_CACHE_BYTES = int(os.environ.get("BIZPULSE_AGGREGATES_CACHE_MB", "64")) * 1024 * 1024
+prepared_cache = memo.LRUCache(PREPARED_CACHE_BYTES)
+aggregates_cache = memo.LRUCache(AGGREGATES_CACHE_BYTES)
+
+# Dimensions of the revenue cube; a dimension missing from the upload is stored as
+# a single "Unknown" member and flagged in the metadata so the dashboard can skip it.
+CUBE_DIMENSIONS = ["Month", PRODUCT_COL, REGION_COL]
+UNKNOWN = "Unknown"
+
+# Revenue over time at finer grain than the cube, for daily/weekly charts
+GRANULARITIES = ["Daily", "Weekly", "Monthly"]
+
+
+class Aggregates:
+    """Per-file summaries the dashboard renders from.
+
+    cube      -- Month x Product x Region rows with "Total Revenue", "Quantity" and "Orders"
+    customers -- "Customer Id" with its "Orders" count, or None if the file has no customer column
+    meta      -- row counts dropped during cleaning and which optional columns were present
+    daily     -- "Date" with its "Total Revenue" and "Orders", or None if the file has no dates
+    activity  -- "Customer Id" x "Month" with "Total Revenue" and "Orders", or None without
+                 customers or dates
+    cohort_customers, cohort_matrix -- the cohort state kept with activity (see
+                 cohorts.py); derived from activity on first use if not given
+    """
+
+    def __init__(self, cube, customers, meta, daily=None, activity=None, cohort_customers=None, cohort_matrix=None):
+        self.cube = cube
+        self.customers = customers
+        self.meta = meta
+        self.daily = daily
+        self.activity = activity
+        self.cohort_customers = cohort_customers
+        self.cohort_matrix = cohort_matrix
+
+    @property
+    def nbytes(self):
+        size = self.cube.memory_usage(index=True, deep=True).sum()
+        for frame in (self.customers, self.daily, self.activity, self.cohort_customers, self.cohort_matrix):
+            if frame is not None:
+                size += frame.memory_usage(index=True, deep=True).sum()
+        return int(size)
+
+    def cohort_state(self):
+        """(cohort_customers, cohort_matrix), or (None, None) without activity."""
+        if self.activity is not None and self.cohort_customers is None:
+            self.cohort_customers, self.cohort_matrix = cohorts.build_state(self.activity)
+        return self.cohort_customers, self.cohort_matrix
+
+    @property
+    def total_revenue(self):
+        return float(self.cube["Total Revenue"].sum())
+
+    @property
+    def total_orders(self):
+        return int(self.cube["Orders"].sum())
+
+    @property
+    def average_order_value(self):
+        orders = self.total_orders
+        return self.total_revenue / orders if orders else 0.0
+
+    def revenue_by(self, dimension):
+        with instrument.span(f"groupby:{dimension}"):
+            return self.cube.groupby(dimension, observed=True)["Total Revenue"].sum().reset_index()
+
+    def monthly_revenue(self):
+        return self.revenue_by("Month").sort_values("Month")
+
+    def top_products(self, n=5):
+        return self.revenue_by(PRODUCT_COL).sort_values("Total Revenue", ascending=False).head(n)
+
+    def region_revenue(self):
+        return self.revenue_by(REGION_COL)
+
+    def revenue_over_time(self, granularity="Monthly"):
+        """Revenue per period as ("Period", "Total Revenue"), sorted by period.
+
+        Daily and Weekly (weeks starting Monday) need the daily series; without it
+        the monthly cube is used.
+        """
+        if granularity == "Monthly" or self.daily is None:
+            return self.monthly_revenue().rename(columns={"Month": "Period"}).reset_index(drop=True)
+        with instrument.span(f"resample:{granularity}"):
+            series = self.daily.set_index("Date")["Total Revenue"].sort_index()
+            if granularity == "Weekly":
+                series = series.resample("W-MON", label="left", closed="left").sum()
+            return series.rename_axis("Period").reset_index()
+
+    def customer_split(self):
+        """Returns (new_customers, repeat_customers)."""
+        orders = self.customers["Orders"]
+        return int((orders == 1).sum()), int((orders > 1).sum())
+
+
+def build_aggregates(df, report=None):
+    """Builds the cube from a frame already cleaned by data_processor.clean_sales_data."""
+    meta = {
+        "version": AGGREGATES_VERSION,
+        "rows": len(df),
+        "has_product": PRODUCT_COL in df.columns,
+        "has_region": REGION_COL in df.columns,
+        "has_customer": CUSTOMER_ID_COL in df.columns,
+    }
+    if report:
+        meta.update({k: report[k] for k in ("dropped_numeric", "dropped_dates", "has_dates") if k in report})
+
+    keys = {}
+    for dim in CUBE_DIMENSIONS:
+        keys[dim] = df[dim] if dim in df.columns else pd.Series(UNKNOWN, index=df.index)
+    frame = pd.DataFrame({
+        **keys,
+        "Total Revenue": df["Total Revenue"],
+        "Quantity": df[QUANTITY_COL],
+    })
+    with instrument.span("groupby:cube"):
+        cube = (frame.groupby(CUBE_DIMENSIONS, dropna=False, observed=True, sort=False)
+                     .agg(**{"Total Revenue": ("Total Revenue", "sum"),
+                             "Quantity": ("Quantity", "sum"),
+                             "Orders": ("Total Revenue", "size")})
+                     .reset_index())
+
+    customers = None
+    if meta["has_customer"]:
+        with instrument.span("groupby:customers"):
+            counts = df[CUSTOMER_ID_COL].value_counts()
+            counts = counts[counts > 0] # categorical value_counts also lists unused categories
+            customers = counts.rename("Orders").rename_axis(CUSTOMER_ID_COL).reset_index()
+
+    daily = None
+    if meta.get("has_dates", True) and ORDER_DATE_COL in df.columns:
+        with instrument.span("groupby:daily"):
+            daily = (pd.DataFrame({"Date": day_start(df[ORDER_DATE_COL]), "Total Revenue": df["Total Revenue"]})
+                       .groupby("Date", sort=True)
+                       .agg(**{"Total Revenue": ("Total Revenue", "sum"), "Orders": ("Total Revenue", "size")})
+                       .reset_index())
+    meta["has_daily"] = daily is not None
+
+    activity = None
+    if meta["has_customer"] and daily is not None:
+        with instrument.span("groupby:activity"):
+            activity = (pd.DataFrame({CUSTOMER_ID_COL: df[CUSTOMER_ID_COL], "Month": df["Month"],
+                                      "Total Revenue": df["Total Revenue"]})
+                          .groupby([CUSTOMER_ID_COL, "Month"], observed=True, sort=False)
+                          .agg(**{"Total Revenue": ("Total Revenue", "sum"), "Orders": ("Total Revenue", "size")})
+                          .reset_index())
+    meta["has_activity"] = activity is not None
+
+    return Aggregates(cube, customers, meta, daily, activity)
+
+
+def combine_aggregates(parts):
+    """Folds several Aggregates (e.g. per-chunk or per-file) into one."""
+    parts = [p for p in parts if p is not None]
+    if len(parts) == 1:
+        return parts[0]
+    cube = (pd.concat([p.cube for p in parts], ignore_index=True)
+              .groupby(CUBE_DIMENSIONS, dropna=False, observed=True, sort=False)
+              .sum()
+              .reset_index())
+
+    customer_parts = [p.customers for p in parts if p.customers is not None]
+    customers = None
+    if customer_parts:
+        customers = (pd.concat(customer_parts, ignore_index=True)
+                       .groupby(CUSTOMER_ID_COL, dropna=False, observed=True, sort=False)["Orders"]
+                       .sum()
+                       .reset_index())
+
+    daily_parts = [p.daily for p in parts if p.daily is not None]
+    daily = None
+    if daily_parts:
+        daily = (pd.concat(daily_parts, ignore_index=True)
+                   .groupby("Date", sort=True)[["Total Revenue", "Orders"]]
+                   .sum()
+                   .reset_index())
+
+    # Activity is folded into the largest part's cohort state, so only the customers
+    # of the smaller parts are regrouped (e.g. one upload into the cumulative total)
+    activity_parts = [p for p in parts if p.activity is not None]
+    activity = cohort_customers = cohort_matrix = None
+    if activity_parts:
+        base = max(activity_parts, key=lambda p: len(p.activity))
+        activity = base.activity
+        cohort_customers, cohort_matrix = base.cohort_state()
+        for p in activity_parts:
+            if p is not base:
+                activity, cohort_customers, cohort_matrix = cohorts.apply_activity(
+                    activity, cohort_customers, cohort_matrix, p.activity)
+
+    meta = {"version": AGGREGATES_VERSION}
+    for key in ("rows", "dropped_numeric", "dropped_dates"):
+        meta[key] = sum(p.meta.get(key, 0) for p in parts)
+    for key in ("has_product", "has_region", "has_customer", "has_dates"):
+        meta[key] = any(p.meta.get(key, False) for p in parts)
+    meta["has_daily"] = daily is not None
+    meta["has_activity"] = activity is not None
+    return Aggregates(cube, customers, meta, daily, activity, cohort_customers, cohort_matrix)
+
+
+def subtract_aggregates(total, part):
+    """Removes one part's contribution from a combined Aggregates (inverse of combine)."""
+    negated_cube = part.cube.copy()
+    for col in ("Total Revenue", "Quantity", "Orders"):
+        negated_cube[col] = -negated_cube[col]
+    negated_customers = None
+    if part.customers is not None:
+        negated_customers = part.customers.assign(Orders=-part.customers["Orders"])
+    negated_daily = None
+    if part.daily is not None:
+        negated_daily = part.daily.assign(**{"Total Revenue": -part.daily["Total Revenue"], "Orders": -part.daily["Orders"]})
+    negated_activity = None
+    if part.activity is not None:
+        negated_activity = part.activity.assign(**{"Total Revenue": -part.activity["Total Revenue"], "Orders": -part.activity["Orders"]})
+    result = combine_aggregates([total, Aggregates(negated_cube, negated_customers, {}, negated_daily, negated_activity)])
+
+    # Groups whose orders all came from the removed part are dropped entirely
+    cube = result.cube[result.cube["Orders"] > 0].reset_index(drop=True)
+    customers = result.customers
+    if customers is not None:
+        customers = customers[customers["Orders"] > 0].reset_index(drop=True)
+    daily = result.daily
+    if daily is not None:
+        daily = daily[daily["Orders"] > 0].reset_index(drop=True)
+    # Emptied customer-months are already dropped by the cohort state update
+    meta = dict(total.meta)
+    for key in ("rows", "dropped_numeric", "dropped_dates"):
+        meta[key] = meta.get(key, 0) - part.meta.get(key, 0)
+    return Aggregates(cube, customers, meta, daily, result.activity, result.cohort_customers, result.cohort_matrix)
+
+
+def streams(file_path):
+    """True if the upload is too large to load whole and goes through build_aggregates_streaming."""
+    size = os.path.getsize(file_path)
+    if excel_reader.is_excel(file_path):
+        size *= EXCEL_SIZE_FACTOR
+    return size >= STREAMING_THRESHOLD_BYTES
+
+
+def build_aggregates_streaming(file_path, chunk_rows=CHUNK_ROWS, date_format=None, progress=None):
+    """Builds aggregates from a CSV or .xlsx upload of any size, one chunk at a time.
+
+    Each chunk is cleaned on its own and folded into the running totals straight
+    away, so at most one raw chunk is held in memory. The date format detected on
+    the first chunk is reused for the rest. `progress`, if given, is called with
+    the fraction of the file read so far. Returns (aggregates, date_format).
+    """
+    running = None
+    for chunk, fraction in _raw_chunks(file_path, chunk_rows):
+        with instrument.span("clean"):
+            chunk, report = clean_sales_data(chunk, date_format)
+        if report["error"]:
+            raise ValueError(report["error"])
+        date_format = report["date_format"]
+        running = combine_aggregates([running, build_aggregates(chunk, report)])
+        if progress and fraction is not None:
+            progress(fraction)
+    if running is None:
+        raise ValueError("The uploaded file has no rows.")
+    return running, date_format
+
+
+def _raw_chunks(file_path, chunk_rows):
+    """Yields (raw chunk, fraction of the file read so far) for a CSV or .xlsx upload."""
+    if excel_reader.is_excel(file_path):
+        yield from excel_reader.iter_excel_chunks(file_path, chunk_rows)
+        return
+    size = os.path.getsize(file_path) or 1
+    with open(file_path, "rb") as fh:
+        # Read every column as text so a column's type cannot change from chunk to chunk
+        # (e.g. numeric Customer IDs in one chunk, "C-001" style IDs in the next)
+        for chunk in pd.read_csv(fh, chunksize=chunk_rows, dtype=str):
+            yield chunk, min(fh.tell() / size, 1.0)
+
+
+def build_file_aggregates(file_path, date_format=None, progress=None):
+    """Builds aggregates for a CSV or .xlsx file with no caching; returns (aggregates, date_format).
+
+    Used by front ends that run outside the app (batch.py): nothing is written
+    next to the input file. Large files go through the streaming builder.
+    Raises ValueError if the file cannot be cleaned.
+    """
+    if streams(file_path):
+        return build_aggregates_streaming(file_path, date_format=date_format, progress=progress)
+    with instrument.span("file_load"):
+        raw = read_sales_file(file_path)
+    with instrument.span("clean"):
+        prepared = prepare(raw, date_format)
+    return build_aggregates(prepared.df, prepared.report), prepared.report["date_format"]
+
+
+def kpi_summary(aggs, top_n=5):
+    """The dashboard's KPIs as plain JSON-serializable data (no Streamlit needed).
+
+    Sections whose columns are missing from the upload are None, matching the
+    charts show_visuals skips.
+    """
+    meta = aggs.meta
+    monthly = None
+    if meta.get("has_dates", True):
+        monthly = [{"month": month.strftime("%Y-%m"), "revenue": float(revenue)}
+                   for month, revenue in aggs.monthly_revenue().itertuples(index=False)
+                   if not pd.isna(month)]
+    top_products = None
+    if meta["has_product"]:
+        top_products = [{"product": str(product), "revenue": float(revenue)}
+                        for product, revenue in aggs.top_products(top_n).itertuples(index=False)]
+    regions = None
+    if meta["has_region"]:
+        regions = [{"region": str(region), "revenue": float(revenue)}
+                   for region, revenue in aggs.region_revenue().itertuples(index=False)]
+    customers = None
+    if meta["has_customer"]:
+        new_customers, repeat_customers = aggs.customer_split()
+        customers = {"new": new_customers, "repeat": repeat_customers}
+    return {
+        "total_revenue": aggs.total_revenue,
+        "total_orders": aggs.total_orders,
+        "average_order_value": aggs.average_order_value,
+        "monthly_revenue": monthly,
+        "top_products": top_products,
+        "region_revenue": regions,
+        "customers": customers,
+        "rows": int(meta.get("rows", 0)),
+        "dropped_numeric": int(meta.get("dropped_numeric", 0)),
+        "dropped_dates": int(meta.get("dropped_dates", 0)),
+    }
+
+
+# --- Persistence ---
+# An aggregate set is up to seven files sharing a path prefix. Per-upload sets live
+# next to the upload's Parquet sidecar, keyed by the same content hash:
+#   .cache/<sha256>.cube.parquet, .cache/<sha256>.customers.parquet,
+#   .cache/<sha256>.daily.parquet, .cache/<sha256>.activity.parquet,
+#   .cache/<sha256>.cohort_customers.parquet, .cache/<sha256>.cohort_matrix.parquet,
+#   .cache/<sha256>.meta.json
+
+def _paths(prefix):
+    return {
+        "cube": f"{prefix}.cube.parquet",
+        "customers": f"{prefix}.customers.parquet",
+        "daily": f"{prefix}.daily.parquet",
+        "activity": f"{prefix}.activity.parquet",
+        "cohort_customers": f"{prefix}.cohort_customers.parquet",
+        "cohort_matrix": f"{prefix}.cohort_matrix.parquet",
+        "meta": f"{prefix}.meta.json",
+    }
+
+
+def write_aggregates(aggs, prefix):
+    paths = _paths(prefix)
+    os.makedirs(os.path.dirname(paths["meta"]), exist_ok=True)
+    upload_cache.write_frame(aggs.cube, paths["cube"])
+    if aggs.customers is not None:
+        upload_cache.write_frame(aggs.customers, paths["customers"])
+    if aggs.daily is not None:
+        upload_cache.write_frame(aggs.daily, paths["daily"])
+    if aggs.activity is not None:
+        upload_cache.write_frame(aggs.activity, paths["activity"])
+        cohort_customers, cohort_matrix = aggs.cohort_state()
+        upload_cache.write_frame(cohort_customers, paths["cohort_customers"])
+        upload_cache.write_frame(cohort_matrix, paths["cohort_matrix"])
+    # Meta is written last: its presence marks the set as complete
+    upload_cache.write_json(aggs.meta, paths["meta"])
+
+
+def read_aggregates(prefix):
+    """Loads an aggregate set written by write_aggregates, or None if absent/outdated."""
+    paths = _paths(prefix)
+    try:
+        with open(paths["meta"], "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != AGGREGATES_VERSION:
+            return None
+        cube = pd.read_parquet(paths["cube"])
+        customers = pd.read_parquet(paths["customers"]) if meta["has_customer"] else None
+        daily = pd.read_parquet(paths["daily"]) if meta.get("has_daily") else None
+        activity = cohort_customers = cohort_matrix = None
+        if meta.get("has_activity"):
+            activity = pd.read_parquet(paths["activity"])
+            cohort_customers = pd.read_parquet(paths["cohort_customers"])
+            cohort_matrix = pd.read_parquet(paths["cohort_matrix"])
+    except (FileNotFoundError, json.JSONDecodeError, ImportError):
+        return None
+    return Aggregates(cube, customers, meta, daily, activity, cohort_customers, cohort_matrix)
+
+
+def delete_aggregates(prefix):
+    for path in _paths(prefix).values():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _file_prefix(file_path, digest):
+    return os.path.join(os.path.dirname(upload_cache.sidecar_path(file_path, digest)), digest)
+
+
+def save_aggregates(aggs, file_path, digest):
+    write_aggregates(aggs, _file_prefix(file_path, digest))
+
+
+def load_saved_aggregates(file_path, digest):
+    return read_aggregates(_file_prefix(file_path, digest))
+
+
+def get_prepared(file_path):
+    """Returns the memoized PreparedFrame for an upload (not for streaming-size files).
+
+    Raises ValueError if the file cannot be cleaned (e.g. missing price/quantity columns).
+    """
+    digest = upload_cache.content_hash(file_path)
+
+    def compute():
+        raw = upload_cache.load_upload(file_path)
+        with instrument.span("clean"):
+            prepared = prepare(raw, upload_cache.get_file_meta(file_path, "date_format"))
+        if prepared.report["date_format"]:
+            upload_cache.set_file_meta(file_path, date_format=prepared.report["date_format"])
+        return prepared
+
+    return prepared_cache.get_or_compute(upload_cache.cache_key(file_path, digest), compute)
+
+
+def get_aggregates(file_path, progress=None):
+    """Returns the aggregates for an uploaded file, computing them once per file content.
+
+    `progress` is passed to the streaming builder for large files.
+    Raises ValueError if the file cannot be cleaned (e.g. missing price/quantity columns).
+    """
+    digest = upload_cache.content_hash(file_path)
+    return aggregates_cache.get_or_compute(upload_cache.cache_key(file_path, digest),
+                                           lambda: _load_or_build_aggregates(file_path, digest, progress))
+
+
+def is_computed(file_path):
+    """True if the file's aggregates are ready without any parsing (memo or disk)."""
+    digest = upload_cache.content_hash(file_path)
+    return aggregates_cache.get(upload_cache.cache_key(file_path, digest)) is not None or os.path.exists(_paths(_file_prefix(file_path, digest))["meta"])
+
+
+def _load_or_build_aggregates(file_path, digest, progress=None):
+    aggs = load_saved_aggregates(file_path, digest)
+    if aggs is not None:
+        return aggs
+
+    if streams(file_path):
+        aggs, date_format = build_aggregates_streaming(file_path, date_format=upload_cache.get_file_meta(file_path, "date_format"), progress=progress)
+        if date_format:
+            upload_cache.set_file_meta(file_path, date_format=date_format)
+    else:
+        prepared = get_prepared(file_path)
+        aggs = build_aggregates(prepared.df, prepared.report)
+    try:
+        save_aggregates(aggs, file_path, digest)
+    except ImportError:
+        pass # No Parquet support: aggregates are rebuilt on the next load
+    return aggs
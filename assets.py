@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import threading
+
+# Static files are read, minified and kept in memory once per server
+# process; each script run only re-sends the cached string instead of re-reading
+# files or rebuilding large literals.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+_cache = {} # (name, kind, mtime_ns) -> prepared content
+_lock = threading.Lock()
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(css):
+    css = _CSS_COMMENT.sub("", css)
+    css = _CSS_SPACE.sub(r"\1", css)
+    css = re.sub(r":\s+", ":", css) # only after ':' so selectors like "a :hover" keep their meaning
+    return re.sub(r"\s+", " ", css).strip()
+
+
+def _load(name, kind, prepare):
+    path = os.path.join(STATIC_DIR, name)
+    key = (name, kind, os.stat(path).st_mtime_ns) # editing the file picks up the change
+    with _lock:
+        if key not in _cache:
+            with open(path, "r", encoding="utf-8") as f:
+                _cache[key] = prepare(f.read())
+        return _cache[key]
+
+
+def css(name):
+    """Minified contents of static/<name>, read once per process."""
+    return _load(name, "css", minify_css)
+
+
+def style_tag(name):
+    """A ready-to-emit <style> block for st.markdown(..., unsafe_allow_html=True)."""
+    return _load(name, "style_tag", lambda text: f"<style>{minify_css(text)}</style>")
+
+
+# --- Images ---
+# Source images (repo root) are resized for their display size, never upscaled, and
+# written once to static/build/ under a content-hashed name such as
+# static/build/logo.360x240.3f2a9c1e04b7.png. With server.enableStaticServing
+# (.streamlit/config.toml) Streamlit serves them at app/static/build/..., so a
+# browser downloads the logo once and afterwards only revalidates it (ETag) instead
+# of receiving it base64-inlined in every page. Because changed content gets a new
+# name, a proxy in front of the app can mark app/static/build/* immutable.
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(STATIC_DIR, "build")
+HASH_CHARS = 12
+
+
+def _resize(data, max_size):
+    try:
+        from PIL import Image
+    except ImportError:
+        return data # Pillow unavailable: serve the original
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width <= max_size[0] and image.height <= max_size[1]:
+            return data
+        image.thumbnail(max_size, Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format=image.format or "PNG", optimize=True)
+    return out.getvalue()
+
+
+def _build_image(name, max_size):
+    with open(os.path.join(SOURCE_DIR, name), "rb") as f:
+        data = f.read()
+    if max_size:
+        data = _resize(data, max_size)
+    stem, ext = os.path.splitext(name)
+    variant = f"{stem}.{max_size[0]}x{max_size[1]}" if max_size else stem
+    digest = hashlib.sha256(data).hexdigest()[:HASH_CHARS]
+    path = os.path.join(BUILD_DIR, f"{variant}.{digest}{ext}")
+    if not os.path.exists(path):
+        os.makedirs(BUILD_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        # Drop older builds of the same variant
+        for old in os.listdir(BUILD_DIR):
+            if old.startswith(f"{variant}.") and old.endswith(ext) and old != os.path.basename(path) \
+                    and len(old) == len(os.path.basename(path)):
+                os.remove(os.path.join(BUILD_DIR, old))
+    return path
+
+
+def image(name, max_size=None):
+    """Path of the built (resized, content-hashed) copy of a source image; built once per change."""
+    source = os.path.join(SOURCE_DIR, name)
+    key = (name, ("image", max_size), os.stat(source).st_mtime_ns)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = _build_image(name, max_size)
+        return _cache[key]
+
+
+def static_url(path):
+    """URL Streamlit's static file serving exposes a file under static/ at."""
+    return "app/static/" + os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+
+
+def image_tag(name, max_size=None, alt="", inline=False):
+    """An <img> tag for a source image, by URL, or as a data URI when inline=True
+    (for deployments without static serving; the resized copy is still used)."""
+    path = image(name, max_size)
+    key = (path, ("image_tag", alt, inline), 0) # path already encodes the content hash
+    with _lock:
+        if key not in _cache:
+            if inline:
+                mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                with open(path, "rb") as f:
+                    src = f"data:{mime};base64,{base64.b64encode(f.read()).decode()}"
+            else:
+                src = static_url(path)
+            _cache[key] = f"<img src='{src}' alt='{alt}'>"
+        return _cache[key]
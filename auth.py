@@ -1,48 +1,58 @@
-import mysql.connector
-import hashlib
+import credentials
+import db
 
 def connect_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",  # your MySQL user
-        password="raman@1234",  # your MySQL password
-        database="bizpulse_db"
-    )
+    # Kept for callers that expect a connection context; connections come from the shared pool
+    return db.connection()
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return credentials.hash_in_pool(password)
 
 def signup_user(username, password):
-    conn = connect_db()
-    cursor = conn.cursor()
     hashed_pw = hash_password(password)
-    try:
-        cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_pw))
-        conn.commit()
-        return True
-    except:
-        return False
-    finally:
-        cursor.close()
-        conn.close()
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(db.sql("INSERT INTO users (username, password) VALUES (%s, %s)"), (username, hashed_pw))
+            conn.commit()
+            return True
+        except:
+            return False
+        finally:
+            cursor.close()
 
 def login_user(username, password):
-    conn = connect_db()
-    cursor = conn.cursor()
-    hashed_pw = hash_password(password)
-    cursor.execute("SELECT * FROM users WHERE username=%s AND password=%s", (username, hashed_pw))
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    # Fetch by username only; the password is checked in constant time off the DB
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(db.sql("SELECT id, username, password FROM users WHERE username=%s"), (username,))
+            user = cursor.fetchone()
+        finally:
+            cursor.close()
+    if not credentials.verify_in_pool(password, user[2] if user else None):
+        return None
+    if credentials.needs_rehash(user[2]):
+        update_password_hash(username, hash_password(password))
     return user
 
+def update_password_hash(username, hashed_pw):
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(db.sql("UPDATE users SET password=%s WHERE username=%s"), (hashed_pw, username))
+            conn.commit()
+        finally:
+            cursor.close()
+
 def save_file_metadata(username, filename):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO uploaded_files (username, filename) VALUES (%s, %s)",
-        (username, filename)
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                db.sql("INSERT INTO uploaded_files (username, filename) VALUES (%s, %s)"),
+                (username, filename)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
@@ -0,0 +1,123 @@
+"""Headless batch reports: the dashboard's KPIs for a directory of uploads, no browser needed.
+
+Usage (from the repo root):
+    python batch.py uploads/ reports/                 # every *.csv / *.xlsx under uploads/
+    python batch.py uploads/ reports/ --parquet       # also write the cube and tables as Parquet
+    python batch.py uploads/ reports/ --workers 8
+
+Each input file gets reports/<relative path>.json with the same figures
+show_visuals renders (monthly revenue, top products, region split, new vs repeat
+customers, AOV). reports/summary.json lists every file with its status. Files are
+processed in parallel on a process pool; the exit status is 1 if any file failed.
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+import aggregates
+import excel_reader
+import storage
+import upload_cache
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+TOP_N = 5
+UPLOAD_EXTENSIONS = (".csv",) + excel_reader.EXCEL_EXTENSIONS
+
+
+def find_uploads(input_dir):
+    """All CSV and Excel files under input_dir (recursively), skipping the app's .cache dirs."""
+    found = []
+    for root, dirs, files in os.walk(input_dir):
+        # .objects holds the app's content-addressed copies; point batch.py at it explicitly to include them
+        dirs[:] = sorted(d for d in dirs if d not in (upload_cache.CACHE_DIR_NAME, storage.OBJECTS_DIR_NAME))
+        found.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(UPLOAD_EXTENSIONS))
+    return found
+
+
+def _report_prefix(file_path, input_dir, output_dir):
+    relative = os.path.relpath(file_path, input_dir)
+    stem, ext = os.path.splitext(relative)
+    # sales.csv -> sales.json, but sales.xlsx -> sales.xlsx.json so the two cannot collide
+    return os.path.join(output_dir, stem if ext.lower() == ".csv" else relative)
+
+
+def _write_parquet(aggs, kpis, prefix):
+    upload_cache.write_frame(aggs.cube, f"{prefix}.cube.parquet")
+    if aggs.customers is not None:
+        upload_cache.write_frame(aggs.customers, f"{prefix}.customers.parquet")
+    for section in ("monthly_revenue", "top_products", "region_revenue"):
+        if kpis[section] is not None:
+            upload_cache.write_frame(pd.DataFrame(kpis[section]), f"{prefix}.{section}.parquet")
+
+
+def process_file(file_path, input_dir, output_dir, parquet=False):
+    """Worker: builds one file's report. Returns a summary entry (never raises)."""
+    start = time.perf_counter()
+    prefix = _report_prefix(file_path, input_dir, output_dir)
+    entry = {"file": os.path.relpath(file_path, input_dir), "report": f"{prefix}.json"}
+    try:
+        aggs, date_format = aggregates.build_file_aggregates(file_path)
+        kpis = aggregates.kpi_summary(aggs, TOP_N)
+        kpis.update({"file": entry["file"], "date_format": date_format,
+                     "generated_at": datetime.now().isoformat(timespec="seconds")})
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        upload_cache.write_json(kpis, f"{prefix}.json")
+        if parquet:
+            _write_parquet(aggs, kpis, prefix)
+        entry.update(status="ok", rows=kpis["rows"], total_revenue=kpis["total_revenue"])
+    except ValueError as e:
+        entry.update(status="failed", error=str(e))
+    except Exception as e:
+        entry.update(status="failed", error=f"Unexpected error: {e}", traceback=traceback.format_exc())
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def run(input_dir, output_dir, workers=DEFAULT_WORKERS, parquet=False, log=print):
+    """Processes every upload under input_dir; returns the list of summary entries."""
+    files = find_uploads(input_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    if workers <= 1:
+        for file_path in files:
+            results.append(process_file(file_path, input_dir, output_dir, parquet))
+            log(_progress_line(results[-1], len(results), len(files)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(process_file, f, input_dir, output_dir, parquet) for f in files]
+            for future in as_completed(futures):
+                results.append(future.result())
+                log(_progress_line(results[-1], len(results), len(files)))
+    results.sort(key=lambda r: r["file"])
+    upload_cache.write_json({"generated_at": datetime.now().isoformat(timespec="seconds"),
+                             "files": results}, os.path.join(output_dir, "summary.json"))
+    return results
+
+
+def _progress_line(entry, done, total):
+    detail = f"{entry['rows']} rows" if entry["status"] == "ok" else entry["error"]
+    return f"[{done}/{total}] {entry['file']}: {entry['status']} ({detail}, {entry['seconds']}s)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate BizPulse KPI reports for a directory of sales CSV/Excel files.")
+    parser.add_argument("input_dir", help="directory to scan for *.csv and *.xlsx files (recursively)")
+    parser.add_argument("output_dir", help="directory to write the reports to")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes (default: CPU count)")
+    parser.add_argument("--parquet", action="store_true", help="also write the cube and KPI tables as Parquet")
+    args = parser.parse_args(argv)
+
+    results = run(args.input_dir, args.output_dir, args.workers, args.parquet)
+    failed = sum(r["status"] != "ok" for r in results)
+    print(f"{len(results) - failed} succeeded, {failed} failed. Summary: {os.path.join(args.output_dir, 'summary.json')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Logins/sec of credentials.verify_in_pool at several scrypt costs and worker counts.
+
+Usage (from the repo root):
+    python benchmarks/bench_login.py            # 200 logins per setting
+    python benchmarks/bench_login.py 1000       # custom login count
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import credentials
+
+COSTS = [(2 ** 12, 8, 1), (2 ** 14, 8, 1), (2 ** 15, 8, 1)] # (n, r, p)
+WORKERS = [1, 2, 4]
+CLIENTS = 16 # concurrent login attempts, like simultaneous Streamlit sessions
+
+
+def bench(logins, n, r, p, workers):
+    credentials._executor = ThreadPoolExecutor(max_workers=workers)
+    stored = credentials.hash_password("correct horse", n, r, p)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as clients:
+        results = list(clients.map(lambda _: credentials.verify_in_pool("correct horse", stored), range(logins)))
+    elapsed = time.perf_counter() - start
+    credentials._executor.shutdown()
+    assert all(results)
+    return logins / elapsed, elapsed / logins * 1000
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{'n':>7} {'r':>3} {'p':>3} {'workers':>8} {'logins/sec':>12} {'ms/login':>10}")
+    for n, r, p in COSTS:
+        for workers in WORKERS:
+            rate, ms = bench(logins, n, r, p, workers)
+            print(f"{n:>7} {r:>3} {p:>3} {workers:>8} {rate:>12.1f} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Rows/sec of the "Unit Price"/"Quantity" cleaning, before and after to_numeric_fast.
+
+Usage (from the repo root):
+    python benchmarks/bench_numeric.py              # 1M, 5M and 10M rows
+    python benchmarks/bench_numeric.py 2000000      # custom row counts
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_processor import to_numeric_fast
+
+DEFAULT_ROWS = [1_000_000, 5_000_000, 10_000_000]
+
+
+def legacy_clean(series):
+    # The cleaning show_visuals used before to_numeric_fast
+    return pd.to_numeric(series.astype(str).str.replace(r'[^\d.]', '', regex=True), errors='coerce')
+
+
+def make_columns(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = rng.integers(100, 500_000, rows) / 100
+    prices_text = pd.Series(prices).map("₹{:,.2f}".format)  # e.g. "₹1,299.00"
+    quantities = pd.Series(rng.integers(1, 50, rows)).astype(str)
+    dirty = rng.random(rows) < 0.001
+    quantities[dirty] = "n/a"
+    return {"Unit Price": prices_text, "Quantity": quantities, "Quantity (numeric)": pd.Series(rng.integers(1, 50, rows))}
+
+
+def time_it(fn, series):
+    start = time.perf_counter()
+    fn(series)
+    return time.perf_counter() - start
+
+
+def main(row_counts):
+    print(f"{'rows':>12} {'column':<20} {'legacy rows/s':>15} {'fast rows/s':>15} {'speedup':>8}")
+    for rows in row_counts:
+        for name, series in make_columns(rows).items():
+            legacy = time_it(legacy_clean, series)
+            fast = time_it(to_numeric_fast, series)
+            print(f"{rows:>12,} {name:<20} {rows / legacy:>15,.0f} {rows / fast:>15,.0f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_ROWS)
@@ -0,0 +1,161 @@
+"""Per-stage timings of the upload -> dashboard pipeline on synthetic sales CSVs.
+
+Usage (from the repo root):
+    python benchmarks/bench_pipeline.py                         # 10k, 100k and 1M rows
+    python benchmarks/bench_pipeline.py --rows 10000 50000000   # custom row counts (up to 50M)
+    python benchmarks/bench_pipeline.py --output results.json --repeat 3
+
+The generated CSVs follow the upload schema (Order Date / Product / Customer ID /
+Quantity / Unit Price / Region) with dirty values: currency symbols and thousands
+separators in prices, a few non-numeric quantities and unreadable dates. They are
+written once per (rows, seed) to --data-dir and reused by later runs.
+
+Files below the streaming threshold (aggregates.streams) go through the in-memory stages
+(read_csv, process_data, clean, compact, build_aggregates); larger ones are timed
+through the chunked streaming builder, as the app does. kpi_summary is timed for
+both. Results (best of --repeat runs per stage) are written as JSON so two versions
+can be diffed for regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregates
+from data_processor import clean_sales_data, compact_dtypes, process_data, read_sales_csv
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+GENERATE_CHUNK_ROWS = 1_000_000
+PRODUCTS = [f"Product {i:03d}" for i in range(200)]
+REGIONS = ["North", "South", "East", "West", "Central"]
+
+
+def _chunk(rows, rng, offset):
+    dates = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365 * 24, rows), unit="h")
+    order_dates = pd.Series(dates.strftime("%d-%m-%Y"))
+    prices = pd.Series(rng.integers(100, 500_000, rows) / 100).map("₹{:,.2f}".format)
+    quantities = pd.Series(rng.integers(1, 20, rows)).astype(str)
+    # ~0.1% dirty values in each of the cleaned columns
+    quantities[rng.random(rows) < 0.001] = "n/a"
+    order_dates[rng.random(rows) < 0.001] = "unknown"
+    prices[rng.random(rows) < 0.001] = "free"
+    return pd.DataFrame({
+        "Order Date": order_dates,
+        "Product": rng.choice(PRODUCTS, rows),
+        "Customer ID": pd.Series(rng.integers(1, max(rows // 4, 2), rows)).map("C-{:07d}".format),
+        "Quantity": quantities,
+        "Unit Price": prices,
+        "Region": rng.choice(REGIONS, rows),
+    }, index=pd.RangeIndex(offset, offset + rows))
+
+
+def generate_csv(rows, data_dir, seed=0):
+    """Writes (or reuses) a synthetic sales CSV with `rows` rows; returns its path."""
+    path = os.path.join(data_dir, f"sales_{rows}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        for offset in range(0, rows, GENERATE_CHUNK_ROWS):
+            n = min(GENERATE_CHUNK_ROWS, rows - offset)
+            _chunk(n, rng, offset).to_csv(f, index=False, header=offset == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _timed(fn, repeat):
+    """Returns (result of the last run, best wall time in seconds)."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench_file(path, rows, repeat):
+    stages = {}
+
+    def record(name, fn):
+        result, seconds = _timed(fn, repeat)
+        stages[name] = {"seconds": round(seconds, 6), "rows_per_sec": round(rows / seconds) if seconds else None}
+        return result
+
+    if aggregates.streams(path):
+        aggs, _ = record("build_aggregates_streaming", lambda: aggregates.build_aggregates_streaming(path))
+    else:
+        raw = record("read_csv", lambda: read_sales_csv(path))
+        record("process_data", lambda: process_data(raw.copy()))
+        cleaned, report = record("clean_sales_data", lambda: clean_sales_data(raw))
+        compact, _ = record("compact_dtypes", lambda: compact_dtypes(cleaned))
+        aggs = record("build_aggregates", lambda: aggregates.build_aggregates(compact, report))
+        del raw, cleaned, compact
+    record("kpi_summary", lambda: aggregates.kpi_summary(aggs))
+    return stages
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the BizPulse ingestion and dashboard pipeline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="row counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the best time is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join("benchmarks", "data"), help="where generated CSVs are kept")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "benchmark": "pipeline",
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "runs": [],
+    }
+    print(f"{'rows':>12} {'stage':<28} {'seconds':>10} {'rows/s':>14}")
+    for rows in args.rows:
+        path = generate_csv(rows, args.data_dir, args.seed)
+        stages = bench_file(path, rows, args.repeat)
+        for name, timing in stages.items():
+            print(f"{rows:>12,} {name:<28} {timing['seconds']:>10.3f} {timing['rows_per_sec'] or 0:>14,}")
+        results["runs"].append({
+            "rows": rows,
+            "file_bytes": os.path.getsize(path),
+            "stages": stages,
+            # ru_maxrss is KiB on Linux; it only grows, so this is the peak so far
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+
+    output = args.output or os.path.join("benchmarks", "results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
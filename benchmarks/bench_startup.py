@@ -0,0 +1,70 @@
+"""Cold import time of what the login page and the first dashboard paint load.
+
+Usage (from the repo root):
+    python benchmarks/bench_startup.py              # median of 5 fresh interpreters per page
+    python benchmarks/bench_startup.py --runs 10
+
+Each measurement runs in a new interpreter, so nothing is already in sys.modules.
+The login page must stay within LOGIN_BUDGET_MS and must not pull in any of
+LOGIN_FORBIDDEN (the analytics stack); the dashboard, which loads everything, must
+stay within DASHBOARD_BUDGET_MS. Exits with status 1 if a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules try.py imports at the top (login page) and on the dashboard page
+LOGIN_MODULES = ["streamlit", "mysql.connector", "db", "credentials", "migrations", "instrument", "assets"]
+DASHBOARD_MODULES = LOGIN_MODULES + ["streamlit_option_menu", "pandas", "streamlit_card", "memo", "aggregates",
+                                     "cohorts", "compare", "cumulative", "filters", "jobs", "storage", "upload_cache", "validation", "visualizer"]
+LOGIN_FORBIDDEN = ["pandas", "numpy", "pyarrow", "plotly.express"] # streamlit itself loads core plotly
+
+LOGIN_BUDGET_MS = 1200
+DASHBOARD_BUDGET_MS = 2500
+
+_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure(modules, runs):
+    samples, loaded = [], set()
+    for _ in range(runs):
+        code = _PROBE.format(modules=modules, forbidden=LOGIN_FORBIDDEN)
+        out = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        loaded.update(result["loaded"])
+    return statistics.median(samples), sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check BizPulse cold-start import times against their budget.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    ok = True
+    login_ms, login_loaded = measure(LOGIN_MODULES, args.runs)
+    dashboard_ms, _ = measure(DASHBOARD_MODULES, args.runs)
+    for page, ms, budget in (("login", login_ms, LOGIN_BUDGET_MS), ("dashboard", dashboard_ms, DASHBOARD_BUDGET_MS)):
+        status = "ok" if ms <= budget else "OVER BUDGET"
+        ok = ok and ms <= budget
+        print(f"{page:<10} {ms:>8.0f} ms  (budget {budget} ms)  {status}")
+    if login_loaded:
+        ok = False
+        print(f"login page imports analytics modules: {', '.join(login_loaded)}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
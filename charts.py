@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import memo
+
+# Chart-data reduction: whatever the size of the data behind a chart, the figure
+# sent to the browser stays small. Time series are capped at MAX_POINTS per trace
+# with LTTB (largest-triangle-three-buckets), which keeps the visual shape (peaks,
+# dips) that plain every-nth sampling loses; category charts show at most
+# MAX_CATEGORIES members and fold the long tail into "Other".
+MAX_POINTS = int(os.environ.get("BIZPULSE_CHART_MAX_POINTS", "500"))
+MAX_CATEGORIES = 8
+OTHER = "Other"
+
+# Built figures, keyed by (data key, chart, granularity, ...). The data key
+# identifies the aggregates behind the chart (a file's content hash, or a user's
+# cumulative revision), so a rerun reuses the figure instead of rebuilding it.
+FIGURE_CACHE_BYTES = int(os.environ.get("BIZPULSE_FIGURE_CACHE_MB", "64")) * 1024 * 1024
+
+
+def _figure_size(fig):
+    return len(fig.to_json())
+
+
+figure_cache = memo.LRUCache(FIGURE_CACHE_BYTES, sizeof=_figure_size)
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points LTTB keeps when reducing (x, y) to `threshold` points.
+
+    x must be sorted and numeric (e.g. datetime64 as int64). The first and last
+    points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # Bucket edges for the n - 2 interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Pick the point forming the largest triangle with the previous pick and that average
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(areas.argmax())
+        keep[i + 1] = previous
+    return keep
+
+
+def downsample_series(df, x, y, max_points=MAX_POINTS):
+    """Reduces a time series frame to at most max_points rows with LTTB."""
+    if len(df) <= max_points:
+        return df
+    with instrument.span("downsample"):
+        df = df.sort_values(x)
+        xs = df[x].to_numpy()
+        if np.issubdtype(xs.dtype, np.datetime64):
+            xs = xs.astype("datetime64[ns]").astype(np.int64)
+        keep = lttb_indices(xs, df[y].to_numpy(dtype="float64"), max_points)
+        instrument.count("points_dropped", len(df) - len(keep))
+        return df.iloc[keep]
+
+
+def top_n_with_other(df, label, value, n=MAX_CATEGORIES):
+    """The n largest rows by value, plus one "Other" row summing the rest."""
+    if len(df) <= n:
+        return df
+    df = df.sort_values(value, ascending=False)
+    head, tail = df.iloc[:n - 1], df.iloc[n - 1:]
+    other = pd.DataFrame({label: [OTHER], value: [tail[value].sum()]})
+    head = head[[label, value]].astype({label: "object"})
+    return pd.concat([head, other], ignore_index=True)
+
+
+def cached_figure(key, build):
+    """Returns the figure cached under key, building it on a miss.
+
+    With key=None (no stable identity for the data) the figure is always built.
+    """
+    if key is None:
+        return build()
+    return figure_cache.get_or_compute(key, build)
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+import instrument
+from data_processor import CUSTOMER_ID_COL
+
+# Cohort retention and RFM scoring. Alongside Aggregates.activity (one row per
+# customer and active month) each aggregate set keeps the cohort state:
+#   customers -- one row per customer: "First" and "Last" active month, "Orders",
+#                "Total Revenue"; RFM is scored straight from it
+#   matrix    -- one row per ("Cohort", "Month"): active "Customers" and their
+#                "Total Revenue"; the cohort matrices are a pivot of it
+# apply_activity() folds new (or, negated, removed) activity rows into that state
+# by regrouping only the customers those rows mention, so adding an upload costs
+# time in proportion to the upload and those customers' history, and rendering
+# never rescans the activity table.
+MAX_COHORTS = 24 # most recent first-purchase months shown in the matrices
+RFM_BINS = 5
+
+# (segment, rule on the R/F scores), checked in order; the rest are "Needs Attention"
+RFM_SEGMENTS = [
+    ("Champions", lambda r, f: (r >= 4) & (f >= 4)),
+    ("Loyal", lambda r, f: f >= 4),
+    ("New", lambda r, f: (r >= 4) & (f <= 2)),
+    ("At Risk", lambda r, f: (r <= 2) & (f >= 3)),
+    ("Hibernating", lambda r, f: r <= 2),
+]
+DEFAULT_SEGMENT = "Needs Attention"
+
+ACTIVITY_KEYS = [CUSTOMER_ID_COL, "Month"]
+MATRIX_KEYS = ["Cohort", "Month"]
+
+
+def _month_number(months):
+    return months.dt.year * 12 + months.dt.month
+
+
+def _customer_ids(values):
+    # Categorical and plain columns are compared as plain values
+    return pd.Index(np.asarray(values, dtype=object), name=CUSTOMER_ID_COL)
+
+
+def _summarize(activity):
+    """Per-customer state (indexed by customer) of the given activity rows."""
+    state = (activity.groupby(CUSTOMER_ID_COL, observed=True, sort=False)
+                     .agg(First=("Month", "min"), Last=("Month", "max"), Orders=("Orders", "sum"),
+                          **{"Total Revenue": ("Total Revenue", "sum")}))
+    state.index = _customer_ids(state.index)
+    return state
+
+
+def _contributions(activity, first):
+    """Matrix cells (indexed by Cohort, Month) of activity rows whose customers'
+    first months are given by `first` (indexed by customer)."""
+    cohort = first.to_numpy()[first.index.get_indexer(_customer_ids(activity[CUSTOMER_ID_COL]))]
+    return (pd.DataFrame({"Cohort": cohort, "Month": activity["Month"].to_numpy(),
+                          "Total Revenue": activity["Total Revenue"].to_numpy()})
+              .groupby(MATRIX_KEYS, sort=False)
+              .agg(Customers=("Total Revenue", "size"), **{"Total Revenue": ("Total Revenue", "sum")}))
+
+
+def build_state(activity):
+    """(customers, matrix) cohort state for an activity table, built from scratch."""
+    with instrument.span("cohorts:state"):
+        state = _summarize(activity)
+        return state.reset_index(), _contributions(activity, state["First"]).reset_index()
+
+
+def apply_activity(activity, customers, matrix, delta):
+    """Folds activity rows `delta` into (activity, customers, matrix); returns the new three.
+
+    Negative Orders/Total Revenue in delta remove an earlier contribution;
+    customer-months left without orders are dropped. Only the stored rows of
+    customers in delta are regrouped, and only their matrix cells change.
+    """
+    with instrument.span("cohorts:apply"):
+        affected = _customer_ids(delta[CUSTOMER_ID_COL].unique())
+        touched = activity[CUSTOMER_ID_COL].isin(affected)
+        old = activity[touched]
+        state = customers.set_index(CUSTOMER_ID_COL)
+        state.index = _customer_ids(state.index)
+
+        merged = (pd.concat([old, delta], ignore_index=True)
+                    .groupby(ACTIVITY_KEYS, observed=True, sort=False)[["Total Revenue", "Orders"]]
+                    .sum()
+                    .reset_index())
+        merged = merged[merged["Orders"] > 0].reset_index(drop=True)
+        merged_state = _summarize(merged)
+
+        # Take the affected customers' old cells out and put their new ones in
+        cells = matrix.set_index(MATRIX_KEYS)
+        cells = cells.sub(_contributions(old, state["First"]), fill_value=0)
+        cells = cells.add(_contributions(merged, merged_state["First"]), fill_value=0)
+        cells = cells[cells["Customers"] > 0].astype({"Customers": "int64"})
+
+        state = pd.concat([state[~state.index.isin(affected)], merged_state])
+        columns, kept = activity.columns, activity[~touched]
+        if isinstance(kept[CUSTOMER_ID_COL].dtype, pd.CategoricalDtype):
+            # A plain concat would convert every stored id when the categories differ,
+            # so the ids are merged as codes with union_categoricals instead
+            ids = pd.api.types.union_categoricals(
+                [kept[CUSTOMER_ID_COL], pd.Categorical(merged[CUSTOMER_ID_COL])], ignore_order=True)
+            activity = pd.concat([kept.drop(columns=CUSTOMER_ID_COL), merged.drop(columns=CUSTOMER_ID_COL)], ignore_index=True)
+            activity[CUSTOMER_ID_COL] = ids
+            activity = activity[columns]
+        else:
+            activity = pd.concat([kept, merged], ignore_index=True)
+    return activity, state.reset_index(), cells.reset_index()
+
+
+def cohort_tables(matrix, max_cohorts=MAX_COHORTS):
+    """Returns (retention, revenue) cohort matrices from the cohort state's matrix.
+
+    Rows are first-purchase months ("Cohort"), columns are months since the first
+    purchase. retention holds the share of the cohort active in that month (0-1);
+    revenue holds the cohort's revenue in that month.
+    """
+    with instrument.span("cohorts:matrix"):
+        frame = matrix.assign(Period=(_month_number(matrix["Month"]) - _month_number(matrix["Cohort"])).astype("int64"))
+        active = frame.pivot(index="Cohort", columns="Period", values="Customers").sort_index()
+        revenue = frame.pivot(index="Cohort", columns="Period", values="Total Revenue").sort_index()
+        active, revenue = active.tail(max_cohorts), revenue.tail(max_cohorts)
+        retention = active.div(active[0], axis=0)
+    return retention, revenue
+
+
+def rfm(customers):
+    """Per-customer Recency/Frequency/Monetary values, 1-5 scores and a segment,
+    from the cohort state's customers.
+
+    Recency is counted in months before the latest month in the data, since
+    activity is kept per month.
+    """
+    with instrument.span("cohorts:rfm"):
+        last = _month_number(customers["Last"])
+        result = pd.DataFrame({
+            CUSTOMER_ID_COL: customers[CUSTOMER_ID_COL],
+            "Recency": last.max() - last,
+            "Frequency": customers["Orders"],
+            "Monetary": customers["Total Revenue"],
+        })
+        result["R"] = _score(-result["Recency"])
+        result["F"] = _score(result["Frequency"])
+        result["M"] = _score(result["Monetary"])
+        r, f = result["R"].to_numpy(), result["F"].to_numpy()
+        result["Segment"] = np.select([rule(r, f) for _, rule in RFM_SEGMENTS],
+                                      [name for name, _ in RFM_SEGMENTS], DEFAULT_SEGMENT)
+    return result
+
+
+def _score(values):
+    """1..RFM_BINS by percentile rank (higher values score higher; ties share a score)."""
+    ranks = values.rank(pct=True, method="max")
+    return np.ceil(ranks * RFM_BINS).clip(1, RFM_BINS).astype("int8")
+
+
+def segment_summary(scores):
+    """Customers and revenue per RFM segment, largest segment first."""
+    return (scores.groupby("Segment", sort=False)
+                  .agg(Customers=("Segment", "size"), **{"Total Revenue": ("Monetary", "sum")})
+                  .sort_values("Customers", ascending=False)
+                  .reset_index())
@@ -0,0 +1,82 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import aggregates
+import instrument
+
+# Side-by-side comparison of several uploads. Each file's aggregates come from
+# aggregates.get_aggregates (memo, then the on-disk aggregate set, then a build), so
+# a comparison normally reads a few small Parquet files per upload; files that still
+# need building are built concurrently on a pool shared by every session. Parquet
+# and Arrow CSV reads release the GIL, and threads (unlike processes) share the
+# in-process caches, so a later comparison is pure cache hits.
+COMPARE_WORKERS = int(os.environ.get("BIZPULSE_COMPARE_WORKERS", str(min(8, (os.cpu_count() or 1) + 2))))
+MAX_COMPARE_FILES = 12
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=COMPARE_WORKERS, thread_name_prefix="bizpulse-compare")
+        return _executor
+
+
+def _load(file_path):
+    with instrument.span("compare:load"):
+        try:
+            return aggregates.get_aggregates(file_path), None
+        except ValueError as e:
+            return None, str(e)
+        except FileNotFoundError:
+            return None, "File not found"
+
+
+def load_many(files):
+    """Aggregates for several uploads ({filename: path}), loaded in parallel.
+
+    Returns (loaded, failed): loaded maps each analyzable file name to its
+    Aggregates in the order given; failed maps the others to an error message.
+    """
+    results = list(_get_executor().map(_load, files.values()))
+    loaded, failed = {}, {}
+    for name, (aggs, error) in zip(files, results):
+        if aggs is None:
+            failed[name] = error
+        else:
+            loaded[name] = aggs
+    return loaded, failed
+
+
+def period_summary(loaded):
+    """One row per upload with revenue, orders and AOV, plus % change from the previous upload."""
+    summary = pd.DataFrame(
+        [(name, aggs.total_revenue, aggs.total_orders, aggs.average_order_value) for name, aggs in loaded.items()],
+        columns=["File", "Total Revenue", "Orders", "Average Order Value"])
+    for col in ("Total Revenue", "Orders", "Average Order Value"):
+        summary[f"{col} Δ%"] = summary[col].pct_change(fill_method=None) * 100
+    return summary
+
+
+def dimension_deltas(loaded, dimension):
+    """Revenue per member of `dimension` (rows) and upload (columns), with the change
+    between the last two uploads in "Δ" and "Δ%", sorted by the latest revenue.
+
+    Members missing from an upload count as 0 revenue there.
+    """
+    with instrument.span(f"compare:{dimension}"):
+        table = pd.concat({name: aggs.revenue_by(dimension).set_index(dimension)["Total Revenue"]
+                           for name, aggs in loaded.items()}, axis=1)
+        table.index = table.index.astype(str)
+        table = table.groupby(level=0).sum().fillna(0.0)
+        if table.shape[1] >= 2:
+            previous, last = table.iloc[:, -2], table.iloc[:, -1]
+            table["Δ"] = last - previous
+            table["Δ%"] = (table["Δ"] / previous.where(previous != 0)) * 100
+        return table.sort_values(table.columns[len(loaded) - 1], ascending=False)
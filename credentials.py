@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# --- Password Hashing ---
+# Passwords are stored as "scrypt$<n>$<r>$<p>$<salt>$<hash>" (salt and hash base64).
+# scrypt is salted and memory-hard; cost is set with the env vars below and stored in
+# each hash, so raising it later only affects new hashes (old ones are upgraded on
+# the next successful login, see needs_rehash).
+SCRYPT_N = int(os.environ.get("BIZPULSE_SCRYPT_N", str(2 ** 14))) # CPU/memory cost, power of 2
+SCRYPT_R = int(os.environ.get("BIZPULSE_SCRYPT_R", "8")) # block size
+SCRYPT_P = int(os.environ.get("BIZPULSE_SCRYPT_P", "1")) # parallelism
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# KDF work runs on its own small pool so a burst of logins queues here instead of
+# tying up Streamlit's script threads; beyond MAX_PENDING waiting jobs, logins fail fast,
+# and a check still unanswered after KDF_TIMEOUT is reported as a login error.
+KDF_WORKERS = int(os.environ.get("BIZPULSE_KDF_WORKERS", "2"))
+MAX_PENDING = int(os.environ.get("BIZPULSE_KDF_MAX_PENDING", "32"))
+KDF_TIMEOUT = 30 # seconds
+
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class LoginBusy(Exception):
+    """Raised when a password check cannot be answered now: too many are queued, or it timed out."""
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * n * r * (p + 2), dklen=HASH_BYTES)
+
+
+def hash_password(password, n=None, r=None, p=None):
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, n, r, p)
+    return "$".join(["scrypt", str(n), str(r), str(p),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def verify_password(password, stored):
+    """Checks a password against a stored value in constant time.
+
+    Also accepts the legacy formats written before scrypt: an unsalted SHA-256 hex
+    digest (auth.py) or the bare password (older try.py signups).
+    """
+    if stored is None:
+        stored = ""
+    if stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            expected = base64.b64decode(digest)
+            actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(actual, expected)
+    # Exactly one legacy scheme per stored value: 64 lowercase hex chars is a SHA-256
+    # digest (typing the digest itself must not log in), anything else is plaintext
+    if _LEGACY_SHA256.fullmatch(stored):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    else:
+        candidate = password
+    return hmac.compare_digest(candidate.encode(), stored.encode())
+
+
+def needs_rehash(stored):
+    """True if a stored hash is legacy or weaker than the current cost settings."""
+    if not stored or not stored.startswith("scrypt$"):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+    except ValueError:
+        return True
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# Hash compared against when the username does not exist, so unknown users take as
+# long to reject as wrong passwords. Computed at import so the first miss is no slower.
+_DUMMY_HASH = hash_password("bizpulse-dummy-password")
+
+
+# --- Bounded Worker Pool ---
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix="bizpulse-kdf")
+        return _executor
+
+
+def run_kdf(fn, *args):
+    """Runs a KDF call on the bounded pool and waits for its result.
+
+    Raises LoginBusy if the pool is full or no result arrives within KDF_TIMEOUT.
+    """
+    if not _pending.acquire(blocking=False):
+        raise LoginBusy("Too many logins in progress. Please try again in a moment.")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _pending.release()
+        raise
+    # The slot is held until the call finishes, even if this caller gave up on it
+    future.add_done_callback(lambda _: _pending.release())
+    try:
+        return future.result(timeout=KDF_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel() # still queued: never run it
+        raise LoginBusy("Checking your password took too long. Please try again in a moment.") from None
+
+
+def hash_in_pool(password):
+    return run_kdf(hash_password, password)
+
+
+def verify_in_pool(password, stored):
+    """verify_password on the pool; pass stored=None for an unknown user (always False)."""
+    if stored is None:
+        run_kdf(verify_password, password, _DUMMY_HASH)
+        return False
+    return run_kdf(verify_password, password, stored)
@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import threading
+
+import aggregates
+import memo
+import upload_cache
+
+# Per-user cumulative aggregates over every upload, kept incrementally:
+#   uploads/<user>/.cache/cumulative/manifest.json        filename -> content hash, per-hash meta
+#   uploads/<user>/.cache/cumulative/total.*              combined aggregate set
+#   uploads/<user>/.cache/cumulative/parts/<sha256>.*     each file's contribution
+# Adding an upload folds only that file's aggregates into the total. Re-uploading a
+# filename first subtracts the old content's part, and identical content already in
+# the store (under any name) is counted once.
+CUMULATIVE_DIR_NAME = "cumulative"
+MANIFEST_FILE = "manifest.json"
+
+_user_locks = {}
+_user_locks_lock = threading.Lock()
+
+
+def _lock_for(store_dir):
+    with _user_locks_lock:
+        return _user_locks.setdefault(store_dir, threading.Lock())
+
+
+def store_dir(user_upload_dir):
+    return os.path.join(user_upload_dir, upload_cache.CACHE_DIR_NAME, CUMULATIVE_DIR_NAME)
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}, "parts": {}, "revision": 0}
+
+
+def _part_prefix(directory, digest):
+    return os.path.join(directory, "parts", digest)
+
+
+def _total_meta(part_metas):
+    meta = {"version": aggregates.AGGREGATES_VERSION}
+    for key in ("rows", "dropped_numeric", "dropped_dates"):
+        meta[key] = sum(m.get(key, 0) for m in part_metas)
+    for key in ("has_product", "has_region", "has_customer", "has_dates", "has_daily", "has_activity"):
+        meta[key] = any(m.get(key, False) for m in part_metas)
+    return meta
+
+
+def _is_current(manifest):
+    """False if any part was written by an older AGGREGATES_VERSION (store must be rebuilt)."""
+    return all(meta.get("version") == aggregates.AGGREGATES_VERSION for meta in manifest["parts"].values())
+
+
+def _remove(directory, manifest, total, name):
+    """Drops `name` from the manifest and, if no other name shares its content,
+    subtracts that content's part from total. Returns the new total."""
+    old_digest = manifest["files"].pop(name)
+    if old_digest not in manifest["files"].values():
+        old_part = aggregates.read_aggregates(_part_prefix(directory, old_digest))
+        if old_part is None or total is None:
+            raise RuntimeError("Cumulative store is incomplete; rebuild it with rebuild().")
+        total = aggregates.subtract_aggregates(total, old_part)
+        aggregates.delete_aggregates(_part_prefix(directory, old_digest))
+        manifest["parts"].pop(old_digest, None)
+    return total
+
+
+def _save(directory, manifest, total):
+    if manifest["parts"]:
+        total = aggregates.Aggregates(total.cube, total.customers, _total_meta(manifest["parts"].values()),
+                                       total.daily, total.activity, total.cohort_customers, total.cohort_matrix)
+        aggregates.write_aggregates(total, os.path.join(directory, "total"))
+    else:
+        aggregates.delete_aggregates(os.path.join(directory, "total"))
+    manifest["revision"] += 1
+    os.makedirs(directory, exist_ok=True)
+    upload_cache.write_json(manifest, os.path.join(directory, MANIFEST_FILE))
+
+
+def _is_ready(directory, manifest):
+    """True if the store was set up by sync() and matches AGGREGATES_VERSION."""
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE)) and _is_current(manifest)
+
+
+def _reset(directory):
+    """Empties the store, keeping the revision increasing so cached figures keyed by
+    an earlier revision are never served for the rebuilt total."""
+    revision = _read_manifest(directory)["revision"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+    upload_cache.write_json({"files": {}, "parts": {}, "revision": revision + 1},
+                            os.path.join(directory, MANIFEST_FILE))
+
+
+def add_upload(user_upload_dir, name, file_path):
+    """Folds the user's upload `name`, stored at file_path, into their cumulative store.
+
+    Costs one pass over the file's own aggregates (computed once per content by
+    aggregates.get_aggregates), independent of how many files came before.
+    A store that sync() has not set up yet, or one written for an older
+    AGGREGATES_VERSION, is left alone: it cannot be updated without the user's
+    other uploads, and the dashboard's sync() rebuilds it from the full list.
+    Raises ValueError if the file cannot be analyzed; the name's previous content
+    is then removed from the total (see remove_upload), since the user has replaced it.
+    """
+    directory = store_dir(user_upload_dir)
+    digest = upload_cache.content_hash(file_path)
+    try:
+        part = aggregates.get_aggregates(file_path)
+    except ValueError:
+        remove_upload(user_upload_dir, name)
+        raise
+
+    with _lock_for(directory):
+        manifest = _read_manifest(directory)
+        if not _is_ready(directory, manifest):
+            return # sync() rebuilds it, including this file
+        if manifest["files"].get(name) == digest:
+            return # same file re-uploaded unchanged
+
+        total = aggregates.read_aggregates(os.path.join(directory, "total"))
+        if name in manifest["files"]:
+            total = _remove(directory, manifest, total, name)
+        if digest not in manifest["parts"]:
+            aggregates.write_aggregates(part, _part_prefix(directory, digest))
+            manifest["parts"][digest] = part.meta
+            total = aggregates.combine_aggregates([total, part])
+        manifest["files"][name] = digest
+        _save(directory, manifest, total)
+    memo.invalidate_user(os.path.basename(user_upload_dir))
+
+
+def remove_upload(user_upload_dir, name):
+    """Takes the user's upload `name` out of their cumulative total, e.g. when it was
+    replaced by content that cannot be analyzed. A store sync() has not set up is
+    left alone; one whose parts are missing is emptied for sync() to rebuild.
+    """
+    directory = store_dir(user_upload_dir)
+    with _lock_for(directory):
+        manifest = _read_manifest(directory)
+        if not _is_ready(directory, manifest) or name not in manifest["files"]:
+            return
+        total = aggregates.read_aggregates(os.path.join(directory, "total"))
+        try:
+            _save(directory, manifest, _remove(directory, manifest, total, name))
+        except RuntimeError:
+            _reset(directory)
+    memo.invalidate_user(os.path.basename(user_upload_dir))
+
+
+def load_total(user_upload_dir):
+    """Returns the user's cumulative Aggregates, or None if nothing was added yet."""
+    directory = store_dir(user_upload_dir)
+    manifest = _read_manifest(directory)
+    if not manifest["parts"] or not _is_ready(directory, manifest):
+        return None # the dashboard then calls sync(), which (re)builds the store
+    # Revision in the key too, so totals changed by another server process are picked up
+    return memo.cached_for_user(os.path.basename(user_upload_dir), "cumulative_total",
+                                lambda: aggregates.read_aggregates(os.path.join(directory, "total")),
+                                manifest["revision"])
+
+
+def revision(user_upload_dir):
+    """Changes whenever the user's cumulative total does (use it in cache keys)."""
+    return _read_manifest(store_dir(user_upload_dir))["revision"]
+
+
+def tracked_files(user_upload_dir):
+    return dict(_read_manifest(store_dir(user_upload_dir))["files"])
+
+
+def sync(user_upload_dir, files):
+    """Adds any of `files` ({filename: path}) that the store has not seen at their current content.
+
+    Used to backfill uploads made before the store existed (or before an
+    AGGREGATES_VERSION bump, which discards the store); files already tracked at
+    the same content hash are skipped after a stat check. Returns the names that
+    could not be analyzed.
+    """
+    directory = store_dir(user_upload_dir)
+    with _lock_for(directory):
+        if not _is_ready(directory, _read_manifest(directory)):
+            _reset(directory)
+    tracked = tracked_files(user_upload_dir)
+    failed = []
+    for name, file_path in files.items():
+        if not os.path.exists(file_path):
+            continue
+        if tracked.get(name) == upload_cache.content_hash(file_path):
+            continue
+        try:
+            add_upload(user_upload_dir, name, file_path)
+        except ValueError:
+            failed.append(name)
+    return failed
+
+
+def rebuild(user_upload_dir, files):
+    """Discards the store and rebuilds it from the given uploads."""
+    directory = store_dir(user_upload_dir)
+    with _lock_for(directory):
+        _reset(directory)
+    return sync(user_upload_dir, files)
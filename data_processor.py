@@ -1,17 +1,364 @@
+import numpy as np
 import pandas as pd
 
-REQUIRED_COLUMNS = {"Order Date", "Product", "Customer ID", "Quantity", "Unit Price"}
+# Canonical column names, as they are after normalize_columns()
+UNIT_PRICE_COL = "Unit Price"
+QUANTITY_COL = "Quantity"
+ORDER_DATE_COL = "Order Date"
+PRODUCT_COL = "Product"
+CUSTOMER_ID_COL = "Customer Id" # "Customer ID", "customer_id", "Cust ID", ... all map here
+REGION_COL = "Region"
 
-def process_data(df: pd.DataFrame):
+REQUIRED_COLUMNS = {ORDER_DATE_COL, PRODUCT_COL, CUSTOMER_ID_COL, QUANTITY_COL, UNIT_PRICE_COL}
+
+# Header spellings accepted for each canonical column. Headers are compared after
+# _header_key() (lower case, letters and digits only), so "Unit Price", "unit_price"
+# and "UNIT-PRICE" are the same key. Anything unlisted is title-cased as before.
+COLUMN_ALIASES = {
+    ORDER_DATE_COL: ["order date", "date", "order dt", "purchase date", "invoice date", "transaction date", "sale date"],
+    PRODUCT_COL: ["product", "product name", "item", "item name"],
+    CUSTOMER_ID_COL: ["customer id", "cust id", "customer", "customer no", "customer number", "client id"],
+    QUANTITY_COL: ["quantity", "qty", "units", "quantity sold", "units sold"],
+    UNIT_PRICE_COL: ["unit price", "price", "price per unit", "unit cost", "rate"],
+    REGION_COL: ["region", "sales region", "area", "territory", "zone"],
+    "Category": ["category", "product category"],
+}
+
+# Column schema for loaded sales frames (names as they are after title-casing).
+# Text columns listed under CATEGORY_COLUMNS are stored as pandas categoricals when
+# they repeat enough (distinct/rows below CATEGORY_MAX_RATIO); NUMERIC_COLUMNS are
+# downcast to the narrowest type that holds every value exactly.
+CATEGORY_COLUMNS = [PRODUCT_COL, REGION_COL, CUSTOMER_ID_COL, "Category"]
+NUMERIC_COLUMNS = [QUANTITY_COL, UNIT_PRICE_COL]
+ALWAYS_CATEGORY_COLUMNS = [PRODUCT_COL, REGION_COL, "Category"] # low cardinality by nature
+CATEGORY_MAX_RATIO = 0.5
+
+# Characters trimmed from both ends of a currency value before the full regex fallback
+CURRENCY_SYMBOLS = "₹$€£¥ "
+NUMBER_PATTERN = r"^-?(\d+\.?\d*|\.\d+)$"
+# The last-resort strip is the original cleaning's: everything but digits and dots
+# goes, minus signs included ("5-10" -> 510). Values that are plain numbers once
+# symbols and separators are trimmed ("-5", "₹-1,200") never reach it, so they
+# keep their sign.
+NON_NUMERIC_PATTERN = r"[^\d.]"
+
+def _parse_numbers_arrow(values):
+    """Parses a pyarrow string array to float64 (numpy), NaN where unparseable."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # All plain numbers? Probe a slice first: a failing cast over the whole column is slow
+    try:
+        pc.cast(values.slice(0, 1000), pa.float64())
+        return pc.cast(values, pa.float64()).to_numpy(zero_copy_only=False)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+
+    # Common case: "₹1,299.00" -> trim symbols and drop thousands separators (no regex)
+    cleaned = pc.replace_substring(pc.utf8_trim(values, CURRENCY_SYMBOLS), ",", "")
+    ok = pc.fill_null(pc.match_substring_regex(cleaned, NUMBER_PATTERN), False)
+    result = pc.cast(pc.if_else(ok, cleaned, pa.scalar(None, pa.string())), pa.float64()).to_numpy(zero_copy_only=False)
+
+    # Stragglers: strip every non-numeric character, like the original cleaning did
+    bad = np.flatnonzero(~ok.to_numpy(zero_copy_only=False) & values.is_valid().to_numpy(zero_copy_only=False))
+    if len(bad):
+        stripped = pc.replace_substring_regex(pc.take(cleaned, pa.array(bad)), NON_NUMERIC_PATTERN, "")
+        valid = pc.fill_null(pc.match_substring_regex(stripped, NUMBER_PATTERN), False)
+        result[bad] = pc.cast(pc.if_else(valid, stripped, pa.scalar(None, pa.string())), pa.float64()).to_numpy(zero_copy_only=False)
+    return result
+
+def _parse_numbers_pandas(values: pd.Series):
+    parsed = pd.to_numeric(values, errors="coerce")
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        stripped = values[failed].astype(str).str.replace(NON_NUMERIC_PATTERN, "", regex=True)
+        parsed[failed] = pd.to_numeric(stripped, errors="coerce")
+    return parsed.to_numpy(dtype="float64")
+
+def _parse_numbers(values):
+    values = pd.Series(values)
+    try:
+        import pyarrow as pa
+        arr = pa.array(values, type=pa.string(), from_pandas=True)
+    except ImportError:
+        return _parse_numbers_pandas(values)
+    except (TypeError, ValueError, ArithmeticError):
+        # Mixed Python types (e.g. ints and strings in one object column)
+        arr = pa.array(values.astype(str).where(values.notna()), type=pa.string(), from_pandas=True)
+    return _parse_numbers_arrow(arr)
+
+def to_numeric_fast(series: pd.Series):
+    """Converts a column of possibly currency-formatted values (e.g. "₹1,299.00") to numbers.
+
+    Numeric columns are returned untouched. Text is parsed with vectorized Arrow
+    kernels: plain numbers are cast directly, symbols and thousands separators are
+    trimmed without a regex, and only the leftovers get the full regex strip.
+    Low-cardinality columns (Quantity, list prices) are factorized first so each
+    distinct value is parsed once. Unparseable values become NaN.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+
+    step = max(1, len(series) // 10_000)
+    sample = series.iloc[::step]
+    if len(sample) and sample.nunique(dropna=False) < len(sample) // 2:
+        codes, uniques = pd.factorize(series)
+        result = np.take(_parse_numbers(np.asarray(uniques, dtype=object)), codes) if len(uniques) else np.full(len(series), np.nan)
+        result[codes == -1] = np.nan # code -1 marks a missing value
+    else:
+        result = _parse_numbers(series.to_numpy(dtype=object) if series.dtype == object else series.array)
+    return pd.Series(result, index=series.index, name=series.name)
+
+# Candidate "Order Date" formats tried by detect_date_format, most common first.
+# Day-first and month-first variants are both listed; the one parsing more of the
+# sample wins, and the earlier entry wins a tie. Month-first variants come first,
+# so a sample where every day is 12 or less parses month-first, as pd.to_datetime did.
+DATE_FORMATS = [
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d",
+    "%m/%d/%Y", "%d/%m/%Y", "%m-%d-%Y", "%d-%m-%Y", "%d.%m.%Y",
+    "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M", "%m-%d-%Y %H:%M", "%d-%m-%Y %H:%M",
+    "%d-%b-%Y", "%d %b %Y", "%b %d, %Y", "%d-%b-%y", "%m/%d/%y", "%d/%m/%y", "%Y%m%d",
+]
+DATE_SAMPLE_SIZE = 1000
+DATE_FORMAT_MIN_MATCH = 0.9 # share of the sample a format must parse to be used
+
+def detect_date_format(series: pd.Series, sample_size=DATE_SAMPLE_SIZE):
+    """Returns the strftime format that parses a sample of the column, or None."""
+    sample = series.dropna()
+    if sample.empty or pd.api.types.is_datetime64_any_dtype(sample):
+        return None
+    sample = sample.iloc[:: max(1, len(sample) // sample_size)].astype(str).str.strip()
+
+    best_format, best_share = None, 0.0
+    for fmt in DATE_FORMATS:
+        share = pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+        if share > best_share:
+            best_format, best_share = fmt, share
+            if share == 1.0:
+                break
+    return best_format if best_share >= DATE_FORMAT_MIN_MATCH else None
+
+def parse_dates(series: pd.Series, date_format=None):
+    """Parses a date column with an explicit format, falling back per value for stragglers."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if date_format is None:
+        return pd.to_datetime(series, errors="coerce")
+
+    parsed = pd.to_datetime(series, format=date_format, errors="coerce")
+    stragglers = parsed.isna() & series.notna()
+    if stragglers.any():
+        parsed[stragglers] = pd.to_datetime(series[stragglers], format="mixed", errors="coerce")
+    return parsed
+
+def _truncate_dates(dates: pd.Series, unit, name):
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    values = dates.to_numpy(dtype="datetime64[ns]")
+    return pd.Series(values.astype(f"datetime64[{unit}]").astype("datetime64[ns]"), index=dates.index, name=name)
+
+def month_start(dates: pd.Series):
+    """Truncates datetimes to the first day of their month (no Period/str round-trip)."""
+    return _truncate_dates(dates, "M", "Month")
+
+def day_start(dates: pd.Series):
+    """Truncates datetimes to midnight of their day."""
+    return _truncate_dates(dates, "D", "Date")
+
+def _header_key(name):
+    return "".join(ch for ch in str(name).lower() if ch.isalnum())
+
+_ALIAS_KEYS = {_header_key(alias): canonical for canonical, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+def canonical_column(name):
+    """The canonical name for an uploaded header ("cust_id" -> "Customer Id")."""
+    return _ALIAS_KEYS.get(_header_key(name), str(name).strip().title())
+
+def normalize_columns(columns):
+    """Maps each header to its canonical name; returns {original: canonical}.
+
+    A header already spelled like a canonical name wins over aliases of it, so a
+    file with both "Order Date" and "Date" keeps "Date" as an extra column.
+    """
+    mapping = {col: canonical_column(col) for col in columns}
+    claimed = {name for col, name in mapping.items() if _header_key(col) == _header_key(name)}
+    for col, name in mapping.items():
+        if _header_key(col) != _header_key(name):
+            if name in claimed:
+                mapping[col] = str(col).strip().title()
+            else:
+                claimed.add(name)
+    return mapping
+
+def process_data(df: pd.DataFrame, date_format=None):
+    df.rename(columns=normalize_columns(df.columns), inplace=True)
     # Check for required columns
     if not REQUIRED_COLUMNS.issubset(set(df.columns)):
         return False
 
     # Convert Order Date to datetime
-    df["Order Date"] = pd.to_datetime(df["Order Date"])
+    df[ORDER_DATE_COL] = parse_dates(df[ORDER_DATE_COL], date_format or detect_date_format(df[ORDER_DATE_COL]))
 
     # Create a new column: Total Revenue
-    df["Total Revenue"] = df["Quantity"] * df["Unit Price"]
+    df[QUANTITY_COL] = to_numeric_fast(df[QUANTITY_COL])
+    df[UNIT_PRICE_COL] = to_numeric_fast(df[UNIT_PRICE_COL])
+    df["Total Revenue"] = df[QUANTITY_COL] * df[UNIT_PRICE_COL]
 
     return True
 
+def _key_text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def _as_text(series: pd.Series):
+    """A key column's values as text, missing values kept missing.
+
+    Whole numbers lose any ".0", so 101, 101.0 and "101" are one key whichever
+    reader produced the column: inferred numbers on the whole-file path, text on
+    the streaming CSV path, per-chunk Python types from Excel.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if pd.api.types.is_string_dtype(series.cat.categories):
+            return series
+        return _as_text(series.astype(object)).astype("category")
+    if pd.api.types.is_string_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype("Int64") # integer IDs in a column with gaps
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("str")
+    return series.map(_key_text, na_action="ignore").astype("str")
+
+def clean_sales_data(df: pd.DataFrame, date_format=None):
+    """Cleans a raw sales frame for analytics, leaving the input frame untouched.
+
+    Returns (df, report). The report lists rows dropped by each cleaning step, the
+    "Order Date" format used (pass it back in as `date_format` to skip detection
+    next time) and, under "error", a message if the frame cannot be used at all.
+    """
+    report = {"rows_in": len(df), "dropped_numeric": 0, "dropped_dates": 0, "has_dates": True,
+              "date_format": date_format, "error": None}
+
+    # Map header aliases ("Qty", "customer_id", ...) to the canonical names.
+    # rename() returns a new frame, so the caller's frame is never modified.
+    df = df.rename(columns=normalize_columns(df.columns))
+
+    if UNIT_PRICE_COL not in df.columns or QUANTITY_COL not in df.columns:
+        report["error"] = f"Missing '{UNIT_PRICE_COL}' or '{QUANTITY_COL}' column in the uploaded CSV. Cannot calculate 'Total Revenue'."
+        return df, report
+
+    # Product/Region/Customer Id/Category are grouping keys: text on every read path
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = _as_text(df[col])
+
+    # Convert to numeric, stripping currency symbols and separators where needed
+    df[UNIT_PRICE_COL] = to_numeric_fast(df[UNIT_PRICE_COL])
+    df[QUANTITY_COL] = to_numeric_fast(df[QUANTITY_COL])
+
+    # Drop rows where conversion to numeric failed for these columns
+    initial_rows = len(df)
+    df.dropna(subset=[UNIT_PRICE_COL, QUANTITY_COL], inplace=True)
+    report["dropped_numeric"] = initial_rows - len(df)
+
+    df["Total Revenue"] = df[UNIT_PRICE_COL] * df[QUANTITY_COL]
+
+    if ORDER_DATE_COL in df.columns:
+        if report["date_format"] is None:
+            report["date_format"] = detect_date_format(df[ORDER_DATE_COL])
+        df[ORDER_DATE_COL] = parse_dates(df[ORDER_DATE_COL], report["date_format"])
+        initial_rows = len(df)
+        df.dropna(subset=[ORDER_DATE_COL], inplace=True) # Drop rows where date conversion failed
+        report["dropped_dates"] = initial_rows - len(df)
+        df["Month"] = month_start(df[ORDER_DATE_COL])
+    else:
+        report["has_dates"] = False
+        df["Month"] = pd.NaT # Single unknown month so the cube groupby still works
+
+    return df, report
+
+def read_sales_csv(file_path, **kwargs):
+    """pd.read_csv with the sales schema applied while parsing.
+
+    Product/Region/Category are read straight into categoricals, so the large
+    object columns are never materialized.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    dtype = {col: "category" for col in header if canonical_column(col) in ALWAYS_CATEGORY_COLUMNS}
+    dtype.update(kwargs.pop("dtype", {}))
+    return pd.read_csv(file_path, dtype=dtype, **kwargs)
+
+def read_sales_file(file_path, nrows=None):
+    """Reads an upload of any supported type (CSV or .xlsx) into a raw sales frame."""
+    import excel_reader # imports this module, so loaded on first use
+    if excel_reader.is_excel(file_path):
+        return excel_reader.read_sales_excel(file_path, nrows=nrows)
+    return read_sales_csv(file_path, nrows=nrows)
+
+def _downcast_numeric(series: pd.Series):
+    if pd.api.types.is_float_dtype(series) and series.notna().all() and (series % 1 == 0).all():
+        series = series.astype("int64") # whole-number floats such as cleaned quantities
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series) and series.dtype != "float32":
+        narrow = series.astype("float32")
+        same = (narrow.astype("float64") == series) | (narrow.isna() & series.isna())
+        if same.all():
+            return narrow
+    return series
+
+def compact_dtypes(df: pd.DataFrame):
+    """Returns (df, memory_report) with schema columns stored in compact dtypes.
+
+    memory_report has one row per column: dtype and bytes before and after.
+    """
+    before = df.memory_usage(index=False, deep=True)
+    before_dtypes = df.dtypes
+    compacted = {}
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORY_COLUMNS and not isinstance(series.dtype, pd.CategoricalDtype):
+            if col in ALWAYS_CATEGORY_COLUMNS or series.nunique() < len(series) * CATEGORY_MAX_RATIO:
+                series = series.astype("category")
+        elif col in NUMERIC_COLUMNS:
+            series = _downcast_numeric(series)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.cat.remove_unused_categories()
+        compacted[col] = series
+    df = pd.DataFrame(compacted, index=df.index)
+
+    after = df.memory_usage(index=False, deep=True)
+    memory_report = pd.DataFrame({
+        "dtype_before": before_dtypes.astype(str),
+        "bytes_before": before,
+        "dtype_after": df.dtypes.astype(str),
+        "bytes_after": after,
+    }).rename_axis("column").reset_index()
+    return df, memory_report
+
+class PreparedFrame:
+    """A cleaned sales frame plus its cleaning report.
+
+    Produced by prepare(); treat it as read-only so it can be shared between
+    Streamlit reruns and sessions through the in-process cache.
+    """
+
+    def __init__(self, df, report):
+        self.df = df
+        self.report = report
+        self.nbytes = int(df.memory_usage(index=True, deep=True).sum())
+
+def prepare(df: pd.DataFrame, date_format=None):
+    """Pure cleaning stage of the dashboard: raw frame in, PreparedFrame out.
+
+    The cleaned frame uses compact dtypes (see compact_dtypes); the per-column
+    memory before/after is in `report["memory"]`.
+
+    Raises ValueError if the frame lacks the columns needed for revenue.
+    """
+    cleaned, report = clean_sales_data(df, date_format)
+    if report["error"]:
+        raise ValueError(report["error"])
+    cleaned, report["memory"] = compact_dtypes(cleaned)
+    return PreparedFrame(cleaned, report)
@@ -0,0 +1,340 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import instrument
+
+# --- Database Settings ---
+# IMPORTANT: Replace with your actual MySQL credentials (or set the BIZPULSE_DB_* env vars)
+DB_CONFIG = {
+    "host": os.environ.get("BIZPULSE_DB_HOST", "localhost"),
+    "user": os.environ.get("BIZPULSE_DB_USER", "root"),
+    "password": os.environ.get("BIZPULSE_DB_PASSWORD", "raman@1234"),
+    "database": os.environ.get("BIZPULSE_DB_NAME", "bizpulse_db"),
+}
+POOL_SIZE = int(os.environ.get("BIZPULSE_DB_POOL_SIZE", "5"))
+CHECKOUT_TIMEOUT = 10  # seconds to wait for a free connection before giving up
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of DB-API connections.
+
+    `connect` is any zero-argument factory returning a new connection, so the
+    same pool works for MySQL in production and SQLite in local tests.
+    Connections are created lazily up to `size` and health-checked on checkout.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT, paramstyle="format", dialect="mysql"):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.paramstyle = paramstyle  # "format" (%s) for MySQL, "qmark" (?) for SQLite
+        self.dialect = dialect  # "mysql" or "sqlite", used to pick migration SQL
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        # Metrics
+        self.checkouts = 0
+        self.waits = 0  # checkouts that found the pool saturated
+        self.timeouts = 0
+        self.reconnects = 0
+        self.total_checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self.peak_in_use = 0
+
+    def _is_alive(self, conn):
+        """Cheap health check run on every checkout."""
+        try:
+            if hasattr(conn, "ping"):  # mysql.connector
+                conn.ping(reconnect=False)
+            else:
+                conn.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                with self._lock:
+                    self.waits += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s (pool size {self.size}).")
+
+        if not self._is_alive(conn):
+            self._close_quietly(conn)
+            with self._lock:
+                self.reconnects += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+            self.checkouts += 1
+            self.total_checkout_time += elapsed
+            self.max_checkout_time = max(self.max_checkout_time, elapsed)
+        return conn
+
+    def release(self, conn, broken=False):
+        with self._lock:
+            self._in_use -= 1
+        if broken:
+            self._close_quietly(conn)
+            with self._lock:
+                self._created -= 1
+            return
+        try:
+            conn.rollback()  # never hand out a connection with an open transaction
+        except Exception:
+            self._close_quietly(conn)
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        with instrument.span("db"):
+            conn = self.acquire()
+            broken = False
+            try:
+                yield conn
+            except Exception as e:
+                broken = _is_connection_error(e)
+                raise
+            finally:
+                self.release(conn, broken=broken)
+
+    def sql(self, statement):
+        """Adapts a %s-style statement to this pool's parameter style."""
+        if self.paramstyle == "qmark":
+            return statement.replace("%s", "?")
+        return statement
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "peak_in_use": self.peak_in_use,
+                "saturation": self._in_use / self.size if self.size else 0.0,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "avg_checkout_ms": (self.total_checkout_time / self.checkouts * 1000) if self.checkouts else 0.0,
+                "max_checkout_ms": self.max_checkout_time * 1000,
+            }
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(conn)
+            with self._lock:
+                self._created -= 1
+
+
+def _is_connection_error(exc):
+    try:
+        import mysql.connector
+        if isinstance(exc, (mysql.connector.OperationalError, mysql.connector.InterfaceError)):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, sqlite3.OperationalError) and "closed" in str(exc)
+
+
+def mysql_pool(config=None, size=POOL_SIZE):
+    import mysql.connector
+
+    cfg = dict(config or DB_CONFIG)
+    return ConnectionPool(lambda: mysql.connector.connect(**cfg), size=size, paramstyle="format", dialect="mysql")
+
+
+def sqlite_pool(path, size=POOL_SIZE):
+    """A pool over a SQLite file, used as a local stand-in for MySQL."""
+    return ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), size=size, paramstyle="qmark", dialect="sqlite")
+
+
+# --- Process-wide Pool ---
+# Streamlit re-runs the app script on every interaction but keeps imported modules,
+# so the pool below is created once per server process and shared by all sessions.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                sqlite_path = os.environ.get("BIZPULSE_SQLITE_PATH")
+                _pool = sqlite_pool(sqlite_path) if sqlite_path else mysql_pool()
+    return _pool
+
+
+def set_pool(pool):
+    """Replaces the process-wide pool (e.g. with a SQLite pool for local testing)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+def sql(statement):
+    return get_pool().sql(statement)
+
+
+def pool_metrics():
+    return get_pool().metrics()
+
+
+# --- Upload Log Queries ---
+# Served by the (username, upload_time) index from migration 2, so none of
+# these read more than the rows they return.
+UPLOAD_HISTORY_PAGE_SIZE = 20
+
+
+def _fetch(statement, params, one=False):
+    with connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute(sql(statement), params)
+            return c.fetchone() if one else c.fetchall()
+        finally:
+            c.close()
+
+
+def count_uploads(username):
+    return _fetch("SELECT COUNT(*) FROM user_uploads WHERE username=%s", (username,), one=True)[0]
+
+
+def latest_upload(username):
+    """Returns (filename, upload_time) of the user's newest upload, or None."""
+    return _fetch(
+        "SELECT filename, upload_time FROM user_uploads WHERE username=%s "
+        "ORDER BY upload_time DESC, id DESC LIMIT 1",
+        (username,), one=True)
+
+
+def upload_history(username, limit=UPLOAD_HISTORY_PAGE_SIZE, before=None):
+    """Returns (rows, next_cursor) for one page of uploads, newest first.
+
+    Keyset pagination: pass the returned cursor as `before` to get the next (older)
+    page; next_cursor is None on the last page. Rows are (id, filename, upload_time).
+    """
+    if before is None:
+        rows = _fetch(
+            "SELECT id, filename, upload_time FROM user_uploads WHERE username=%s "
+            "ORDER BY upload_time DESC, id DESC LIMIT %s",
+            (username, limit + 1))
+    else:
+        before_time, before_id = before
+        rows = _fetch(
+            "SELECT id, filename, upload_time FROM user_uploads WHERE username=%s "
+            "AND (upload_time < %s OR (upload_time = %s AND id < %s)) "
+            "ORDER BY upload_time DESC, id DESC LIMIT %s",
+            (username, before_time, before_time, before_id, limit + 1))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last[2], last[0])
+    return rows, None
+
+
+def uploaded_filenames(username):
+    """Distinct filenames the user has uploaded, oldest first."""
+    rows = _fetch(
+        "SELECT filename, MIN(upload_time) AS first_upload FROM user_uploads WHERE username=%s "
+        "GROUP BY filename ORDER BY first_upload",
+        (username,))
+    return [row[0] for row in rows]
+
+
+# --- Content-addressed Upload Mapping ---
+# upload_files maps each (username, filename) to the content hash it currently
+# holds (migration 4); the bytes live once per user and hash in storage.py's object store.
+_UPSERT_UPLOAD_FILE = {
+    "mysql": "INSERT INTO upload_files (username, filename, content_hash, size, updated_at) VALUES (%s, %s, %s, %s, %s) "
+             "ON DUPLICATE KEY UPDATE content_hash=VALUES(content_hash), size=VALUES(size), updated_at=VALUES(updated_at)",
+    "sqlite": "INSERT INTO upload_files (username, filename, content_hash, size, updated_at) VALUES (%s, %s, %s, %s, %s) "
+              "ON CONFLICT (username, filename) DO UPDATE SET content_hash=excluded.content_hash, "
+              "size=excluded.size, updated_at=excluded.updated_at",
+}
+
+
+def log_upload(username, filename, content_hash, size, when):
+    """Records an upload in the log and points username/filename at its content, in one transaction."""
+    pool = get_pool()
+    with pool.connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute(pool.sql("INSERT INTO user_uploads (username, filename, upload_time, content_hash) VALUES (%s, %s, %s, %s)"),
+                      (username, filename, when, content_hash))
+            c.execute(pool.sql(_UPSERT_UPLOAD_FILE[pool.dialect]), (username, filename, content_hash, size, when))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            c.close()
+
+
+def upload_file_hash(username, filename):
+    """The content hash username/filename currently points at, or None."""
+    row = _fetch("SELECT content_hash FROM upload_files WHERE username=%s AND filename=%s", (username, filename), one=True)
+    return row[0] if row else None
+
+
+def upload_file_hashes(username):
+    """{filename: content hash} for every file of the user stored by content."""
+    return dict(_fetch("SELECT filename, content_hash FROM upload_files WHERE username=%s", (username,)))
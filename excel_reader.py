@@ -0,0 +1,128 @@
+import os
+
+import pandas as pd
+
+from data_processor import ALWAYS_CATEGORY_COLUMNS, COLUMN_ALIASES, canonical_column
+
+# .xlsx ingestion. Workbooks are opened with openpyxl in read-only mode, which
+# streams each sheet's XML row by row instead of building the whole cell tree
+# (a fully loaded workbook takes several times the file size in memory). Rows are
+# turned into DataFrames CHUNK_ROWS at a time, with Product/Region/Category stored
+# as categoricals per chunk. Large workbooks (aggregates.streams) are aggregated
+# chunk by chunk like large CSVs; read_sales_excel, for the rest, holds one chunk
+# of Python values plus the compact frame built so far. Column types are inferred
+# per chunk; clean_sales_data turns the key columns into text on every path, so a
+# chunk of numeric IDs and one of "C-001" IDs still group together.
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+CHUNK_ROWS = 50_000
+HEADER_SCAN_ROWS = 20 # title rows, notes and blank lines above the header are skipped
+
+
+def is_excel(file_path):
+    return os.path.splitext(str(file_path))[1].lower() in EXCEL_EXTENSIONS
+
+
+def _open(file_path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Excel uploads need the 'openpyxl' package, which is not installed.") from None
+    try:
+        return load_workbook(file_path, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Cannot open the Excel workbook: {e}") from None
+
+
+def _header_score(row):
+    return sum(1 for cell in row if cell is not None and canonical_column(cell) in COLUMN_ALIASES)
+
+
+def _detect_table(workbook):
+    """(sheet name, 1-based header row) of the sheet whose header looks most like sales data.
+
+    Falls back to the first non-empty row of the first non-empty sheet.
+    """
+    best, fallback = None, None
+    for sheet in workbook.worksheets:
+        for number, row in enumerate(sheet.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True), start=1):
+            if not any(cell is not None for cell in row):
+                continue
+            if fallback is None:
+                fallback = (sheet.title, number)
+            score = _header_score(row)
+            if score and (best is None or score > best[0]):
+                best = (score, sheet.title, number)
+    if best is not None:
+        return best[1], best[2]
+    if fallback is None:
+        raise ValueError("The Excel workbook has no data.")
+    return fallback
+
+
+def _header_names(row):
+    """Column names for a header row; unnamed cells get pandas-style "Unnamed: i" names."""
+    names = [str(cell).strip() if cell is not None else f"Unnamed: {i}" for i, cell in enumerate(row)]
+    while names and names[-1].startswith("Unnamed: "):
+        names.pop() # formatting often extends the used range past the last column
+    return names
+
+
+def _frame(rows, columns):
+    df = pd.DataFrame.from_records(rows, columns=columns).infer_objects()
+    for col in df.columns:
+        if canonical_column(col) in ALWAYS_CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def iter_excel_chunks(file_path, chunk_rows=CHUNK_ROWS, nrows=None):
+    """Yields (DataFrame, fraction of the sheet read) for the detected sales table.
+
+    Fully blank rows are skipped; cells beyond the header's columns are ignored.
+    Raises ValueError if the workbook cannot be read or has no data.
+    """
+    workbook = _open(file_path)
+    try:
+        sheet_name, header_row = _detect_table(workbook)
+        sheet = workbook[sheet_name]
+        rows = sheet.iter_rows(min_row=header_row, values_only=True)
+        columns = _header_names(next(rows))
+        width = len(columns)
+        total = max((sheet.max_row or 0) - header_row, 0) # from the sheet's stored dimensions, if any
+        seen, batch = 0, []
+        for row in rows:
+            if nrows is not None and seen >= nrows:
+                break
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if not any(cell is not None for cell in row):
+                continue
+            batch.append(row)
+            seen += 1
+            if len(batch) >= chunk_rows:
+                yield _frame(batch, columns), min(seen / total, 1.0) if total else None
+                batch = []
+        if batch or not seen:
+            yield _frame(batch, columns), 1.0
+    finally:
+        workbook.close()
+
+
+def _concat(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    # Categoricals with differing categories would be concatenated as object columns,
+    # so they are merged separately with union_categoricals
+    columns = chunks[0].columns
+    categorical = [col for col in columns if isinstance(chunks[0][col].dtype, pd.CategoricalDtype)]
+    combined = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    for col in categorical:
+        combined[col] = pd.api.types.union_categoricals([chunk[col] for chunk in chunks], ignore_order=True)
+    return combined[columns]
+
+
+def read_sales_excel(file_path, nrows=None):
+    """The sales table of an .xlsx upload as a raw frame, like data_processor.read_sales_csv.
+
+    Raises ValueError if the workbook cannot be read or has no data.
+    """
+    return _concat([chunk for chunk, _ in iter_excel_chunks(file_path, nrows=nrows)])
@@ -0,0 +1,267 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import instrument
+import memo
+import upload_cache
+from data_processor import CUSTOMER_ID_COL, ORDER_DATE_COL, PRODUCT_COL, QUANTITY_COL, REGION_COL
+
+# Dashboard filters (date range, regions, products) answered from an index built
+# once per prepared frame instead of re-running cleaning and groupbys:
+#   - rows are stored sorted by order date, so a date range is two binary searches
+#     (np.searchsorted) giving one contiguous slice;
+#   - Product/Region/Customer are int32 category codes, and a region/product
+#     selection is a boolean lookup table indexed by code (a bitmap over the
+#     categories), so the row mask is a single gather;
+#   - the filtered cube, daily series, customer counts and customer x month activity
+#     are np.bincount calls over precomputed composite codes.
+# A filter interaction therefore costs O(rows in range), with no parsing or hashing.
+INDEX_CACHE_BYTES = int(os.environ.get("BIZPULSE_FILTER_INDEX_CACHE_MB", "512")) * 1024 * 1024
+FILTERED_CACHE_BYTES = int(os.environ.get("BIZPULSE_FILTERED_CACHE_MB", "64")) * 1024 * 1024
+index_cache = memo.LRUCache(INDEX_CACHE_BYTES)
+filtered_cache = memo.LRUCache(FILTERED_CACHE_BYTES)
+
+# bincount needs one slot per possible (month, product, region) or (customer, month);
+# beyond this the codes are grouped with np.unique instead
+MAX_DENSE_CUBE_CELLS = 4_000_000
+
+
+def _group_sums(codes, cells, *weights):
+    """(present codes, row counts, *weight sums) per code in range(cells)."""
+    if cells <= MAX_DENSE_CUBE_CELLS:
+        counts = np.bincount(codes, minlength=cells)
+        present = np.flatnonzero(counts)
+        sums = [np.bincount(codes, weights=w, minlength=cells)[present] for w in weights]
+        return (present, counts[present], *sums)
+    present, inverse = np.unique(codes, return_inverse=True)
+    return (present, np.bincount(inverse), *[np.bincount(inverse, weights=w) for w in weights])
+
+
+def _codes(series):
+    """(int32 codes, categories, missing code) for a column.
+
+    Missing values get their own "Unknown" category so they can be filtered on;
+    its code is returned (-1 if nothing is missing) so aggregates can leave those
+    rows out where build_aggregates does.
+    """
+    categorical = pd.Categorical(series)
+    codes = categorical.codes.astype(np.int32)
+    categories = pd.Index(categorical.categories)
+    missing = -1
+    if (codes < 0).any():
+        missing = len(categories)
+        codes = np.where(codes < 0, missing, codes).astype(np.int32)
+        categories = categories.append(pd.Index([aggregates.UNKNOWN]))
+    return codes, categories, missing
+
+
+def _labels(idx, categories, missing):
+    """Categorical of category positions, with the missing code back as NaN (as in build_aggregates' cube)."""
+    if missing >= 0:
+        idx = np.where(idx == missing, -1, idx)
+    return pd.Categorical.from_codes(idx, categories=categories)
+
+
+class FilterIndex:
+    """Sorted, code-based view of a prepared frame for fast filtered aggregates."""
+
+    def __init__(self, df, meta):
+        self.meta = {k: meta[k] for k in ("dropped_numeric", "dropped_dates", "has_dates") if k in meta}
+        self.has_dates = bool(meta.get("has_dates", True)) and ORDER_DATE_COL in df.columns
+        self.rows = len(df)
+
+        if self.has_dates:
+            days = df[ORDER_DATE_COL].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+            order = np.argsort(days, kind="stable")
+            self.days = days[order] # sorted, for searchsorted
+            months = self.days.astype("datetime64[M]")
+            self.month_origin = months[0] if len(months) else np.datetime64("1970-01", "M")
+            self.month_codes = (months - self.month_origin).astype(np.int32)
+            self.day_origin = self.days[0] if len(self.days) else np.datetime64("1970-01-01", "D")
+            self.day_codes = (self.days - self.day_origin).astype(np.int32)
+        else:
+            order = np.arange(len(df))
+            self.days = None
+            self.month_codes = np.zeros(len(df), dtype=np.int32)
+        self.n_months = int(self.month_codes.max()) + 1 if len(df) else 1
+
+        def column_codes(col):
+            if col not in df.columns:
+                return np.zeros(len(df), dtype=np.int32), pd.Index([aggregates.UNKNOWN]), -1, False
+            codes, categories, missing = _codes(df[col])
+            return codes[order], categories, missing, True
+
+        self.product_codes, self.products, self.product_missing, self.has_product = column_codes(PRODUCT_COL)
+        self.region_codes, self.regions, self.region_missing, self.has_region = column_codes(REGION_COL)
+        self.customer_codes, self.customers, self.customer_missing, self.has_customer = column_codes(CUSTOMER_ID_COL)
+        self.revenue = df["Total Revenue"].to_numpy(dtype="float64")[order]
+        self.quantity = df[QUANTITY_COL].to_numpy(dtype="float64")[order]
+        self.cube_codes = ((self.month_codes.astype(np.int64) * len(self.products) + self.product_codes)
+                           * len(self.regions) + self.region_codes)
+
+    @property
+    def nbytes(self):
+        arrays = [self.month_codes, self.product_codes, self.region_codes, self.customer_codes,
+                  self.revenue, self.quantity, self.cube_codes]
+        if self.has_dates:
+            arrays += [self.days, self.day_codes]
+        return int(sum(a.nbytes for a in arrays))
+
+    def _months(self, month_idx):
+        return pd.to_datetime((self.month_origin + month_idx.astype("timedelta64[M]")).astype("datetime64[ns]"))
+
+    def _selection(self, start, end, regions, products):
+        """(slice, mask or None) of the sorted rows matching the filters."""
+        lo, hi = 0, self.rows
+        if self.has_dates:
+            if start is not None:
+                lo = int(np.searchsorted(self.days, np.datetime64(start, "D"), side="left"))
+            if end is not None:
+                hi = int(np.searchsorted(self.days, np.datetime64(end, "D"), side="right"))
+        window = slice(lo, max(lo, hi))
+        mask = None
+        for selected, categories, codes in ((regions, self.regions, self.region_codes),
+                                            (products, self.products, self.product_codes)):
+            if selected:
+                positions = categories.get_indexer(list(selected))
+                allowed = np.zeros(len(categories), dtype=bool)
+                allowed[positions[positions >= 0]] = True # -1 = not in this file
+                part = allowed[codes[window]]
+                mask = part if mask is None else mask & part
+        return window, mask
+
+    def aggregate(self, start=None, end=None, regions=None, products=None):
+        """Aggregates for the matching rows, shaped like aggregates.build_aggregates output."""
+        window, mask = self._selection(start, end, regions, products)
+
+        def pick(array):
+            part = array[window]
+            return part if mask is None else part[mask]
+
+        revenue, quantity = pick(self.revenue), pick(self.quantity)
+        cube_codes = pick(self.cube_codes)
+        n_products, n_regions = len(self.products), len(self.regions)
+
+        present, orders, revenue_sums, quantity_sums = _group_sums(
+            cube_codes, self.n_months * n_products * n_regions, revenue, quantity)
+
+        region_idx = present % n_regions
+        product_idx = (present // n_regions) % n_products
+        month_idx = present // (n_regions * n_products)
+        if self.has_dates:
+            months = self._months(month_idx)
+        else:
+            months = pd.Series(pd.NaT, index=range(len(present)), dtype="datetime64[ns]")
+        cube = pd.DataFrame({
+            "Month": months,
+            PRODUCT_COL: _labels(product_idx, self.products, self.product_missing),
+            REGION_COL: _labels(region_idx, self.regions, self.region_missing),
+            "Total Revenue": revenue_sums,
+            "Quantity": quantity_sums,
+            "Orders": orders,
+        })
+
+        # Rows without a Customer Id count for revenue but not as a customer, like build_aggregates
+        customers = None
+        if self.has_customer:
+            customer_codes = pick(self.customer_codes)
+            counts = np.bincount(customer_codes, minlength=len(self.customers))
+            if self.customer_missing >= 0:
+                counts[self.customer_missing] = 0
+            present_customers = np.flatnonzero(counts)
+            customers = pd.DataFrame({
+                CUSTOMER_ID_COL: self.customers[present_customers],
+                "Orders": counts[present_customers],
+            })
+
+        daily = None
+        if self.has_dates:
+            day_codes = pick(self.day_codes)
+            if len(day_codes):
+                day_orders = np.bincount(day_codes)
+                present_days = np.flatnonzero(day_orders)
+                daily = pd.DataFrame({
+                    "Date": (self.day_origin + present_days.astype("timedelta64[D]")).astype("datetime64[ns]"),
+                    "Total Revenue": np.bincount(day_codes, weights=revenue)[present_days],
+                    "Orders": day_orders[present_days],
+                })
+
+        activity = None
+        if self.has_customer and daily is not None:
+            activity_codes = customer_codes.astype(np.int64) * self.n_months + pick(self.month_codes)
+            activity_revenue = revenue
+            if self.customer_missing >= 0:
+                known = customer_codes != self.customer_missing
+                activity_codes, activity_revenue = activity_codes[known], revenue[known]
+            present, orders, revenue_sums = _group_sums(activity_codes, len(self.customers) * self.n_months, activity_revenue)
+            activity = pd.DataFrame({
+                CUSTOMER_ID_COL: self.customers[present // self.n_months],
+                "Month": self._months(present % self.n_months),
+                "Total Revenue": revenue_sums,
+                "Orders": orders,
+            })
+
+        meta = dict(self.meta, version=aggregates.AGGREGATES_VERSION, rows=int(len(revenue)),
+                    has_product=self.has_product, has_region=self.has_region,
+                    has_customer=self.has_customer, has_daily=daily is not None,
+                    has_activity=activity is not None)
+        return aggregates.Aggregates(cube, customers, meta, daily, activity)
+
+
+def _members(aggs, col):
+    if not aggs.meta.get(f"has_{col.lower()}"):
+        return None
+    values = aggs.cube[col]
+    members = sorted(values.dropna().unique().tolist(), key=str)
+    if values.isna().any():
+        members.append(aggregates.UNKNOWN) # as FilterIndex names missing values
+    return members
+
+
+def options(aggs):
+    """(date bounds, regions, products) for the filter widgets, read from an upload's
+    unfiltered aggregates so nothing is loaded before a filter is set.
+
+    Bounds are (first, last) order date as datetime.date, or None without dates;
+    regions/products are None if the file has no such column.
+    """
+    bounds = None
+    if aggs.daily is not None and len(aggs.daily):
+        bounds = aggs.daily["Date"].min().date(), aggs.daily["Date"].max().date()
+    return bounds, _members(aggs, REGION_COL), _members(aggs, PRODUCT_COL)
+
+
+def get_index(file_path):
+    """The memoized FilterIndex for an upload (not for streaming-size files).
+
+    Raises ValueError if the file cannot be cleaned.
+    """
+    digest = upload_cache.content_hash(file_path)
+
+    def compute():
+        prepared = aggregates.get_prepared(file_path)
+        with instrument.span("filter_index:build"):
+            return FilterIndex(prepared.df, prepared.report)
+
+    return index_cache.get_or_compute(upload_cache.cache_key(file_path, digest), compute)
+
+
+def filtered_aggregates(file_path, start=None, end=None, regions=(), products=()):
+    """Aggregates of an upload restricted to the given filters (memoized per filter state)."""
+    digest = upload_cache.content_hash(file_path)
+    key = (upload_cache.cache_key(file_path, digest), start, end, tuple(sorted(regions)), tuple(sorted(products)))
+
+    def compute():
+        index = get_index(file_path)
+        with instrument.span("filter_index:query"):
+            return index.aggregate(start, end, regions, products)
+
+    return filtered_cache.get_or_compute(key, compute)
+
+
+def supports(file_path):
+    """True if filters can be indexed for this file (it is small enough to load whole)."""
+    return not aggregates.streams(file_path)
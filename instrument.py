@@ -0,0 +1,176 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# Lightweight timers and counters for the hot paths (file load, cleaning, groupbys,
+# chart construction, DB calls). Disabled by default: span() then returns a shared
+# no-op context manager and count() returns immediately, so instrumented code pays
+# one attribute check per call. Enable with BIZPULSE_PROFILE=1 or set_enabled(True).
+#
+# Each Streamlit script run records into its own Trace (start_run); spans outside a
+# run (e.g. background upload jobs) still feed the process-wide totals().
+enabled = os.environ.get("BIZPULSE_PROFILE", "0") == "1"
+TRACE_DIR = os.environ.get("BIZPULSE_TRACE_DIR") # if set, every finished run is written here
+
+_current = contextvars.ContextVar("bizpulse_trace", default=None)
+_totals = {} # span name -> [calls, total seconds]
+_totals_lock = threading.Lock()
+
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+
+
+class Trace:
+    """Spans, counters and notes recorded during one script run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = [] # (name, start offset s, duration s, depth, thread id)
+        self.counters = {}
+        self.notes = [] # (offset s, message)
+        self.depth = 0
+        self.duration = None
+
+    def breakdown(self):
+        """Per span name: calls, total and max milliseconds, slowest first."""
+        rows = {}
+        for name, _, duration, _, _ in self.spans:
+            row = rows.setdefault(name, {"span": name, "calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            row["calls"] += 1
+            row["total_ms"] += duration * 1000
+            row["max_ms"] = max(row["max_ms"], duration * 1000)
+        return sorted(rows.values(), key=lambda r: r["total_ms"], reverse=True)
+
+    def to_chrome_trace(self):
+        """The run in Chrome trace-event format (open in chrome://tracing or Perfetto)."""
+        base_us = self.wall_started * 1e6
+        events = [{"name": name, "ph": "X", "ts": base_us + start * 1e6, "dur": duration * 1e6,
+                   "pid": os.getpid(), "tid": tid, "args": {"depth": depth}}
+                  for name, start, duration, depth, tid in self.spans]
+        events += [{"name": message, "ph": "i", "s": "t", "ts": base_us + offset * 1e6,
+                    "pid": os.getpid(), "tid": threading.get_ident()}
+                   for offset, message in self.notes]
+        events += [{"name": name, "ph": "C", "ts": base_us, "pid": os.getpid(), "args": {"value": value}}
+                   for name, value in self.counters.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run": self.name}}
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+class _Span:
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name, trace):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        duration = end - self.start
+        with _totals_lock:
+            total = _totals.setdefault(self.name, [0, 0.0])
+            total[0] += 1
+            total[1] += duration
+        trace = self.trace
+        if trace is not None:
+            trace.depth -= 1
+            trace.spans.append((self.name, self.start - trace.started, duration, trace.depth, threading.get_ident()))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing the enclosed block under `name` (no-op when disabled)."""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, _current.get())
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, _current.get()):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Adds n to a counter of the current run."""
+    if not enabled:
+        return
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + n
+
+
+def note(message):
+    """Records a timestamped message in the current run (replaces sidebar debug output)."""
+    if not enabled:
+        return
+    trace = _current.get()
+    if trace is not None:
+        trace.notes.append((time.perf_counter() - trace.started, message))
+
+
+def start_run(name="run"):
+    """Begins a new Trace for this script run and returns it (None when disabled)."""
+    if not enabled:
+        _current.set(None)
+        return None
+    trace = Trace(name)
+    _current.set(trace)
+    return trace
+
+
+def finish_run():
+    """Ends the current run; writes its trace to TRACE_DIR if configured. Returns the Trace."""
+    trace = _current.get()
+    if trace is None:
+        return None
+    trace.duration = time.perf_counter() - trace.started
+    if TRACE_DIR:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        trace.export(os.path.join(TRACE_DIR, f"trace-{int(trace.wall_started * 1000)}-{trace.name}.json"))
+    return trace
+
+
+def current_run():
+    return _current.get()
+
+
+def totals():
+    """Process-wide calls and seconds per span name, including background jobs."""
+    with _totals_lock:
+        return {name: {"calls": calls, "total_ms": seconds * 1000} for name, (calls, seconds) in _totals.items()}
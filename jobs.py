@@ -0,0 +1,138 @@
+import itertools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import aggregates
+import cumulative
+import storage
+import validation
+
+# Uploads are processed off the Streamlit script run by a small worker pool shared
+# by all sessions of this server process. The page only saves the file, submits a
+# job and polls its status, so a large upload never blocks anyone's dashboard.
+JOB_WORKERS = int(os.environ.get("BIZPULSE_JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = 3600 # finished jobs are forgotten after this long
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    def __init__(self, job_id, user, file_path, filename=None):
+        self.id = job_id
+        self.user = user
+        self.file_path = file_path
+        self.filename = filename or os.path.basename(file_path)
+        self.status = QUEUED
+        self.stage = "Waiting for a worker"
+        self.progress = 0.0
+        self.warnings = []
+        self.error = None
+        self.traceback = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def update(self, stage=None, progress=None):
+        if stage is not None:
+            self.stage = stage
+        if progress is not None:
+            self.progress = progress
+
+
+_executor = None
+_jobs = {}
+_jobs_lock = threading.Lock()
+_job_ids = itertools.count(1)
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="bizpulse-job")
+        return _executor
+
+
+def _prune():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id in [j.id for j in _jobs.values() if j.finished and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def _validate(job):
+    # The Upload page validates before saving; this covers files placed by other means
+    report = validation.validate_upload(job.file_path)
+    if not report.ok:
+        raise ValueError(report.summary())
+    job.warnings.extend(issue.message for issue in report.warnings)
+
+
+def _run_upload_job(job):
+    job.status = RUNNING
+    try:
+        if aggregates.is_computed(job.file_path):
+            # The user uploaded identical content before (under any filename): nothing to parse
+            job.update("Already processed", 0.9)
+        else:
+            job.update("Validating", 0.05)
+            _validate(job)
+
+            job.update("Building aggregates", 0.1)
+            # Streaming builds report file progress; map it onto 10%-90% of the job
+            aggregates.get_aggregates(job.file_path, progress=lambda f: job.update(progress=0.1 + 0.8 * f))
+
+        job.update("Merging into all-uploads totals", 0.9)
+        cumulative.add_upload(storage.user_dir(job.user), job.filename, job.file_path)
+
+        job.update("Done", 1.0)
+        job.status = DONE
+    except ValueError as e:
+        # The upload replaced whatever the user had under this name, so that leaves the totals
+        cumulative.remove_upload(storage.user_dir(job.user), job.filename)
+        job.error = str(e)
+        job.status = FAILED
+    except Exception as e:
+        job.error = f"Unexpected error: {e}"
+        job.traceback = traceback.format_exc()
+        job.status = FAILED
+    finally:
+        job.finished_at = time.time()
+
+
+def submit_upload(user, file_path, filename=None):
+    """Queues validation and aggregate precomputation for a saved upload; returns the Job.
+
+    filename is the user's name for the upload (defaults to the file's own name).
+    """
+    with _jobs_lock:
+        _prune()
+        job = Job(next(_job_ids), user, file_path, filename)
+        _jobs[job.id] = job
+    _get_executor().submit(_run_upload_job, job)
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def user_jobs(user):
+    """Jobs of one user, newest first."""
+    with _jobs_lock:
+        return sorted((j for j in _jobs.values() if j.user == user), key=lambda j: j.submitted_at, reverse=True)
+
+
+def active_job_for(file_path):
+    """The unfinished job processing file_path, if any."""
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.file_path == file_path and not job.finished:
+                return job
+    return None
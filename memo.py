@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def estimate_size(value):
+    """Approximate in-memory size of a cached value, in bytes."""
+    if hasattr(value, "nbytes") and not isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.nbytes)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """A thread-safe LRU cache bounded by the total estimated size of its values.
+
+    Entries are evicted least-recently-used first once `max_bytes` is exceeded;
+    a single value larger than the whole budget is returned but never stored.
+    """
+
+    def __init__(self, max_bytes, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict() # key -> (value, size)
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._pop(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def discard(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_MISSING = object()
+
+
+class UserKeyedCache(LRUCache):
+    """LRU cache whose keys are (user, name, *args), invalidated per user on events.
+
+    Replaces TTL caching for per-user data: entries stay valid until something
+    changes that user's data (e.g. an upload) and invalidate_user() is called,
+    which drops only that user's entries. Hit/miss counters are also kept per
+    name so each cached query's hit rate can be reported.
+    """
+
+    def __init__(self, max_bytes, sizeof=estimate_size):
+        super().__init__(max_bytes, sizeof)
+        self._user_keys = {} # user -> set of keys
+        self._name_counts = {} # name -> [hits, misses]
+        self._generations = {} # user -> invalidation count, guards against stale puts
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        with self._lock:
+            counts = self._name_counts.setdefault(key[1], [0, 0])
+            counts[0 if value is not _MISSING else 1] += 1
+        return default if value is _MISSING else value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            with self._lock:
+                generation = self._generations.get(key[0], 0)
+            value = compute()
+            with self._lock:
+                # Skip the store if the user was invalidated while computing
+                if self._generations.get(key[0], 0) == generation:
+                    self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        super().put(key, value)
+        with self._lock:
+            if key in self._entries:
+                self._user_keys.setdefault(key[0], set()).add(key)
+
+    def _pop(self, key):
+        super()._pop(key)
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def invalidate_user(self, user):
+        with self._lock:
+            self._generations[user] = self._generations.get(user, 0) + 1
+            for key in list(self._user_keys.get(user, ())):
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        result = super().stats()
+        with self._lock:
+            result["users"] = len(self._user_keys)
+            result["by_name"] = {
+                name: {"hits": h, "misses": m, "hit_rate": h / (h + m) if h + m else 0.0}
+                for name, (h, m) in self._name_counts.items()
+            }
+        return result
+
+
+# Process-wide cache for per-user query results and derived aggregates
+USER_CACHE_BYTES = int(os.environ.get("BIZPULSE_USER_CACHE_MB", "256")) * 1024 * 1024
+user_cache = UserKeyedCache(USER_CACHE_BYTES)
+
+
+def cached_for_user(user, name, compute, *args):
+    """Returns user_cache[(user, name, *args)], computing it on a miss."""
+    return user_cache.get_or_compute((user, name) + args, compute)
+
+
+def invalidate_user(user):
+    """Event hook: call whenever a user's uploads change."""
+    user_cache.invalidate_user(user)
@@ -0,0 +1,223 @@
+import threading
+from datetime import datetime
+
+import db
+
+
+def _has_index(c, pool, table, index):
+    if pool.dialect == "sqlite":
+        c.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?", (table, index))
+    else:
+        c.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                  "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s", (table, index))
+    return c.fetchone()[0] > 0
+
+
+def _has_column(c, pool, table, column):
+    if pool.dialect == "sqlite":
+        c.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in c.fetchall())
+    c.execute("SELECT COUNT(*) FROM information_schema.columns "
+              "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s", (table, column))
+    return c.fetchone()[0] > 0
+
+
+def _unless_index(table, index, statement):
+    """A guarded step: runs `statement` only if `table` has no index named `index`."""
+    return (lambda c, pool: _has_index(c, pool, table, index)), statement
+
+
+def _unless_column(table, column, statement):
+    """A guarded step: runs `statement` only if `table` has no column named `column`."""
+    return (lambda c, pool: _has_column(c, pool, table, column)), statement
+
+# Ordered schema migrations. Each entry is (version, description, statements), where
+# statements maps a pool dialect ("mysql" / "sqlite") to the SQL to run. Applied
+# versions are recorded in schema_version, so each migration runs exactly once per
+# database. Never edit an applied migration; append a new one instead.
+#
+# MySQL commits DDL implicitly, so a migration that fails halfway (or runs in two
+# server processes starting at once) can leave some of its statements applied
+# without its schema_version row. Statements that are not idempotent by themselves
+# are therefore wrapped as guarded steps (see _unless_index/_unless_column), which
+# check information_schema (or SQLite's catalog) and skip what already exists.
+MIGRATIONS = [
+    (1, "Baseline users, user_uploads and uploaded_files tables", {
+        "mysql": [
+            """CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(255) NOT NULL UNIQUE,
+                password VARCHAR(255) NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS user_uploads (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(255) NOT NULL,
+                filename VARCHAR(255) NOT NULL,
+                upload_time DATETIME NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS uploaded_files (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(255) NOT NULL,
+                filename VARCHAR(255) NOT NULL,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""",
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password TEXT NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS user_uploads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                upload_time TIMESTAMP NOT NULL
+            )""",
+            """CREATE TABLE IF NOT EXISTS uploaded_files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""",
+        ],
+    }),
+    # InnoDB secondary indexes (and SQLite indexes, via rowid) already end with the
+    # primary key, so this index also covers the (upload_time, id) keyset ordering.
+    (2, "Composite index for per-user upload history", {
+        "mysql": [_unless_index("user_uploads", "idx_user_uploads_user_time",
+                                "CREATE INDEX idx_user_uploads_user_time ON user_uploads (username, upload_time)")],
+        "sqlite": [_unless_index("user_uploads", "idx_user_uploads_user_time",
+                                 "CREATE INDEX idx_user_uploads_user_time ON user_uploads (username, upload_time)")],
+    }),
+    # user_uploads predates these migrations on existing MySQL servers, where migration
+    # 1's CREATE TABLE IF NOT EXISTS left it without the id that upload history orders
+    # and pages by. SQLite databases are always created by migration 1, so have it.
+    (3, "Add user_uploads.id to tables created before migrations", {
+        "mysql": [_unless_column("user_uploads", "id",
+                                 "ALTER TABLE user_uploads ADD COLUMN id INT AUTO_INCREMENT PRIMARY KEY FIRST")],
+        "sqlite": [],
+    }),
+    # Uploads are stored once per content (see storage.py); each user's filenames
+    # point at a content hash, and the upload log records which content each upload had.
+    (4, "Per-user filename -> content hash mapping for content-addressed uploads", {
+        "mysql": [
+            """CREATE TABLE IF NOT EXISTS upload_files (
+                username VARCHAR(255) NOT NULL,
+                filename VARCHAR(255) NOT NULL,
+                content_hash CHAR(64) NOT NULL,
+                size BIGINT NOT NULL,
+                updated_at DATETIME NOT NULL,
+                PRIMARY KEY (username, filename)
+            )""",
+            _unless_index("upload_files", "idx_upload_files_hash",
+                          "CREATE INDEX idx_upload_files_hash ON upload_files (content_hash)"),
+            _unless_column("user_uploads", "content_hash",
+                           "ALTER TABLE user_uploads ADD COLUMN content_hash CHAR(64) NULL"),
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS upload_files (
+                username TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                updated_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (username, filename)
+            )""",
+            _unless_index("upload_files", "idx_upload_files_hash",
+                          "CREATE INDEX idx_upload_files_hash ON upload_files (content_hash)"),
+            _unless_column("user_uploads", "content_hash",
+                           "ALTER TABLE user_uploads ADD COLUMN content_hash TEXT"),
+        ],
+    }),
+]
+
+SCHEMA_VERSION_TABLE = {
+    "mysql": """CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )""",
+    "sqlite": """CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )""",
+}
+
+_migrated_pools = set()
+_migrate_lock = threading.Lock()
+
+
+def current_version(pool=None):
+    pool = pool or db.get_pool()
+    with pool.connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute(SCHEMA_VERSION_TABLE[pool.dialect])
+            conn.commit()
+            c.execute("SELECT MAX(version) FROM schema_version")
+            row = c.fetchone()
+        finally:
+            c.close()
+    return row[0] or 0
+
+
+def _run_step(c, pool, step):
+    if isinstance(step, str):
+        c.execute(step)
+        return
+    exists, statement = step
+    if exists(c, pool):
+        return
+    try:
+        c.execute(statement)
+    except Exception:
+        if not exists(c, pool): # created by a concurrent migration in the meantime?
+            raise
+
+
+def _is_recorded(c, pool, number):
+    try:
+        c.execute(pool.sql("SELECT COUNT(*) FROM schema_version WHERE version = %s"), (number,))
+        return c.fetchone()[0] > 0
+    except Exception:
+        return False
+
+
+def migrate(pool=None):
+    """Applies all pending migrations in order; returns the versions applied."""
+    pool = pool or db.get_pool()
+    applied = []
+    version = current_version(pool)
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        with pool.connection() as conn:
+            c = conn.cursor()
+            try:
+                for step in statements[pool.dialect]:
+                    _run_step(c, pool, step)
+                c.execute(pool.sql("INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)"),
+                          (number, description, datetime.now()))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                if _is_recorded(c, pool, number):
+                    continue # another server process applied it concurrently
+                raise
+            finally:
+                c.close()
+        applied.append(number)
+    return applied
+
+
+def ensure_migrated():
+    """Runs migrate() once per process for the shared pool."""
+    pool = db.get_pool()
+    if id(pool) in _migrated_pools:
+        return
+    with _migrate_lock:
+        if id(pool) not in _migrated_pools:
+            migrate(pool)
+            _migrated_pools.add(id(pool))
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import re
+import threading
+
+import db
+
+# Content-addressed upload storage. Upload bytes are written once per distinct
+# content and user under their SHA-256:
+#   uploads/<user>/.objects/<first 2 hex chars>/<sha256><ext>     e.g. .../3f/3f2a...c1.csv
+# and each user's filenames point at a hash in the upload_files table (migration 4).
+# Re-uploading identical content under the same or another name stores nothing new,
+# and since the derived caches (Parquet sidecar, aggregates, filter index) are keyed
+# by the hash within that directory, it is ready without any processing.
+# Deduplication is deliberately per user: sharing objects across users would let
+# anyone learn whether someone else had uploaded a given file, from whether their
+# own upload needed processing.
+# Uploads saved before this layout stay at uploads/<user>/<filename> and are still
+# found by upload_path().
+UPLOAD_ROOT = "uploads"
+OBJECTS_DIR_NAME = ".objects"
+BLOCK_SIZE = 8 * 1024 * 1024 # bytes hashed and written per block while storing
+
+_OBJECT_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+
+def user_dir(username):
+    """The user's directory (legacy uploads and per-user caches such as cumulative totals)."""
+    return os.path.join(UPLOAD_ROOT, username)
+
+
+def objects_dir(username):
+    return os.path.join(user_dir(username), OBJECTS_DIR_NAME)
+
+
+def _object_name(digest, filename):
+    return os.path.join(digest[:2], digest + os.path.splitext(filename)[1].lower())
+
+
+def object_path(username, digest, filename):
+    """Where the user's content `digest` uploaded as `filename` is stored (the extension picks the reader)."""
+    return os.path.join(objects_dir(username), _object_name(digest, filename))
+
+
+def digest_of(file_path):
+    """The content hash encoded in a stored object's path, or None for other files."""
+    if os.path.basename(os.path.dirname(os.path.dirname(file_path))) != OBJECTS_DIR_NAME:
+        return None
+    match = _OBJECT_NAME.match(os.path.basename(file_path))
+    return match.group(1) if match else None
+
+
+def store(fileobj, filename, username):
+    """Streams a user's uploaded file into their object store while hashing it.
+
+    Returns (digest, path, size, created); created is False when the user had
+    already stored identical content, in which case nothing new is kept.
+    """
+    directory = objects_dir(username)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"incoming.{os.getpid()}.{threading.get_ident()}.tmp")
+    h, size = hashlib.sha256(), 0
+    fileobj.seek(0)
+    try:
+        with open(tmp_path, "wb") as out:
+            for block in iter(lambda: fileobj.read(BLOCK_SIZE), b""):
+                h.update(block)
+                out.write(block)
+                size += len(block)
+        digest = h.hexdigest()
+        path = object_path(username, digest, filename)
+        if os.path.exists(path):
+            return digest, path, size, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path) # atomic: readers never see a partial object
+        return digest, path, size, True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _resolve(username, filename, digest):
+    if digest is not None:
+        path = object_path(username, digest, filename)
+        if os.path.exists(path):
+            return path
+    return os.path.join(user_dir(username), filename) # uploaded before content addressing
+
+
+def upload_path(username, filename):
+    """Path of the content username/filename currently refers to."""
+    return _resolve(username, filename, db.upload_file_hash(username, filename))
+
+
+def user_files(username):
+    """{filename: path} for every upload of the user, oldest first (one query for the mapping)."""
+    hashes = db.upload_file_hashes(username)
+    return {name: _resolve(username, name, hashes.get(name)) for name in db.uploaded_filenames(username)}
@@ -0,0 +1,33 @@
+import pandas as pd
+
+import aggregates
+from data_processor import clean_sales_data
+
+
+def _write(path, customers):
+    pd.DataFrame({
+        "Order Date": ["2024-01-05"] * len(customers),
+        "Customer ID": customers,
+        "Product": ["A"] * len(customers),
+        "Quantity": [1] * len(customers),
+        "Unit Price": [10.0] * len(customers),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_streamed_and_whole_file_builds_combine(tmp_path):
+    streamed, _ = aggregates.build_aggregates_streaming(_write(tmp_path / "a.csv", [101, 102]), chunk_rows=1)
+    whole = aggregates.build_aggregates(*clean_sales_data(pd.read_csv(_write(tmp_path / "b.csv", [101, 103]))))
+    combined = aggregates.combine_aggregates([streamed, whole])
+    assert combined.customer_split() == (2, 1)
+    assert combined.cohort_state()[0]["Orders"].sum() == 4
+    assert len(combined.activity) == 3
+
+
+def test_excel_streams_from_a_smaller_size(tmp_path, monkeypatch):
+    csv_path, xlsx_path = tmp_path / "a.csv", tmp_path / "a.xlsx"
+    csv_path.write_bytes(b"x" * 1000)
+    xlsx_path.write_bytes(b"x" * 1000)
+    monkeypatch.setattr(aggregates, "STREAMING_THRESHOLD_BYTES", 1000 * aggregates.EXCEL_SIZE_FACTOR)
+    assert not aggregates.streams(str(csv_path))
+    assert aggregates.streams(str(xlsx_path))
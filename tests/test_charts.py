@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+import charts
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[437], y[812] = 100.0, -100.0
+    keep = charts.lttb_indices(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert {437, 812} <= set(keep.tolist())
+
+
+def test_lttb_leaves_short_series_alone():
+    np.testing.assert_array_equal(charts.lttb_indices(np.arange(10), np.ones(10), 20), np.arange(10))
+    np.testing.assert_array_equal(charts.lttb_indices(np.arange(10), np.ones(10), 2), np.arange(10))
+
+
+def test_downsample_series_on_dates():
+    df = pd.DataFrame({"Period": pd.date_range("2020-01-01", periods=2000, freq="D"),
+                       "Total Revenue": np.random.default_rng(0).uniform(0, 10, 2000)})
+    reduced = charts.downsample_series(df.sample(frac=1, random_state=0), "Period", "Total Revenue", max_points=100)
+    assert len(reduced) == 100
+    assert reduced["Period"].is_monotonic_increasing
+    assert reduced["Period"].iloc[0] == df["Period"].iloc[0] and reduced["Period"].iloc[-1] == df["Period"].iloc[-1]
+    assert charts.downsample_series(df, "Period", "Total Revenue", max_points=5000) is df
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+import aggregates
+import cohorts
+from data_processor import prepare
+
+
+def _raw(seed, rows=1500, start="2024-01-01"):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Order Date": pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, 300, rows), unit="D"),
+        "Customer Id": [f"C{i}" for i in rng.integers(0, 200, rows)],
+        "Product": rng.choice(["A", "B", "C"], rows),
+        "Region": rng.choice(["North", "South"], rows),
+        "Quantity": rng.integers(1, 5, rows),
+        "Unit Price": rng.uniform(5, 50, rows).round(2),
+    })
+
+
+def _build(*raws):
+    prepared = prepare(pd.concat(raws, ignore_index=True))
+    return aggregates.build_aggregates(prepared.df, prepared.report)
+
+
+def _sorted(df, by):
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) or df[col].dtype == object:
+            df[col] = df[col].astype(str)
+    return df.sort_values(by).reset_index(drop=True)
+
+
+def _assert_same_state(actual, expected):
+    actual_customers, actual_matrix = actual.cohort_state()
+    expected_customers, expected_matrix = expected.cohort_state()
+    tm.assert_frame_equal(_sorted(actual_customers, ["Customer Id"]), _sorted(expected_customers, ["Customer Id"]),
+                          check_dtype=False, check_like=True)
+    tm.assert_frame_equal(_sorted(actual_matrix, cohorts.MATRIX_KEYS), _sorted(expected_matrix, cohorts.MATRIX_KEYS),
+                          check_dtype=False, check_like=True)
+    tm.assert_frame_equal(_sorted(actual.activity, cohorts.ACTIVITY_KEYS), _sorted(expected.activity, cohorts.ACTIVITY_KEYS),
+                          check_dtype=False, check_like=True)
+
+
+def test_folding_an_upload_matches_a_full_build():
+    # The second upload starts earlier, so many customers move to an earlier cohort
+    first, second = _raw(1, start="2024-06-01"), _raw(2, rows=400, start="2024-01-01")
+    combined = aggregates.combine_aggregates([_build(first), _build(second)])
+    _assert_same_state(combined, _build(first, second))
+
+
+def test_subtracting_an_upload_restores_the_state():
+    first, second = _raw(3), _raw(4, rows=400, start="2024-03-01")
+    total = aggregates.combine_aggregates([_build(first), _build(second)])
+    _assert_same_state(aggregates.subtract_aggregates(total, _build(second)), _build(first))
+
+
+def test_tables_from_state():
+    aggs = _build(_raw(5))
+    customers, matrix = aggs.cohort_state()
+    retention, revenue = cohorts.cohort_tables(matrix)
+    assert (retention[0] == 1.0).all()
+    assert np.isclose(revenue.sum().sum(), aggs.total_revenue)
+    scores = cohorts.rfm(customers)
+    assert len(scores) == aggs.activity["Customer Id"].nunique()
+    assert scores["Frequency"].sum() == aggs.total_orders
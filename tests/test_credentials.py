@@ -0,0 +1,43 @@
+import hashlib
+import threading
+
+import pytest
+
+import credentials
+
+
+def test_scrypt_round_trip():
+    stored = credentials.hash_password("correct horse", n=2 ** 10)
+    assert credentials.verify_password("correct horse", stored)
+    assert not credentials.verify_password("wrong horse", stored)
+
+
+def test_legacy_sha256_accepts_password():
+    stored = hashlib.sha256(b"correct horse").hexdigest()
+    assert credentials.verify_password("correct horse", stored)
+    assert not credentials.verify_password("wrong horse", stored)
+
+
+def test_legacy_sha256_rejects_typing_the_stored_hash():
+    stored = hashlib.sha256(b"correct horse").hexdigest()
+    assert not credentials.verify_password(stored, stored)
+
+
+def test_legacy_plaintext():
+    assert credentials.verify_password("correct horse", "correct horse")
+    assert not credentials.verify_password(hashlib.sha256(b"correct horse").hexdigest(), "correct horse")
+
+
+def test_unknown_user_is_checked_against_the_precomputed_hash():
+    assert credentials._DUMMY_HASH.startswith("scrypt$")
+    assert not credentials.verify_in_pool("anything", None)
+
+
+def test_kdf_timeout_is_a_login_error(monkeypatch):
+    monkeypatch.setattr(credentials, "KDF_TIMEOUT", 0.05)
+    release = threading.Event()
+    with pytest.raises(credentials.LoginBusy):
+        credentials.run_kdf(release.wait, 5)
+    release.set()
+    monkeypatch.undo()
+    assert credentials.run_kdf(hashlib.sha256, b"x").hexdigest() == hashlib.sha256(b"x").hexdigest()
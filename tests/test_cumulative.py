@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+
+import cumulative
+import jobs
+import storage
+
+
+def _write(path, rows, tag):
+    pd.DataFrame({
+        "Order Date": ["2024-01-05"] * rows,
+        "Customer Id": [f"{tag}{i}" for i in range(rows)],
+        "Product": ["A"] * rows,
+        "Quantity": [1] * rows,
+        "Unit Price": [10.0] * rows,
+    }).to_csv(path, index=False)
+    return path
+
+
+def _store(tmp_path, monkeypatch, user):
+    monkeypatch.chdir(tmp_path)
+    user_dir = storage.user_dir(user)
+    os.makedirs(user_dir)
+    files = {name: _write(os.path.join(user_dir, name), rows, name[0]) for name, rows in (("a.csv", 3), ("b.csv", 2))}
+    assert cumulative.sync(user_dir, files) == []
+    assert cumulative.load_total(user_dir).total_orders == 5
+    return user_dir, files
+
+
+def test_replacing_a_file_with_content_that_fails_drops_it_from_the_total(tmp_path, monkeypatch):
+    user_dir, files = _store(tmp_path, monkeypatch, "cumulative-job")
+    with open(files["b.csv"], "w") as f:
+        f.write("nothing,here\n1,2\n")
+
+    job = jobs.Job(1, "cumulative-job", files["b.csv"], "b.csv")
+    jobs._run_upload_job(job)
+
+    assert job.status == jobs.FAILED
+    assert sorted(cumulative.tracked_files(user_dir)) == ["a.csv"]
+    assert cumulative.load_total(user_dir).total_orders == 3
+
+
+def test_replacing_a_file_updates_the_total(tmp_path, monkeypatch):
+    user_dir, files = _store(tmp_path, monkeypatch, "cumulative-replace")
+    _write(files["b.csv"], 4, "b")
+    cumulative.add_upload(user_dir, "b.csv", files["b.csv"])
+    total = cumulative.load_total(user_dir)
+    assert total.total_orders == 7
+    assert total.customer_split() == (7, 0)
+
+
+def test_removing_the_last_file_empties_the_total(tmp_path, monkeypatch):
+    user_dir, _ = _store(tmp_path, monkeypatch, "cumulative-remove")
+    cumulative.remove_upload(user_dir, "a.csv")
+    cumulative.remove_upload(user_dir, "b.csv")
+    assert cumulative.tracked_files(user_dir) == {}
+    assert cumulative.load_total(user_dir) is None
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processor import clean_sales_data, detect_date_format, to_numeric_fast
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["₹1,299.00", "$5", "12"], [1299.0, 5.0, 12.0]),
+    (["-5", "₹-1,200"], [-5.0, -1200.0]),
+    (["5-10", "1.5 kg", "abc"], [510.0, 1.5, np.nan]), # last-resort strip, as the original cleaning did
+    (["3", None, "3", "3", "3", "3"], [3.0, np.nan, 3.0, 3.0, 3.0, 3.0]), # factorized path
+])
+def test_to_numeric_fast(values, expected):
+    result = to_numeric_fast(pd.Series(values, dtype=object, name="Unit Price"))
+    np.testing.assert_array_equal(result.to_numpy(), np.array(expected))
+    assert result.name == "Unit Price"
+
+
+def test_to_numeric_fast_leaves_numbers_alone():
+    series = pd.Series([1, 2, 3], dtype="int16")
+    assert to_numeric_fast(series) is series
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["2024-03-05", "2024-12-31"], "%Y-%m-%d"),
+    (["05/03/2024", "13/03/2024"], "%d/%m/%Y"),
+    (["05/03/2024", "03/13/2024"], "%m/%d/%Y"),
+    (["05/03/2024", "11/12/2024"], "%m/%d/%Y"), # ambiguous throughout: month-first, like pd.to_datetime
+    (["05-03-2024", "07-08-2024"], "%m-%d-%Y"),
+    (["31.01.2024", "01.02.2024"], "%d.%m.%Y"),
+    (["05-Mar-2024"], "%d-%b-%Y"),
+    (["soon", "later"], None),
+])
+def test_detect_date_format(values, expected):
+    assert detect_date_format(pd.Series(values)) == expected
+
+
+def test_customer_ids_are_text_whatever_the_reader():
+    numbers = pd.DataFrame({"Customer ID": [101, 102], "Quantity": [1, 2], "Unit Price": [5.0, 6.0]})
+    with_gaps = pd.DataFrame({"Customer ID": [101.0, np.nan], "Quantity": [1, 2], "Unit Price": [5.0, 6.0]})
+    text = pd.DataFrame({"Customer ID": ["101", "C-7"], "Quantity": ["1", "2"], "Unit Price": ["5", "6"]})
+    assert clean_sales_data(numbers)[0]["Customer Id"].tolist() == ["101", "102"]
+    assert clean_sales_data(with_gaps)[0]["Customer Id"].iloc[0] == "101"
+    assert clean_sales_data(with_gaps)[0]["Customer Id"].isna().iloc[1]
+    assert clean_sales_data(text)[0]["Customer Id"].tolist() == ["101", "C-7"]
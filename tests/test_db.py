@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db.sqlite_pool(str(tmp_path / "pool.sqlite"), size=2)
+    yield pool
+    pool.close()
+
+
+def test_released_connections_are_reused(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    metrics = pool.metrics()
+    assert (metrics["created"], metrics["in_use"], metrics["idle"], metrics["checkouts"]) == (1, 0, 1, 2)
+
+
+def test_checkout_waits_then_times_out_when_saturated(pool):
+    pool.timeout = 0.05
+    held = [pool.acquire(), pool.acquire()]
+    assert pool.metrics()["saturation"] == 1.0
+    with pytest.raises(db.PoolTimeout):
+        pool.acquire()
+
+    # A connection released while someone waits goes to the waiter
+    threading.Timer(0.2, pool.release, args=(held.pop(),)).start()
+    pool.timeout = 5
+    held.append(pool.acquire())
+    metrics = pool.metrics()
+    assert (metrics["waits"], metrics["timeouts"], metrics["peak_in_use"], metrics["created"]) == (2, 1, 2, 2)
+    for conn in held:
+        pool.release(conn)
+
+
+def test_dead_connections_are_replaced_on_checkout(pool):
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close() # e.g. dropped by the server while idle
+    with pool.connection() as fresh:
+        assert fresh is not conn
+        fresh.execute("SELECT 1")
+    assert pool.metrics()["reconnects"] == 1
+    assert pool.metrics()["created"] == 1
+
+
+def test_broken_connections_are_not_returned(pool):
+    conn = pool.acquire()
+    pool.release(conn, broken=True)
+    assert pool.metrics()["created"] == 0
+    assert pool.acquire() is not conn
+
+
+def test_release_rolls_back_open_transactions(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute(pool.sql("INSERT INTO t VALUES (%s)"), (1,))
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_sql_adapts_placeholders(pool):
+    assert pool.sql("SELECT * FROM users WHERE username=%s AND id=%s") == "SELECT * FROM users WHERE username=? AND id=?"
+    assert db.ConnectionPool(lambda: None).sql("x=%s") == "x=%s"
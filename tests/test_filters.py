@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+import aggregates
+import filters
+from data_processor import prepare
+
+
+def _raw(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    customers = pd.Series([f"C{i}" for i in rng.integers(0, 300, rows)], dtype=object)
+    customers[rng.random(rows) < 0.05] = None # some orders without a Customer Id
+    products = pd.Series([f"P{i}" for i in rng.integers(0, 12, rows)], dtype=object)
+    products[rng.random(rows) < 0.02] = None
+    return pd.DataFrame({
+        "Order Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 400, rows), unit="D"),
+        "Customer Id": customers,
+        "Product": products,
+        "Region": rng.choice(["North", "South", "East"], rows),
+        "Quantity": rng.integers(1, 5, rows),
+        "Unit Price": rng.uniform(5, 50, rows).round(2),
+    })
+
+
+def _sorted(df, by):
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return df.sort_values(by, na_position="last").reset_index(drop=True)
+
+
+def test_unfiltered_index_matches_build_aggregates():
+    prepared = prepare(_raw())
+    expected = aggregates.build_aggregates(prepared.df, prepared.report)
+    actual = filters.FilterIndex(prepared.df, prepared.report).aggregate()
+
+    assert actual.total_orders == expected.total_orders
+    assert np.isclose(actual.total_revenue, expected.total_revenue)
+    assert actual.customer_split() == expected.customer_split()
+    assert len(actual.customers) == len(expected.customers)
+
+    key = ["Customer Id"]
+    tm.assert_frame_equal(_sorted(actual.customers, key), _sorted(expected.customers, key), check_dtype=False)
+    key = ["Customer Id", "Month"]
+    tm.assert_frame_equal(_sorted(actual.activity, key), _sorted(expected.activity, key),
+                          check_dtype=False, check_like=True)
+    key = ["Month", "Product", "Region"]
+    tm.assert_frame_equal(_sorted(actual.cube, key), _sorted(expected.cube, key),
+                          check_dtype=False, check_like=True)
+    tm.assert_frame_equal(_sorted(actual.daily, ["Date"]), _sorted(expected.daily, ["Date"]), check_dtype=False)
+
+
+def test_filters_never_count_missing_customers():
+    prepared = prepare(_raw())
+    index = filters.FilterIndex(prepared.df, prepared.report)
+    filtered = index.aggregate(regions=["North", "South", "East"])
+    assert aggregates.UNKNOWN not in set(filtered.customers["Customer Id"].astype(str))
+    assert aggregates.UNKNOWN not in set(filtered.activity["Customer Id"].astype(str))
+
+
+def test_options_from_aggregates_match_the_index():
+    prepared = prepare(_raw())
+    aggs = aggregates.build_aggregates(prepared.df, prepared.report)
+    index = filters.FilterIndex(prepared.df, prepared.report)
+    bounds, regions, products = filters.options(aggs)
+    assert bounds == (pd.Timestamp(index.days[0]).date(), pd.Timestamp(index.days[-1]).date())
+    assert regions == list(index.regions)
+    assert products == list(index.products)
+    assert products[-1] == aggregates.UNKNOWN
+
+
+def test_options_without_optional_columns():
+    prepared = prepare(_raw().drop(columns=["Order Date", "Region"]))
+    assert filters.options(aggregates.build_aggregates(prepared.df, prepared.report))[:2] == (None, None)
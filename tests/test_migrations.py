@@ -0,0 +1,74 @@
+import pytest
+
+import db
+import migrations
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db.sqlite_pool(str(tmp_path / "schema.sqlite"), size=2)
+    yield pool
+    pool.close()
+
+
+def _indexes(pool, table):
+    with pool.connection() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table,))}
+
+
+def _columns(pool, table):
+    with pool.connection() as conn:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_migrate_is_idempotent(pool):
+    latest = migrations.MIGRATIONS[-1][0]
+    assert migrations.migrate(pool) == list(range(1, latest + 1))
+    assert migrations.migrate(pool) == []
+    assert migrations.current_version(pool) == latest
+    assert "idx_user_uploads_user_time" in _indexes(pool, "user_uploads")
+    assert "content_hash" in _columns(pool, "user_uploads")
+
+
+def test_migrate_finishes_a_migration_applied_halfway(pool):
+    # As if migration 4 stopped after its DDL, before recording its version
+    with pool.connection() as conn:
+        for _, _, statements in migrations.MIGRATIONS[:3]:
+            for step in statements["sqlite"]:
+                migrations._run_step(conn.cursor(), pool, step)
+        conn.execute(migrations.SCHEMA_VERSION_TABLE["sqlite"])
+        conn.execute("INSERT INTO schema_version VALUES (1, 'a', '2024-01-01'), (2, 'b', '2024-01-01'), "
+                     "(3, 'c', '2024-01-01')")
+        conn.execute("CREATE TABLE upload_files (username TEXT, filename TEXT, content_hash TEXT, size INTEGER, updated_at TIMESTAMP)")
+        conn.execute("CREATE INDEX idx_upload_files_hash ON upload_files (content_hash)")
+        conn.execute("ALTER TABLE user_uploads ADD COLUMN content_hash TEXT")
+        conn.commit()
+    assert migrations.migrate(pool)[0] == 4
+    assert _columns(pool, "user_uploads").count("content_hash") == 1
+
+
+def test_migrate_upgrades_tables_created_before_migrations(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE user_uploads (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, "
+                     "filename TEXT NOT NULL, upload_time TIMESTAMP NOT NULL)")
+        conn.execute("INSERT INTO user_uploads (username, filename, upload_time) VALUES ('ann', 'a.csv', '2024-01-01')")
+        conn.commit()
+    migrations.migrate(pool)
+    assert "content_hash" in _columns(pool, "user_uploads")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT filename FROM user_uploads").fetchall() == [("a.csv",)]
+
+
+def test_guarded_steps_skip_what_exists(pool):
+    migrations.migrate(pool)
+    index_step = migrations._unless_index("upload_files", "idx_upload_files_hash", "this is not SQL")
+    column_step = migrations._unless_column("user_uploads", "content_hash", "this is not SQL")
+    with pool.connection() as conn:
+        c = conn.cursor()
+        migrations._run_step(c, pool, index_step)
+        migrations._run_step(c, pool, column_step)
+        # A missing object is created, and a failure that leaves it missing is raised
+        migrations._run_step(c, pool, migrations._unless_column("users", "email", "ALTER TABLE users ADD COLUMN email TEXT"))
+        with pytest.raises(Exception):
+            migrations._run_step(c, pool, migrations._unless_index("users", "idx_nope", "this is not SQL"))
+    assert "email" in _columns(pool, "users")
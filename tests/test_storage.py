@@ -0,0 +1,32 @@
+import hashlib
+import io
+import os
+
+import storage
+
+
+def test_identical_content_is_stored_once_per_user(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    content = b"Quantity,Unit Price\n1,5\n"
+    digest, path, size, created = storage.store(io.BytesIO(content), "a.csv", "ann")
+    assert (digest, size, created) == (hashlib.sha256(content).hexdigest(), len(content), True)
+    assert path == storage.object_path("ann", digest, "a.csv")
+    assert storage.digest_of(path) == digest
+
+    again = storage.store(io.BytesIO(content), "renamed.CSV", "ann")
+    assert again == (digest, path, len(content), False)
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)] # no temp files left behind
+
+
+def test_users_never_share_objects(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    content = b"Quantity,Unit Price\n1,5\n"
+    _, ann_path, _, _ = storage.store(io.BytesIO(content), "a.csv", "ann")
+    _, bob_path, _, created = storage.store(io.BytesIO(content), "a.csv", "bob")
+    assert created # bob cannot tell that ann uploaded the same file
+    assert bob_path != ann_path
+    assert open(bob_path, "rb").read() == content
+
+
+def test_other_paths_have_no_digest():
+    assert storage.digest_of(os.path.join("uploads", "ann", "a.csv")) is None
@@ -0,0 +1,57 @@
+import io
+
+import pandas as pd
+
+import validation
+from data_processor import canonical_column, normalize_columns
+
+
+def _codes(report, severity):
+    return {issue.code for issue in report.issues if issue.severity == severity}
+
+
+def test_aliases_map_to_canonical_names():
+    assert canonical_column("cust_id") == "Customer Id"
+    assert canonical_column("QTY") == "Quantity"
+    assert canonical_column("Unit-Price") == "Unit Price"
+    assert canonical_column("notes") == "Notes"
+    # An exact canonical header wins; the alias keeps its own (title-cased) name
+    assert normalize_columns(["Date", "Order Date"]) == {"Date": "Date", "Order Date": "Order Date"}
+
+
+def test_aliased_headers_validate():
+    sample = pd.DataFrame({"date": ["2024-01-05"], "item": ["A"], "cust_id": ["C1"], "qty": ["2"], "price": ["₹1,200"]})
+    report = validation.validate_frame(sample)
+    assert report.ok and not report.warnings
+    assert report.column_map["qty"] == "Quantity"
+
+
+def test_missing_revenue_column_is_an_error():
+    report = validation.validate_frame(pd.DataFrame({"Quantity": ["1"], "Product": ["A"]}))
+    assert not report.ok
+    assert _codes(report, validation.ERROR) == {validation.MISSING_COLUMN}
+    assert _codes(report, validation.WARNING) == {validation.MISSING_COLUMN} # no Order Date / Customer Id
+
+
+def test_two_spellings_of_one_column_is_an_error():
+    report = validation.validate_frame(pd.DataFrame({"Quantity": ["1"], "quantity": ["1"], "Price": ["5"]}))
+    assert _codes(report, validation.ERROR) == {validation.DUPLICATE_COLUMN}
+
+
+def test_unparseable_values():
+    sample = pd.DataFrame({"Order Date": ["2024-01-05", "soon", "2024-01-07", "2024-01-08"],
+                           "Quantity": ["1", "2", "x", "4"], "Unit Price": ["a", "b", "c", "5"]})
+    report = validation.validate_frame(sample)
+    errors = {issue.column: issue.code for issue in report.errors}
+    warnings = {issue.column: issue.code for issue in report.warnings}
+    assert errors == {"Unit Price": validation.NOT_NUMERIC}
+    assert warnings["Quantity"] == validation.NOT_NUMERIC
+    assert warnings["Order Date"] == validation.BAD_DATES
+
+
+def test_validate_upload_rewinds_and_reports_empty_files():
+    upload = io.BytesIO(b"Quantity,Unit Price\n")
+    report = validation.validate_upload(upload, "sales.csv")
+    assert _codes(report, validation.ERROR) == {validation.EMPTY}
+    assert upload.tell() == 0
+    assert _codes(validation.validate_upload(io.BytesIO(b""), "empty.csv"), validation.ERROR) == {validation.EMPTY}
@@ -1,36 +1,37 @@
 import streamlit as st
-import pandas as pd
-import mysql.connector
+import mysql.connector # Needed by the login page's DB calls
 from datetime import datetime
-from streamlit_option_menu import option_menu
-from streamlit_card import card
 import json
 import os # Import os for directory creation
-import base64 # Import base64 for image embedding
-# Removed: from streamlit_lottie import st_lottie # No longer needed if removing Lottie animations
+import db # Shared MySQL connection pool
+import credentials # Salted scrypt password hashing
+import migrations # Versioned database schema
+import instrument # Hot-path timers behind the profiling panel
+import assets # Static CSS and images, prepared once per process
+# The analytics stack (pandas, plotly, aggregates, jobs, ...) and the navigation/card
+# components are imported inside the pages that use them, so the login page does not
+# pay for them. See benchmarks/bench_startup.py for the import-time budget.
 
 # --- Debugging & Error Handling Setup ---
-# Set a flag to enable/disable debug messages
-DEBUG_MODE = True
-
-def debug_print(message):
-    if DEBUG_MODE:
-        st.sidebar.info(f"DEBUG: {message}") # Print debug messages in sidebar for visibility
-
-# --- Utility Function to get Base64 image ---
-@st.cache_data
-def get_image_base64(image_path):
-    """Reads an image file and returns its Base64 encoded string."""
-    debug_print(f"Attempting to load image as Base64 from: {image_path}")
+# Debug output and timings are collected by instrument.py and shown in one sidebar
+# panel at the end of the run. Off unless BIZPULSE_PROFILE=1, so normal runs only
+# pay a flag check per instrumented call.
+DEBUG_MODE = instrument.enabled
+
+# --- Logo ---
+# Served as a resized, content-hashed static file (see assets.py) rather than being
+# base64-inlined into every page; inlined only if static serving is turned off.
+LOGO_FILE = "logo.png"
+LOGO_MAX_SIZE = (360, 240) # 2x the largest display size (180px sidebar width, 90px header height)
+
+def logo_html_tag():
+    """The <img> tag for the header logo, or a text fallback if the file is missing."""
     try:
-        if not os.path.exists(image_path):
-            st.error(f"Image file not found at: {image_path}")
-            return None
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except Exception as e:
-        st.error(f"Error encoding image '{image_path}' to Base64: {e}")
-        return None
+        return assets.image_tag(LOGO_FILE, LOGO_MAX_SIZE, alt="BizPulse Logo",
+                                inline=not st.get_option("server.enableStaticServing"))
+    except OSError as e:
+        instrument.note(f"Logo unavailable: {e}")
+        return "<div style='color: red; font-weight: bold;'>Logo Missing</div>"
 
 # --- Caching Functions for Performance ---
 
@@ -54,279 +55,24 @@ def get_image_base64(image_path):
 #         st.error(f"An unexpected error occurred while loading Lottie: {e}")
 #         return None
 
-@st.cache_data(ttl=600) # Cache logs for 10 minutes
-def get_logs_cached(username):
-    """Fetches user upload logs from the database with caching."""
-    debug_print(f"Fetching logs for user: {username}")
-    conn = get_connection()
-    if conn is None:
-        st.error("Could not establish database connection for fetching logs.")
-        return []
-    c = conn.cursor()
+def get_upload_summary_cached(username):
+    """Fetches the user's upload count and latest upload (filename, upload_time) with caching.
+
+    Cached per user until that user uploads again (see memo.invalidate_user), so one
+    user's upload never evicts anyone else's cached summary.
+    """
+    instrument.note(f"Fetching upload summary for user: {username}")
+    import memo
     try:
-        c.execute("SELECT filename, upload_time FROM user_uploads WHERE username=%s ORDER BY upload_time DESC", (username,))
-        rows = c.fetchall()
-        return rows
+        return memo.cached_for_user(username, "upload_summary",
+                                    lambda: (db.count_uploads(username), db.latest_upload(username)))
     except mysql.connector.Error as err:
         st.error(f"Database error fetching logs: {err}")
-        return []
+        return 0, None
     except Exception as e:
         st.error(f"An unexpected error occurred while fetching logs: {e}")
-        return []
-    finally:
-        c.close()
-        conn.close()
+        return 0, None
 
-# --- Custom CSS for Enhanced UI ---
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700;800&display=swap');
-
-/* General body and main content styling */
-html, body, [data-testid="stAppViewContainer"] {
-    /* Professional and cool, subtle live gradient background */
-    background: linear-gradient(135deg, #0A192F 0%, #172A45 50%, #0A192F 100%); /* Deep Navy to Dark Blue */
-    background-size: 400% 400%;
-    animation: gradientShift 20s ease infinite; /* Slower, smoother animation */
-    font-family: 'Inter', sans-serif; /* Using Inter font */
-    color: #E6F1FF; /* Light blue-white text for dark background */
-    overflow-x: hidden; /* Prevent horizontal scroll */
-}
-
-/* Subtle animated grid/data flow overlay */
-html::before {
-    content: '';
-    position: fixed;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 100%;
-    background-image: linear-gradient(0deg, rgba(255,255,255,0.02) 1px, transparent 1px),
-                      linear-gradient(90deg, rgba(255,255,255,0.02) 1px, transparent 1px);
-    background-size: 50px 50px; /* Adjust grid size */
-    opacity: 0.1; /* Very subtle */
-    z-index: -1;
-    animation: gridMovement 60s linear infinite; /* Slow grid movement */
-}
-
-@keyframes gradientShift {
-    0% { background-position: 0% 50%; }
-    50% { background-position: 100% 50%; }
-    100% { background-position: 0% 50%; }
-}
-
-@keyframes gridMovement {
-    0% { background-position: 0 0; }
-    100% { background-position: 50px 50px; } /* Move by one grid cell */
-}
-
-
-.main {
-    background-color: rgba(10, 25, 47, 0.7); /* More opaque, dark navy overlay */
-    backdrop-filter: blur(8px); /* Stronger blur effect */
-    border-radius: 18px; /* Slightly less rounded */
-    padding: 30px; /* More padding */
-    margin: 25px; /* More margin */
-    box-shadow: 0 15px 40px rgba(0, 0, 0, 0.5); /* Deeper shadow */
-    border: 1px solid rgba(255, 255, 255, 0.1); /* Subtle border */
-}
-
-/* Ensure the main content block takes full width within the wide layout */
-.block-container {
-    padding-top: 2.5rem; /* More padding at the top of the content */
-    padding-bottom: 2.5rem; /* More padding at the bottom */
-    padding-left: 6%; /* Adjust left/right padding for content margin */
-    padding-right: 6%;
-}
-
-/* Header logo and title styling for the main content area */
-.header-logo {
-    display: flex;
-    align-items: center;
-    justify-content: center; /* Center the header logo and text */
-    gap: 25px; /* Increased gap */
-    margin-bottom: 50px; /* More space below header */
-    padding: 40px 0; /* More padding for header area */
-    border-bottom: 2px solid rgba(255, 255, 255, 0.15); /* Lighter, more subtle separator */
-}
-.header-logo img {
-    height: 90px; /* Larger logo */
-    filter: drop-shadow(0 0 15px rgba(0, 200, 255, 0.6)); /* Subtle blue glow effect on logo */
-}
-.header-logo h1 {
-    color: #64FFDA; /* Bright accent color for the title */
-    margin: 0; /* Remove default margin from h1 */
-    font-size: 3.5rem; /* Even larger title font */
-    font-weight: 800; /* Bolder font */
-    text-shadow: 0 0 15px rgba(100, 255, 218, 0.4); /* Text shadow for glow */
-}
-
-/* Streamlit card styling */
-.st-emotion-cache-1r6dm1x { /* Target for streamlit_card, may change with versions */
-    border-radius: 15px; /* Slightly less rounded */
-    box-shadow: 0 10px 30px rgba(0, 0, 0, 0.4); /* Stronger shadow for depth */
-    transition: transform 0.3s ease-in-out, box-shadow 0.3s ease-in-out; /* Smooth hover effect */
-    background: rgba(255, 255, 255, 0.08); /* More transparent background for cards */
-    backdrop-filter: blur(10px); /* Stronger blur effect for cards */
-    border: 1px solid rgba(255, 255, 255, 0.15); /* Subtle white border */
-    color: #E6F1FF; /* Light blue-white text for cards */
-    padding: 25px; /* More padding */
-}
-.st-emotion-cache-1r6dm1x:hover {
-    transform: translateY(-12px); /* Lift card more on hover */
-    box-shadow: 0 20px 45px rgba(0, 0, 0, 0.6); /* Enhanced shadow on hover */
-}
-.st-emotion-cache-1r6dm1x p { /* Text inside cards */
-    color: #E6F1FF;
-}
-
-/* Improve button styling */
-.stButton>button {
-    background: linear-gradient(45deg, #64FFDA, #00C6FF); /* Teal to Cyan gradient button */
-    color: #0A192F; /* Dark text for bright button */
-    border-radius: 12px; /* More rounded buttons */
-    border: none;
-    padding: 16px 35px; /* More padding */
-    cursor: pointer;
-    font-weight: 700; /* Bolder font */
-    font-size: 1.15rem; /* Slightly larger font */
-    transition: background 0.3s ease, transform 0.2s ease, box-shadow 0.3s ease;
-    box-shadow: 0 8px 20px rgba(100, 255, 218, 0.4); /* Teal shadow */
-    text-transform: uppercase; /* Uppercase text */
-    letter-spacing: 1.5px; /* More letter spacing */
-}
-.stButton>button:hover {
-    background: linear-gradient(45deg, #00C6FF, #64FFDA); /* Reverse gradient on hover */
-    transform: translateY(-4px); /* Slight lift on hover */
-    box-shadow: 0 12px 25px rgba(100, 255, 218, 0.6);
-}
-
-/* Input field styling */
-.stTextInput>div>div>input, .stTextArea>div>div>textarea, .stFileUploader>div>div>button {
-    border-radius: 10px; /* Rounded inputs */
-    border: 1px solid rgba(100, 255, 218, 0.4); /* Subtle teal border */
-    padding: 16px; /* More padding */
-    background-color: rgba(255, 255, 255, 0.08); /* Transparent background */
-    color: #E6F1FF; /* Light blue-white text */
-    box-shadow: inset 0 2px 8px rgba(0, 0, 0, 0.3); /* Deeper inner shadow */
-    transition: border-color 0.3s ease, box-shadow 0.3s ease, background-color 0.3s ease;
-}
-.stTextInput>div>div>input::placeholder, .stTextArea>div>div>textarea::placeholder {
-    color: rgba(230, 241, 255, 0.5); /* Lighter placeholder text */
-}
-.stTextInput>div>div>input:focus, .stTextArea>div>div>textarea:focus {
-    border-color: #64FFDA; /* Teal border on focus */
-    box-shadow: 0 0 0 0.4rem rgba(100, 255, 218, 0.3); /* Stronger focus glow */
-    background-color: rgba(255, 255, 255, 0.12); /* Slightly less transparent on focus */
-    outline: none;
-}
-
-/* Info and Success messages */
-.stAlert {
-    border-radius: 12px;
-    padding: 1.5rem 2rem; /* More padding */
-    font-size: 1.15rem;
-    background-color: rgba(0, 0, 0, 0.5); /* Darker, semi-transparent background */
-    color: #E6F1FF; /* White text */
-    border: 1px solid rgba(255, 255, 255, 0.2);
-    box-shadow: 0 8px 20px rgba(0, 0, 0, 0.4);
-}
-.stAlert > div[data-testid="stMarkdownContainer"] p { /* Target text inside alerts */
-    color: #E6F1FF !important;
-}
-
-/* Sidebar styling - Only for the logo and debug messages now */
-.sidebar .sidebar-content {
-    background: linear-gradient(180deg, #0A192F, #000000); /* Darker gradient for sidebar */
-    color: #E6F1FF;
-    box-shadow: 5px 0 20px rgba(0, 0, 0, 0.6);
-}
-.css-1lcbmhc.e1fqkh3o0 { /* Target for sidebar content wrapper */
-    background-color: transparent; /* Let the gradient show through */
-}
-.css-1lcbmhc.e1fqkh3o0 .css-1qxtjkw.e1fqkh3o1 { /* Target for sidebar elements */
-    color: #E6F1FF;
-}
-
-/* Specific styling for the login/signup container */
-.login-container {
-    max-width: 700px; /* Wider */
-    margin: 100px auto; /* More margin */
-    padding: 60px; /* More padding */
-    background: rgba(10, 25, 47, 0.8); /* Opaque dark navy */
-    backdrop-filter: blur(12px); /* Stronger blur effect */
-    border-radius: 20px;
-    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.6); /* Deeper shadow */
-    text-align: center;
-    border: 1px solid rgba(255, 255, 255, 0.15); /* Subtle white border */
-}
-.login-container h2 {
-    color: #64FFDA; /* Accent color text */
-    font-size: 3.2rem; /* Larger font */
-    margin-bottom: 30px;
-    text-shadow: 0 0 10px rgba(100, 255, 218, 0.3);
-}
-.login-container p {
-    color: #B0C4DE; /* Muted light blue text */
-    font-size: 1.3rem;
-    margin-bottom: 50px;
-}
-.login-container .stRadio > label {
-    font-size: 1.25rem; /* Larger font */
-    font-weight: 600;
-    color: #E6F1FF; /* Light blue-white radio label */
-}
-.login-container .stRadio > label > div[data-testid="stFlex"] {
-    justify-content: center; /* Center the radio buttons */
-    gap: 40px; /* More space between radio buttons */
-}
-.login-container .stRadio > label > div[data-testid="stFlex"] > div {
-    padding: 18px 40px; /* More padding */
-    border-radius: 15px; /* More rounded */
-    transition: background-color 0.3s, color 0.3s, box-shadow 0.3s;
-    border: 2px solid #64FFDA; /* Teal border for radio buttons */
-    color: #64FFDA; /* Teal text */
-    background-color: rgba(100, 255, 218, 0.1); /* Transparent teal background */
-    box-shadow: 0 6px 15px rgba(100, 255, 218, 0.2);
-}
-.login-container .stRadio > label > div[data-testid="stFlex"] > div:hover {
-    background-color: rgba(100, 255, 218, 0.2);
-    box-shadow: 0 8px 20px rgba(100, 255, 218, 0.3);
-}
-.login-container .stRadio > label > div[data-testid="stFlex"] > div[data-checked="true"] {
-    background: linear-gradient(45deg, #64FFDA, #00C6FF); /* Teal to Cyan gradient for selected */
-    color: #0A192F; /* Dark text for selected */
-    box-shadow: 0 10px 25px rgba(100, 255, 218, 0.5);
-    border-color: transparent; /* No border when selected with gradient */
-}
-
-/* Styling for the main app navigation menu */
-.st-emotion-cache-1f8p7d2 { /* option_menu container */
-    background-color: rgba(255, 255, 255, 0.1) !important; /* More transparent white */
-    border-radius: 15px !important;
-    box-shadow: 0 8px 25px rgba(0,0,0,0.3) !important;
-    margin-bottom: 50px !important;
-    border: 1px solid rgba(255, 255, 255, 0.15);
-}
-.st-emotion-cache-1f8p7d2 .st-emotion-cache-10qre6c { /* option_menu nav-link */
-    color: #B0C4DE !important; /* Muted light blue text */
-    font-weight: 600;
-}
-.st-emotion-cache-1f8p7d2 .st-emotion-cache-10qre6c:hover { /* option_menu nav-link hover */
-    background-color: rgba(255, 255, 255, 0.08) !important; /* More subtle hover */
-    border-radius: 10px;
-}
-.st-emotion-cache-1f8p7d2 .st-emotion-cache-10qre6c-selected { /* option_menu nav-link-selected */
-    background: linear-gradient(45deg, #64FFDA, #00C6FF) !important; /* Teal to Cyan gradient for selected */
-    color: #0A192F !important; /* Dark text for selected */
-    border-radius: 10px;
-    box-shadow: 0 6px 15px rgba(100, 255, 218, 0.4);
-}
-.st-emotion-cache-1f8p7d2 .st-emotion-cache-10qre6c-selected svg { /* Selected icon color */
-    color: #0A192F !important;
-}
-</style>
-""", unsafe_allow_html=True)
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -335,118 +81,205 @@ st.set_page_config(
     initial_sidebar_state="collapsed" # Sidebar collapsed by default
 )
 
-# --- Database Connection and Auth Functions ---
-# IMPORTANT: Replace with your actual MySQL credentials
-def get_connection():
-    """Establishes and returns a MySQL database connection."""
-    debug_print("Attempting to get database connection.")
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="raman@1234",
-            database="bizpulse_db"
-        )
-        debug_print("Database connection successful.")
-        return conn
-    except mysql.connector.Error as err:
-        st.error(f"Database connection error: {err}. Please ensure MySQL is running and credentials are correct.")
-        debug_print(f"Database connection failed: {err}")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred during database connection: {e}")
-        debug_print(f"Unexpected error during DB connection: {e}")
-        return None
+# Every timer and counter below is recorded into this run's trace
+instrument.start_run(st.session_state.get("current_page", "Login"))
+
+# --- Custom CSS for Enhanced UI ---
+# Kept in static/style.css; read and minified once per process, re-sent each run
+st.markdown(assets.style_tag("style.css"), unsafe_allow_html=True)
 
+# --- Database Auth Functions ---
+# Connections come from the shared pool in db.py (credentials are configured there)
 def create_user(u, p):
     """Creates a new user in the database."""
-    debug_print(f"Attempting to create user: {u}")
-    conn = get_connection()
-    if conn is None: return False
-    c = conn.cursor()
+    instrument.note(f"Attempting to create user: {u}")
     try:
-        c.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (u, p))
-        conn.commit()
-        debug_print(f"User {u} created successfully.")
-        return True
+        hashed = credentials.hash_in_pool(p) # hash before taking a pooled connection
+        with db.connection() as conn:
+            c = conn.cursor()
+            try:
+                c.execute(db.sql("INSERT INTO users (username, password) VALUES (%s, %s)"), (u, hashed))
+                conn.commit()
+                instrument.note(f"User {u} created successfully.")
+                return True
+            except mysql.connector.Error as err:
+                if err.errno == 1062: # Duplicate entry error
+                    st.error("Username already exists. Please choose a different one.")
+                    instrument.note(f"User creation failed: Username {u} already exists.")
+                else:
+                    st.error(f"Error creating user: {err}")
+                    instrument.note(f"User creation failed: {err}")
+                conn.rollback()
+                return False
+            finally:
+                c.close()
+    except credentials.LoginBusy as e:
+        st.error(str(e))
+        instrument.note(f"User creation rejected for {u}: {e}")
+        return False
     except mysql.connector.Error as err:
-        if err.errno == 1062: # Duplicate entry error
-            st.error("Username already exists. Please choose a different one.")
-            debug_print(f"User creation failed: Username {u} already exists.")
-        else:
-            st.error(f"Error creating user: {err}")
-            debug_print(f"User creation failed: {err}")
-        conn.rollback()
+        st.error(f"Database connection error: {err}. Please ensure MySQL is running and credentials are correct.")
+        instrument.note(f"Database connection failed: {err}")
         return False
     except Exception as e:
         st.error(f"An unexpected error occurred while creating user: {e}")
-        debug_print(f"Unexpected error creating user: {e}")
+        instrument.note(f"Unexpected error creating user: {e}")
         return False
-    finally:
-        c.close()
-        conn.close()
 
 def login_user(u, p):
     """Authenticates a user against the database."""
-    debug_print(f"Attempting to login user: {u}")
-    conn = get_connection()
-    if conn is None: return None
-    c = conn.cursor()
+    instrument.note(f"Attempting to login user: {u}")
     try:
-        c.execute("SELECT * FROM users WHERE username=%s AND password=%s", (u, p))
-        r = c.fetchone()
-        if r:
-            debug_print(f"User {u} logged in successfully.")
-        else:
-            debug_print(f"Login failed for user {u}: Invalid credentials.")
+        with db.connection() as conn:
+            c = conn.cursor()
+            try:
+                # Fetch by username only; the password is verified in constant time below
+                c.execute(db.sql("SELECT id, username, password FROM users WHERE username=%s"), (u,))
+                r = c.fetchone()
+            finally:
+                c.close()
+        if not credentials.verify_in_pool(p, r[2] if r else None):
+            instrument.note(f"Login failed for user {u}: Invalid credentials.")
+            return None
+        if credentials.needs_rehash(r[2]):
+            # Upgrade legacy plaintext/SHA-256 or lower-cost hashes now that we have the password
+            upgraded = credentials.hash_in_pool(p)
+            with db.connection() as conn:
+                c = conn.cursor()
+                try:
+                    c.execute(db.sql("UPDATE users SET password=%s WHERE username=%s"), (upgraded, u))
+                    conn.commit()
+                finally:
+                    c.close()
+            instrument.note(f"Upgraded password hash for user {u}.")
+        instrument.note(f"User {u} logged in successfully.")
         return r
+    except credentials.LoginBusy as e:
+        st.error(str(e))
+        instrument.note(f"Login rejected for user {u}: {e}")
+        return None
     except mysql.connector.Error as err:
         st.error(f"Error logging in: {err}")
-        debug_print(f"Login failed due to DB error: {err}")
+        instrument.note(f"Login failed due to DB error: {err}")
         return None
     except Exception as e:
         st.error(f"An unexpected error occurred during login: {e}")
-        debug_print(f"Unexpected error during login: {e}")
+        instrument.note(f"Unexpected error during login: {e}")
         return None
-    finally:
-        c.close()
-        conn.close()
-
-def log_file(u, fn):
-    """Logs an uploaded file's metadata to the database."""
-    debug_print(f"Attempting to log file {fn} for user {u}")
-    conn = get_connection()
-    if conn is None: return False
-    c = conn.cursor()
+
+def log_file(u, fn, digest, size):
+    """Logs an upload and points the user's filename at its stored content."""
+    instrument.note(f"Attempting to log file {fn} for user {u}")
     try:
-        c.execute("INSERT INTO user_uploads(username, filename, upload_time) VALUES(%s, %s, %s)", (u, fn, datetime.now()))
-        conn.commit()
-        debug_print(f"File {fn} logged successfully for user {u}.")
+        db.log_upload(u, fn, digest, size, datetime.now())
+        instrument.note(f"File {fn} logged successfully for user {u}.")
         return True
     except mysql.connector.Error as err:
-        st.error(f"Error logging file: {err}")
-        debug_print(f"File logging failed: {err}")
-        conn.rollback()
+        st.error(f"Database connection error: {err}. Please ensure MySQL is running and credentials are correct.")
+        instrument.note(f"Database connection failed: {err}")
         return False
     except Exception as e:
         st.error(f"An unexpected error occurred while logging file: {e}")
-        debug_print(f"Unexpected error logging file: {e}")
+        instrument.note(f"Unexpected error logging file: {e}")
         return False
-    finally:
-        c.close()
-        conn.close()
+
+# --- Background Upload Jobs ---
+def _render_upload_jobs(user):
+    import jobs
+    user_job_list = jobs.user_jobs(user)
+    if not user_job_list:
+        return
+    st.subheader("Processing Status")
+    for job in user_job_list[:5]:
+        if job.status == jobs.FAILED:
+            st.error(f"❌ {job.filename}: {job.error}")
+        elif job.status == jobs.DONE:
+            st.success(f"✅ {job.filename}: ready for the dashboard.")
+        else:
+            st.progress(job.progress, text=f"⏳ {job.filename}: {job.stage}")
+        for warning in job.warnings:
+            st.warning(f"{job.filename}: {warning}")
+
+def _has_unfinished_jobs(user):
+    import jobs
+    return any(not job.finished for job in jobs.user_jobs(user))
+
+def _poll_upload_jobs(user):
+    _render_upload_jobs(user)
+    if not _has_unfinished_jobs(user):
+        st.rerun() # one full rerun renders the final status without polling
+
+# Re-render only the status panel every second while jobs run (polling), when supported
+if hasattr(st, "fragment"):
+    _poll_upload_jobs = st.fragment(run_every=1)(_poll_upload_jobs)
+
+def show_upload_jobs(user):
+    if hasattr(st, "fragment") and _has_unfinished_jobs(user):
+        _poll_upload_jobs(user)
+    else:
+        _render_upload_jobs(user)
+
+# --- Dashboard Filters ---
+def show_filters(file_path, aggs, figure_key):
+    """Date/region/product filter widgets; returns the (aggregates, figure cache key) to render.
+
+    The options come from the file's aggregates; the filter index is only loaded once a filter is set.
+    """
+    import filters
+    bounds, region_options, product_options = filters.options(aggs)
+    suffix = figure_key[:12] # per-file widget keys, so bounds never carry over between files
+    with st.expander("🔎 Filters"):
+        start = end = None
+        if bounds:
+            picked = st.date_input("Order date range", value=bounds, min_value=bounds[0], max_value=bounds[1],
+                                   key=f"filter_dates_{suffix}")
+            if isinstance(picked, (tuple, list)) and len(picked) == 2 and tuple(picked) != bounds:
+                start, end = picked
+        regions = st.multiselect("Region", region_options, key=f"filter_regions_{suffix}") if region_options is not None else []
+        products = st.multiselect("Product", product_options, key=f"filter_products_{suffix}") if product_options is not None else []
+    if start is None and not regions and not products:
+        return aggs, figure_key
+    with instrument.span("filters"):
+        filtered = filters.filtered_aggregates(file_path, start, end, regions, products)
+    st.caption(f"Filtered: {filtered.meta['rows']:,} of {aggs.meta['rows']:,} orders.")
+    return filtered, (figure_key, start, end, tuple(sorted(regions)), tuple(sorted(products)))
+
+# --- Profiling Panel ---
+def show_profile_panel(trace):
+    import pandas as pd
+    st.subheader("⏱️ Run Profile")
+    st.caption(f"{trace.name}: {trace.duration * 1000:,.1f} ms total")
+    breakdown = trace.breakdown()
+    if breakdown:
+        st.dataframe(pd.DataFrame(breakdown).round(2), hide_index=True)
+    if trace.counters:
+        st.json(trace.counters)
+    with st.expander("Debug messages"):
+        for offset, message in trace.notes:
+            st.text(f"{offset * 1000:8.1f} ms  {message}")
+    with st.expander("Process totals (incl. background jobs)"):
+        st.json(instrument.totals())
+    st.download_button("Download trace (Chrome format)", json.dumps(trace.to_chrome_trace()),
+                       file_name="bizpulse-trace.json", mime="application/json")
+
+# --- Database Schema ---
+# Applies any pending migrations once per server process (see migrations.py)
+try:
+    migrations.ensure_migrated()
+except Exception as e:
+    st.error(f"Database schema check failed: {e}. Please ensure MySQL is running and credentials are correct.")
 
 # --- Initializing Session State ---
-debug_print("Initializing session state variables.")
+instrument.note("Initializing session state variables.")
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
-    debug_print("st.session_state.authenticated initialized to False.")
+    instrument.note("st.session_state.authenticated initialized to False.")
 if "user" not in st.session_state:
     st.session_state.user = None
-    debug_print("st.session_state.user initialized to None.")
+    instrument.note("st.session_state.user initialized to None.")
 if "current_page" not in st.session_state:
     st.session_state.current_page = "📊 Dashboard" # Default page after login
-    debug_print("st.session_state.current_page initialized to '📊 Dashboard'.")
+    instrument.note("st.session_state.current_page initialized to '📊 Dashboard'.")
 if "auth_choice" not in st.session_state: # New session state for login/signup radio
     st.session_state.auth_choice = "Login"
 
@@ -454,37 +287,42 @@ if "auth_choice" not in st.session_state: # New session state for login/signup r
 
 # Always render the sidebar for logo and debug messages
 with st.sidebar:
-    # Use st.image directly for sidebar logo as it handles paths better
-    if os.path.exists("logo.png"):
-        st.image("logo.png", width=180) # Adjust width as needed
-    else:
+    try:
+        st.image(assets.image(LOGO_FILE, LOGO_MAX_SIZE), width=180) # Resized copy, built once
+    except OSError:
         st.error("Sidebar: Logo file 'logo.png' not found. Please ensure it's in the same directory.")
-        debug_print("Sidebar: Logo file 'logo.png' not found.")
+        instrument.note("Sidebar: Logo file 'logo.png' not found.")
     st.markdown("---") # Separator
 
-    # Debug messages will appear here
+    # Live metrics; debug messages and timings are in the Run Profile panel below
     if DEBUG_MODE:
-        st.subheader("Debug Messages")
+        import memo
+        import aggregates
+        import charts
+        import filters
+        st.subheader("Debug Metrics")
+        with st.expander("DB pool metrics"):
+            try:
+                st.json(db.pool_metrics())
+            except Exception as e:
+                st.write(f"Pool unavailable: {e}")
+        with st.expander("Cache metrics"):
+            st.json({"user_cache": memo.user_cache.stats(),
+                     "prepared_frames": aggregates.prepared_cache.stats(),
+                     "file_aggregates": aggregates.aggregates_cache.stats(),
+                     "figures": charts.figure_cache.stats(),
+                     "filter_indexes": filters.index_cache.stats(),
+                     "filtered_aggregates": filters.filtered_cache.stats()})
 
 
 # If not authenticated, show the full-page login/signup
 if not st.session_state.authenticated:
-    debug_print("User not authenticated. Displaying full-page login/signup.")
-
-    # Get Base64 encoded logo for embedding in HTML
-    logo_base64 = get_image_base64("logo.png")
-    logo_html_tag = ""
-    if logo_base64:
-        logo_html_tag = f"<img src='data:image/png;base64,{logo_base64}' alt='BizPulse Logo'>"
-    else:
-        # If Base64 conversion failed, display a text fallback or error
-        logo_html_tag = "<div style='color: red; font-weight: bold;'>Logo Missing</div>"
-
+    instrument.note("User not authenticated. Displaying full-page login/signup.")
 
     st.markdown(f"""
         <div class="login-container">
             <div class="header-logo">
-                {logo_html_tag}
+                {logo_html_tag()}
                 <h1>BizPulse Analytics</h1>
             </div>
             <p style="font-size: 1.1rem; color: #555; margin-bottom: 30px;">
@@ -538,26 +376,18 @@ if not st.session_state.authenticated:
                     st.error("Username and password cannot be empty.")
     # No st.stop() here, so the script continues if authenticated, otherwise it will display the login/signup forms.
 else: # User is authenticated
-    debug_print(f"User {st.session_state.user} is authenticated. Rendering main application.")
+    instrument.note(f"User {st.session_state.user} is authenticated. Rendering main application.")
 
     # Main Header and Navigation for Authenticated Users
-    # Get Base64 encoded logo for embedding in HTML
-    logo_base64 = get_image_base64("logo.png")
-    logo_html_tag = ""
-    if logo_base64:
-        logo_html_tag = f"<img src='data:image/png;base64,{logo_base64}' alt='BizPulse Logo'>"
-    else:
-        logo_html_tag = "<div style='color: red; font-weight: bold;'>Logo Missing</div>"
-
-
     st.markdown(f"""
         <div class='header-logo'>
-            {logo_html_tag}
+            {logo_html_tag()}
             <h1>BizPulse Analytics</h1>
         </div>
     """, unsafe_allow_html=True)
 
     # Main Navigation Menu (Horizontal)
+    from streamlit_option_menu import option_menu
     st.session_state.current_page = option_menu(
         menu_title=None, # No title for a cleaner horizontal menu
         options=["📊 Dashboard", "➕ Upload Data", "💡 Feedback", "🔐 Logout"],
@@ -577,7 +407,7 @@ else: # User is authenticated
 
     # Handle logout directly from menu selection
     if st.session_state.current_page == "🔐 Logout":
-        debug_print("Logout selected from main menu.")
+        instrument.note("Logout selected from main menu.")
         st.session_state.authenticated = False
         st.session_state.user = None
         st.session_state.current_page = "Login" # Reset to Login state
@@ -586,18 +416,26 @@ else: # User is authenticated
 
     # --- Dashboard Page ---
     if st.session_state.current_page == "📊 Dashboard":
-        debug_print("Displaying Dashboard page.")
+        instrument.note("Displaying Dashboard page.")
+        # Analytics modules load on the first dashboard visit, not at login
+        import pandas as pd
+        from streamlit_card import card
+        import aggregates
+        import cumulative
+        import filters
+        import jobs
+        import storage
+        import upload_cache
         st.subheader("📌 Key Metrics")
-        logs = get_logs_cached(st.session_state.user) # Use cached version
+        total_uploads, latest = get_upload_summary_cached(st.session_state.user) # Use cached version
 
-        total_uploads = len(logs)
         last_upload_info = "N/A"
-        if logs:
+        if latest:
             try:
                 # Format datetime object nicely if it's a datetime object
-                last_upload_info = f"{logs[0][0]} @ {logs[0][1].strftime('%Y-%m-%d %H:%M:%S')}"
+                last_upload_info = f"{latest[0]} @ {latest[1].strftime('%Y-%m-%d %H:%M:%S')}"
             except AttributeError: # If it's already a string or other format
-                last_upload_info = f"{logs[0][0]} @ {str(logs[0][1])}"
+                last_upload_info = f"{latest[0]} @ {str(latest[1])}"
         
         cols = st.columns(3) # Use 3 columns for better layout
         with cols[0]:
@@ -625,78 +463,180 @@ else: # User is authenticated
         st.markdown("---")
         st.subheader("Sales Data Visualizations")
 
-        if logs:
-            fn = logs[0][0]
-            user_upload_dir = os.path.join("uploads", st.session_state.user)
-            file_path = os.path.join(user_upload_dir, fn)
+        analysis_scope = st.radio(
+            "Analyze",
+            ["Latest upload", "All uploads", "Compare uploads"],
+            key="analysis_scope",
+            horizontal=True
+        )
 
-            if os.path.exists(file_path):
+        if latest and analysis_scope == "All uploads":
+            user_upload_dir = storage.user_dir(st.session_state.user)
+            try:
+                total = cumulative.load_total(user_upload_dir)
+                if total is None:
+                    # Uploads made before the cumulative store existed: fold them in once
+                    with st.spinner("Combining your past uploads..."):
+                        skipped = cumulative.sync(user_upload_dir, storage.user_files(st.session_state.user))
+                    if skipped:
+                        st.warning(f"Skipped files that cannot be analyzed: {', '.join(skipped)}")
+                    total = cumulative.load_total(user_upload_dir)
+                if total is None:
+                    st.info("None of your uploads can be analyzed yet.")
+                else:
+                    from visualizer import show_visuals
+                    with instrument.span("show_visuals"):
+                        show_visuals(total, cache_key=("cumulative", st.session_state.user, cumulative.revision(user_upload_dir)))
+            except Exception as e:
+                st.error(f"Error building analytics across all uploads: {e}")
+        elif latest and analysis_scope == "Compare uploads":
+            import compare
+            files = storage.user_files(st.session_state.user) # oldest first
+            filenames = list(files)
+            selected = st.multiselect("Uploads to compare", filenames, default=filenames[-2:],
+                                      max_selections=compare.MAX_COMPARE_FILES, key="compare_files")
+            selected = [name for name in filenames if name in selected] # keep upload order
+            if len(selected) < 2:
+                st.info("Select at least two uploads to compare.")
+            else:
+                try:
+                    with st.spinner("Loading uploads..."), instrument.span("compare"):
+                        loaded, failed = compare.load_many({name: files[name] for name in selected})
+                    for name, error in failed.items():
+                        st.warning(f"Skipped '{name}': {error}")
+                    if len(loaded) < 2:
+                        st.info("At least two of the selected uploads must be analyzable to compare them.")
+                    else:
+                        from visualizer import show_comparison
+                        with instrument.span("show_comparison"):
+                            show_comparison(loaded, cache_key=("compare", st.session_state.user) + tuple(
+                                upload_cache.content_hash(files[name]) for name in loaded))
+                except Exception as e:
+                    st.error(f"Error comparing uploads: {e}")
+        elif latest:
+            fn = latest[0]
+            file_path = storage.upload_path(st.session_state.user, fn)
+
+            running_job = jobs.active_job_for(file_path)
+            if running_job is not None and not aggregates.is_computed(file_path):
+                st.info(f"⏳ '{fn}' is still being processed ({running_job.stage}, {running_job.progress:.0%}). Refresh in a moment to see its analytics.")
+            elif os.path.exists(file_path):
                 try:
+                    # Summaries are computed once per file content; reruns only read the small cube
+                    with instrument.span("aggregates"):
+                        aggs = aggregates.get_aggregates(file_path)
+                    figure_key = upload_cache.content_hash(file_path)
+                    # Filters answer from an in-memory index, not by re-cleaning the file
+                    if filters.supports(file_path):
+                        aggs, figure_key = show_filters(file_path, aggs, figure_key)
                     # Assuming visualizer.py exists and has show_visuals function
                     try:
                         from visualizer import show_visuals
-                        df = pd.read_csv(file_path)
-                        show_visuals(df) # Call the visualization function
+                        with instrument.span("show_visuals"):
+                            # Figures are cached per user too, like the data they are built from
+                            show_visuals(aggs, cache_key=(st.session_state.user, figure_key)) # Call the visualization function
                     except ImportError:
                         st.error("Cannot display visualizations: 'visualizer.py' or 'show_visuals' function not found.")
-                        st.dataframe(pd.read_csv(file_path).head()) # Show raw data head as fallback
+                        st.dataframe(upload_cache.preview(file_path)) # Show raw data head as fallback
                     except Exception as e:
                         st.error(f"Error displaying visualizations from '{fn}': {e}. Please check your 'visualizer.py' code.")
-                        st.dataframe(pd.read_csv(file_path).head()) # Show raw data head as fallback
+                        st.dataframe(upload_cache.preview(file_path)) # Show raw data head as fallback
+                except ValueError as e:
+                    st.error(f"Cannot analyze '{fn}': {e}")
+                    st.dataframe(upload_cache.preview(file_path)) # Show raw data head as fallback
                 except Exception as e:
-                    st.error(f"Error loading CSV file '{fn}': {e}. Please ensure the CSV file is correctly formatted.")
+                    st.error(f"Error loading file '{fn}': {e}. Please ensure the file is correctly formatted.")
             else:
                 st.warning(f"File '{fn}' not found in your uploads. It might have been moved or deleted. Please re-upload your sales CSV file to see analytics.")
         else:
             st.info("📤 Please upload your sales CSV file to see analytics.")
 
+        # Older uploads are fetched a page at a time (keyset pagination), never all at once
+        if latest:
+            with st.expander("🗂️ Upload History"):
+                if "history_cursors" not in st.session_state:
+                    st.session_state.history_cursors = [None] # cursor of each page visited
+                try:
+                    rows, next_cursor = db.upload_history(st.session_state.user, before=st.session_state.history_cursors[-1])
+                    st.table(pd.DataFrame([(r[1], r[2]) for r in rows], columns=["File", "Uploaded At"]))
+                    prev_col, next_col = st.columns(2)
+                    if len(st.session_state.history_cursors) > 1 and prev_col.button("← Newer", key="history_newer"):
+                        st.session_state.history_cursors.pop()
+                        st.rerun()
+                    if next_cursor is not None and next_col.button("Older →", key="history_older"):
+                        st.session_state.history_cursors.append(next_cursor)
+                        st.rerun()
+                except Exception as e:
+                    st.error(f"Could not load upload history: {e}")
+
     # --- Upload Data Page ---
     elif st.session_state.current_page == "➕ Upload Data":
-        debug_print("Displaying Upload Data page.")
+        instrument.note("Displaying Upload Data page.")
+        import jobs
+        import memo
+        import storage
+        import upload_cache
+        import validation
         st.header("📁 Upload New Sales Data")
-        st.info("Ensure your CSV includes: Order Date, Customer ID, Product, Category, Quantity, Unit Price.")
-        f = st.file_uploader("Upload CSV", type=["csv"], key="csv_uploader")
+        st.info("Ensure your CSV or Excel sheet includes: Order Date, Customer ID, Product, Category, Quantity, Unit Price.")
+        f = st.file_uploader("Upload CSV or Excel", type=["csv", "xlsx"], key="csv_uploader")
 
-        if f:
+        # The uploader keeps its file across reruns; only handle each upload once
+        upload_id = (getattr(f, "file_id", None) or (f.name, f.size)) if f else None
+        if f and st.session_state.get("last_upload_id") != upload_id:
             uid = st.session_state.user
             fn = f.name
 
-            # Create user-specific upload directory if it doesn't exist
-            upload_dir = os.path.join("uploads", uid)
-            os.makedirs(upload_dir, exist_ok=True)
-
-            file_path = os.path.join(upload_dir, fn)
-
-            # Check if file with same name already exists
-            if os.path.exists(file_path):
-                st.warning(f"File '{fn}' already exists. Uploading will overwrite it.")
-
-            try:
-                # Save the uploaded file
-                with open(file_path, "wb") as out_file:
-                    out_file.write(f.getbuffer())
-
-                # Log file upload to database
-                if log_file(uid, fn):
-                    st.success("✅ File uploaded and saved!")
-                    # Invalidate cache for logs so dashboard updates
-                    get_logs_cached.clear()
-                else:
-                    st.error("Failed to log file upload to database.")
+            # Header and a row sample are checked before anything is saved or logged
+            with instrument.span("upload:validate"):
+                report = validation.validate_upload(f, fn)
+            for issue in report.warnings:
+                st.warning(f"{fn}: {issue.message}")
+            if not report.ok:
+                st.session_state.last_upload_id = upload_id
+                st.error(f"'{fn}' was not uploaded:\n" + "\n".join(f"- {issue.message}" for issue in report.errors))
+            else:
+                try:
+                    # Stored once per content: streamed to the object store while hashing
+                    previous = db.upload_file_hash(uid, fn)
+                    with instrument.span("upload:save"):
+                        digest, file_path, size, _ = storage.store(f, fn, uid)
+                    instrument.count("upload_bytes", size)
+                    if previous == digest:
+                        st.info(f"'{fn}' is identical to the version you already uploaded; nothing to re-process.")
+                    elif previous is not None:
+                        st.warning(f"File '{fn}' already exists. This upload replaces it.")
+
+                    # Log the upload and map the filename to its content. Without that record the
+                    # file is not processed and the upload is not marked handled, so the next
+                    # rerun tries again.
+                    if not log_file(uid, fn, digest, size):
+                        st.error("Failed to log file upload to database.")
+                    else:
+                        st.success("✅ File uploaded and saved!" if previous == digest
+                                   else "✅ File uploaded and saved! Processing continues in the background.")
+                        # Invalidate only this user's cached data so their dashboard updates
+                        memo.invalidate_user(uid)
+
+                        # Content this user uploaded before is already aggregated; the job then only
+                        # merges it into their all-uploads totals
+                        if previous != digest:
+                            jobs.submit_upload(uid, file_path, fn)
+                        st.session_state.last_upload_id = upload_id
+
+                        st.subheader("Preview of Uploaded Data:")
+                        st.dataframe(upload_cache.preview(file_path)) # Reads only the first rows
+                        st.balloons()
+                except Exception as e:
+                    # Objects are shared by the user's filenames with that content, so one is never removed here
+                    st.error(f"Error processing uploaded file: {e}")
+                    st.info("Please ensure the uploaded file is a valid CSV or .xlsx workbook.")
 
-                st.subheader("Preview of Uploaded Data:")
-                df = pd.read_csv(file_path) # Read again to display preview
-                st.dataframe(df.head())
-                st.balloons()
-            except Exception as e:
-                st.error(f"Error processing uploaded CSV: {e}")
-                if os.path.exists(file_path):
-                    os.remove(file_path) # Clean up partially uploaded/corrupted file
-                st.info("Please ensure the uploaded file is a valid CSV.")
+        show_upload_jobs(st.session_state.user)
 
     # --- Feedback Page ---
     elif st.session_state.current_page == "💡 Feedback":
-        debug_print("Displaying Feedback page.")
+        instrument.note("Displaying Feedback page.")
         st.header("💬 Send Us Feedback")
         st.write("We'd love to hear from you! Your feedback helps us improve.")
         with st.form("feedback_form", clear_on_submit=True): # clear_on_submit makes it interactive
@@ -709,10 +649,10 @@ else: # User is authenticated
                     # In a real application, you would save this feedback to a database or service.
                     # For this example, we just show a success message.
                     st.success("Thank you for your feedback! We appreciate it.")
-                    debug_print("Feedback submitted.")
+                    instrument.note("Feedback submitted.")
                 else:
                     st.error("Please fill in both your name and message.")
-                    debug_print("Feedback submission failed: Name or message empty.")
+                    instrument.note("Feedback submission failed: Name or message empty.")
 
         # Removed Lottie animation code:
         # lottie_animation_data = load_lottie("analytics.json")
@@ -721,3 +661,10 @@ else: # User is authenticated
         # else:
         #     st.warning("Lottie animation could not be loaded. Check 'analytics.json' file and its path.")
         #     debug_print("Lottie animation data is None.")
+
+# --- Profiling Panel ---
+# Rendered last so it covers the whole run (runs that end in st.rerun() are skipped)
+run_trace = instrument.finish_run()
+if run_trace is not None:
+    with st.sidebar:
+        show_profile_panel(run_trace)
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+import instrument
+import storage
+
+from data_processor import read_sales_file
+
+# Each user's upload directory gets a hidden cache folder holding typed columnar
+# copies of their CSVs, named by the SHA-256 of the CSV content:
+#   uploads/<user>/.cache/<sha256>.parquet
+# plus an index.json mapping filename -> {size, mtime_ns, hash} so an unchanged
+# file is never re-hashed or re-parsed on a Streamlit rerun. Anything else derived
+# from that content (see aggregates.py) is stored alongside as <sha256>.<kind>
+# and is removed together with the sidecar. Uploads in the content-addressed store
+# (storage.py) keep theirs in uploads/<user>/.objects/<aa>/.cache/, shared by the
+# user's filenames with that content; their hash is read from the object's name.
+CACHE_DIR_NAME = ".cache"
+INDEX_FILE = "index.json"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_index_lock = threading.Lock()
+
+
+def _cache_dir(file_path):
+    return os.path.join(os.path.dirname(file_path), CACHE_DIR_NAME)
+
+
+def sidecar_path(file_path, digest, kind="parquet"):
+    return os.path.join(_cache_dir(file_path), f"{digest}.{kind}")
+
+
+def cache_key(file_path, digest):
+    """Key for in-memory caches of data derived from an upload: the content hash
+    within its cache directory, so identical content is only shared where its
+    on-disk caches are (i.e. within one user's uploads, see storage.py)."""
+    return _cache_dir(file_path), digest
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    write_json(index, os.path.join(cache_dir, INDEX_FILE))
+
+
+def file_hash(file_path):
+    """Returns the SHA-256 hex digest of a file, read in fixed-size blocks."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def content_hash(file_path):
+    """Returns the content hash of an upload, re-hashing only when size/mtime changed."""
+    digest = storage.digest_of(file_path)
+    if digest is not None:
+        return digest # content-addressed: the name is the hash
+    st_info = os.stat(file_path)
+    cache_dir = _cache_dir(file_path)
+    name = os.path.basename(file_path)
+    with _index_lock:
+        index = _read_index(cache_dir)
+        entry = index.get(name)
+        if entry and entry["size"] == st_info.st_size and entry["mtime_ns"] == st_info.st_mtime_ns:
+            return entry["hash"]
+
+    digest = file_hash(file_path)
+    with _index_lock:
+        index = _read_index(cache_dir)
+        old = index.get(name)
+        index[name] = {"size": st_info.st_size, "mtime_ns": st_info.st_mtime_ns, "hash": digest}
+        _write_index(cache_dir, index)
+    if old and old["hash"] != digest:
+        _remove_orphan_sidecar(file_path, old["hash"], index)
+    return digest
+
+
+def get_file_meta(file_path, key, default=None):
+    """Reads a value recorded for the current content of an upload (e.g. its date format)."""
+    cache_dir = _cache_dir(file_path)
+    with _index_lock:
+        entry = _read_index(cache_dir).get(os.path.basename(file_path), {})
+    return entry.get("meta", {}).get(key, default)
+
+
+def set_file_meta(file_path, **values):
+    """Records values for an upload's current content; they are dropped when the file changes."""
+    digest = content_hash(file_path) # make sure the index entry matches the file on disk
+    cache_dir = _cache_dir(file_path)
+    name = os.path.basename(file_path)
+    with _index_lock:
+        index = _read_index(cache_dir)
+        index.setdefault(name, {"hash": digest}).setdefault("meta", {}).update(values)
+        _write_index(cache_dir, index)
+
+
+def _remove_orphan_sidecar(file_path, digest, index):
+    # Another filename may hold identical content, so only drop unreferenced sidecars
+    if any(entry["hash"] == digest for entry in index.values()):
+        return
+    cache_dir = _cache_dir(file_path)
+    for name in os.listdir(cache_dir):
+        if name.startswith(f"{digest}."):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def invalidate(file_path):
+    """Forgets the cached hash/sidecar for a file that is about to be (or was) overwritten."""
+    cache_dir = _cache_dir(file_path)
+    name = os.path.basename(file_path)
+    with _index_lock:
+        index = _read_index(cache_dir)
+        old = index.pop(name, None)
+        if old is None:
+            return
+        _write_index(cache_dir, index)
+    _remove_orphan_sidecar(file_path, old["hash"], index)
+
+
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_json(obj, path):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def write_frame(df, path):
+    """Atomically writes a frame as Parquet (readers never see a partial file)."""
+    tmp_path = _tmp_path(path)
+    try:
+        df.to_parquet(tmp_path, index=False)
+    except (ValueError, TypeError, ArithmeticError):
+        # Mixed-type object columns (e.g. numbers and text in one column) cannot be
+        # stored as a typed Arrow column; keep them as strings instead.
+        fixed = df.copy()
+        for col in fixed.columns[fixed.dtypes == object]:
+            fixed[col] = fixed[col].astype("string")
+        fixed.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+@instrument.timed("file_load")
+def load_upload(file_path):
+    """Loads an uploaded CSV or .xlsx file, parsing it at most once per distinct content.
+
+    The first load parses the file and writes a Parquet sidecar; every later load
+    (including other sessions and the error-path fallbacks) reads the sidecar.
+    Falls back to re-reading the upload if Parquet support (pyarrow) is unavailable.
+    """
+    digest = content_hash(file_path)
+    sidecar = sidecar_path(file_path, digest)
+    if os.path.exists(sidecar):
+        try:
+            return pd.read_parquet(sidecar)
+        except ImportError:
+            return read_sales_file(file_path)
+        except Exception:
+            os.remove(sidecar)  # corrupt/partial sidecar: rebuild below
+
+    df = read_sales_file(file_path)
+    try:
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        write_frame(df, sidecar)
+    except ImportError:
+        pass
+    return df
+
+
+def preview(file_path, rows=5):
+    """Returns the first rows of an upload without parsing the whole file.
+
+    From the sidecar only the first record batch is decoded, not the whole frame.
+    """
+    digest = content_hash(file_path)
+    sidecar = sidecar_path(file_path, digest)
+    if os.path.exists(sidecar):
+        try:
+            import pyarrow.parquet as pq
+            return next(pq.ParquetFile(sidecar).iter_batches(batch_size=rows)).to_pandas()
+        except Exception:
+            pass
+    return read_sales_file(file_path, nrows=rows)
@@ -0,0 +1,148 @@
+import pandas as pd
+
+import excel_reader
+from data_processor import (CUSTOMER_ID_COL, ORDER_DATE_COL, PRODUCT_COL, QUANTITY_COL, UNIT_PRICE_COL,
+                            detect_date_format, normalize_columns, parse_dates, to_numeric_fast)
+
+# Up-front upload validation. Only the header and the first SAMPLE_ROWS rows are
+# read (from the uploaded bytes, before anything is saved, logged or queued), so a
+# file that cannot be analyzed is rejected in milliseconds whatever its size.
+# Headers are mapped to canonical names with data_processor.normalize_columns, the
+# same mapping cleaning uses, so validation and the dashboard agree on the schema.
+SAMPLE_ROWS = 1000
+MIN_PARSEABLE_SHARE = 0.5 # below this share of parseable sample values the column is rejected
+
+ERROR, WARNING = "error", "warning"
+
+# Issue codes
+UNREADABLE = "unreadable"
+EMPTY = "empty"
+DUPLICATE_COLUMN = "duplicate_column"
+MISSING_COLUMN = "missing_column"
+NOT_NUMERIC = "not_numeric"
+BAD_DATES = "bad_dates"
+
+REVENUE_COLUMNS = [QUANTITY_COL, UNIT_PRICE_COL] # without these nothing can be computed
+OPTIONAL_COLUMNS = [ORDER_DATE_COL, PRODUCT_COL, CUSTOMER_ID_COL] # only some charts need these
+
+
+class Issue:
+    """One validation finding. `code` is one of the constants above; `column` is
+    the canonical column it concerns, if any."""
+
+    def __init__(self, severity, code, message, column=None):
+        self.severity = severity
+        self.code = code
+        self.message = message
+        self.column = column
+
+    def __repr__(self):
+        return f"Issue({self.severity!r}, {self.code!r}, {self.message!r})"
+
+
+class ValidationReport:
+    """Result of validating an upload's header and row sample."""
+
+    def __init__(self, column_map=None, rows_sampled=0, issues=None):
+        self.column_map = column_map or {} # original header -> canonical name
+        self.rows_sampled = rows_sampled
+        self.issues = issues or []
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == ERROR]
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue.severity == WARNING]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def summary(self):
+        return " ".join(issue.message for issue in self.errors)
+
+
+def _parse_share(parsed, values):
+    present = values.notna()
+    return float(parsed[present].notna().mean()) if present.any() else 0.0
+
+
+def validate_frame(sample):
+    """Validates a raw sample frame (header as read, values unparsed)."""
+    column_map = normalize_columns(sample.columns)
+    report = ValidationReport(column_map, len(sample))
+    issues = report.issues
+
+    if not len(sample.columns):
+        issues.append(Issue(ERROR, EMPTY, "The file has no header row."))
+        return report
+    canonical = pd.Series(list(column_map.values()))
+    for name in canonical[canonical.duplicated()].unique():
+        originals = [col for col, mapped in column_map.items() if mapped == name]
+        issues.append(Issue(ERROR, DUPLICATE_COLUMN,
+                            f"Columns {', '.join(repr(str(c)) for c in originals)} all mean '{name}'; keep only one.", name))
+    if issues:
+        return report
+
+    sample = sample.rename(columns=column_map)
+    for col in REVENUE_COLUMNS:
+        if col not in sample.columns:
+            issues.append(Issue(ERROR, MISSING_COLUMN, f"Missing required column '{col}'.", col))
+    missing = [col for col in OPTIONAL_COLUMNS if col not in sample.columns]
+    if missing:
+        issues.append(Issue(WARNING, MISSING_COLUMN,
+                            f"Missing expected columns: {', '.join(missing)}. Charts that need them are skipped."))
+    if not len(sample):
+        issues.append(Issue(ERROR, EMPTY, "The file has a header but no data rows."))
+    if report.errors:
+        return report
+
+    for col in REVENUE_COLUMNS:
+        share = _parse_share(to_numeric_fast(sample[col]), sample[col])
+        if share < MIN_PARSEABLE_SHARE:
+            issues.append(Issue(ERROR, NOT_NUMERIC, f"Column '{col}' is not numeric ({share:.0%} of sampled values are numbers).", col))
+        elif share < 1.0:
+            issues.append(Issue(WARNING, NOT_NUMERIC, f"About {1 - share:.0%} of '{col}' values are not numbers; those rows are skipped.", col))
+    if ORDER_DATE_COL in sample.columns:
+        dates = sample[ORDER_DATE_COL]
+        date_format = detect_date_format(dates)
+        # Without a detected format, "mixed" parses per value like cleaning's fallback, without the warning
+        parsed = parse_dates(dates, date_format) if date_format else pd.to_datetime(dates, format="mixed", errors="coerce")
+        share = _parse_share(parsed, dates)
+        if share < MIN_PARSEABLE_SHARE:
+            issues.append(Issue(ERROR, BAD_DATES, f"Column '{ORDER_DATE_COL}' has no recognizable dates ({share:.0%} of sampled values parse).", ORDER_DATE_COL))
+        elif share < 1.0:
+            issues.append(Issue(WARNING, BAD_DATES, f"About {1 - share:.0%} of '{ORDER_DATE_COL}' values are not dates; those rows are skipped.", ORDER_DATE_COL))
+    return report
+
+
+def read_sample(source, name=None, rows=SAMPLE_ROWS):
+    """The header and first `rows` rows of a CSV or .xlsx upload (path or file object).
+
+    File objects are rewound afterwards so they can still be saved.
+    Raises ValueError if the file cannot be parsed.
+    """
+    name = name or str(source)
+    try:
+        if excel_reader.is_excel(name):
+            return excel_reader.read_sales_excel(source, nrows=rows)
+        try:
+            return pd.read_csv(source, nrows=rows, dtype=str)
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame()
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise ValueError(f"The file is not a readable CSV: {e}") from None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+def validate_upload(source, name=None, rows=SAMPLE_ROWS):
+    """Validates an upload from its header and a row sample; returns a ValidationReport."""
+    try:
+        sample = read_sample(source, name, rows)
+    except ValueError as e:
+        return ValidationReport(issues=[Issue(ERROR, UNREADABLE, str(e))])
+    return validate_frame(sample)
@@ -1,124 +1,172 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 
-def show_visuals(df: pd.DataFrame):
-    st.header("📊 Business Performance Dashboard")
+import charts
+import cohorts
+import instrument
+from aggregates import GRANULARITIES
 
-    # --- Debugging Column Names ---
-    # Convert column names to a list and print for debugging
-    st.sidebar.subheader("DEBUG: DataFrame Columns")
-    st.sidebar.write(df.columns.tolist())
-
-    # --- Clean Column Names ---
-    # Strip whitespace from column names and convert to a consistent case (e.g., Title Case)
-    df.columns = df.columns.str.strip()
-    df.columns = df.columns.str.title() # Convert to Title Case for consistency
-
-    st.sidebar.subheader("DEBUG: Cleaned DataFrame Columns")
-    st.sidebar.write(df.columns.tolist())
-
-    # Define expected column names after cleaning
-    unit_price_col = "Unit Price"
-    quantity_col = "Quantity"
-    order_date_col = "Order Date"
-    product_col = "Product"
-    customer_id_col = "Customer Id" # Assuming "Customer ID" becomes "Customer Id" after .title()
-    region_col = "Region"
-
-    # --- Calculate Total Revenue ---
-    # Ensure 'Unit Price' and 'Quantity' columns exist and are numeric
-    if unit_price_col in df.columns and quantity_col in df.columns:
-        try:
-            # Clean numeric columns: remove non-numeric characters (like currency symbols)
-            # and then convert to numeric.
-            # This regex removes anything that is not a digit or a decimal point.
-            df[unit_price_col] = df[unit_price_col].astype(str).str.replace(r'[^\d.]', '', regex=True)
-            df[quantity_col] = df[quantity_col].astype(str).str.replace(r'[^\d.]', '', regex=True)
-
-            df[unit_price_col] = pd.to_numeric(df[unit_price_col], errors='coerce')
-            df[quantity_col] = pd.to_numeric(df[quantity_col], errors='coerce')
-
-            # Drop rows where conversion to numeric failed for these columns
-            initial_rows = len(df)
-            df.dropna(subset=[unit_price_col, quantity_col], inplace=True)
-            if len(df) < initial_rows:
-                st.warning(f"Removed {initial_rows - len(df)} rows due to non-numeric 'Unit Price' or 'Quantity' values.")
-
-            df["Total Revenue"] = df[unit_price_col] * df[quantity_col]
-            st.success("✅ 'Total Revenue' calculated successfully!")
-        except Exception as e:
-            st.error(f"Error calculating 'Total Revenue'. Please ensure '{unit_price_col}' and '{quantity_col}' columns contain valid numbers: {e}")
-            return # Stop execution if calculation fails
-    else:
-        st.error(f"Missing '{unit_price_col}' or '{quantity_col}' column in the uploaded CSV. Cannot calculate 'Total Revenue'.")
-        return # Stop execution if essential columns are missing
-
-    # Clean and process 'Order Date'
-    if order_date_col in df.columns:
-        df[order_date_col] = pd.to_datetime(df[order_date_col], errors="coerce")
-        df.dropna(subset=[order_date_col], inplace=True) # Drop rows where date conversion failed
-        df["Month"] = df[order_date_col].dt.to_period("M").astype(str)
-    else:
-        st.warning(f"'{order_date_col}' column not found. Monthly Revenue Trend might be affected.")
-        # Create a dummy 'Month' if not present to avoid errors in groupby
-        df["Month"] = "Unknown"
+from data_processor import CUSTOMER_ID_COL, PRODUCT_COL, REGION_COL, UNIT_PRICE_COL, QUANTITY_COL, ORDER_DATE_COL
+
+TREND_TICK_FORMATS = {"Daily": "%d %b %Y", "Weekly": "%d %b %Y", "Monthly": "%b %Y"}
+TREND_PERIOD_LABELS = {"Daily": "Day", "Weekly": "Week starting", "Monthly": "Month"}
 
+def show_visuals(aggs, cache_key=None):
+    """Render stage of the dashboard: draws charts from precomputed aggregates.
+
+    Cleaning happens earlier in the pure data_processor.prepare() stage, whose
+    result is memoized per file hash (see aggregates.get_prepared/get_aggregates).
+    Nothing here modifies its input, and only the compact cube is touched, so
+    render time does not depend on how many raw rows the uploaded file has.
+
+    Chart data is capped by charts.py (LTTB for time series, "Other" for long
+    tails). `cache_key` identifies the data (e.g. the file's content hash); when
+    given, built figures are reused across reruns per (cache_key, chart, granularity).
+    """
+    st.header("📊 Business Performance Dashboard")
+
+    meta = aggs.meta
+    if meta.get("dropped_numeric"):
+        st.warning(f"Removed {meta['dropped_numeric']} rows due to non-numeric '{UNIT_PRICE_COL}' or '{QUANTITY_COL}' values.")
+    if meta.get("dropped_dates"):
+        st.warning(f"Removed {meta['dropped_dates']} rows with an unreadable '{ORDER_DATE_COL}'.")
 
     # ==== 1. Revenue Trend ====
-    st.subheader("📈 Monthly Revenue Trend")
-    if "Total Revenue" in df.columns and "Month" in df.columns:
-        monthly = df.groupby("Month")["Total Revenue"].sum().reset_index()
-        fig_line = px.line(monthly, x="Month", y="Total Revenue",
-                           markers=True, template="plotly_white",
-                           labels={"Total Revenue": "Revenue (₹)"})
-        st.plotly_chart(fig_line, use_container_width=True)
+    st.subheader("📈 Revenue Trend")
+    if meta.get("has_dates", True):
+        granularities = GRANULARITIES if aggs.daily is not None else ["Monthly"]
+        granularity = st.radio("Granularity", granularities, index=len(granularities) - 1,
+                               horizontal=True, key="trend_granularity")
+
+        def build_trend():
+            trend = charts.downsample_series(aggs.revenue_over_time(granularity), "Period", "Total Revenue")
+            fig = px.line(trend, x="Period", y="Total Revenue",
+                          markers=len(trend) <= 60, template="plotly_white",
+                          labels={"Total Revenue": "Revenue (₹)", "Period": TREND_PERIOD_LABELS[granularity]})
+            fig.update_xaxes(tickformat=TREND_TICK_FORMATS[granularity], **({"dtick": "M1"} if granularity == "Monthly" else {}))
+            return fig
+
+        with instrument.span("chart:revenue_trend"):
+            fig_line = charts.cached_figure(_figure_key(cache_key, "trend", granularity), build_trend)
+            st.plotly_chart(fig_line, use_container_width=True)
     else:
-        st.info("Cannot generate Monthly Revenue Trend. 'Total Revenue' or 'Month' column missing.")
+        st.info(f"Cannot generate Monthly Revenue Trend. '{ORDER_DATE_COL}' column missing.")
 
     # ==== 2. Top Products ====
     st.subheader("🏆 Top 5 Products by Revenue")
-    if product_col in df.columns and "Total Revenue" in df.columns:
-        top_products = df.groupby(product_col)["Total Revenue"].sum().sort_values(ascending=False).head(5).reset_index()
-        fig_bar = px.bar(top_products, x=product_col, y="Total Revenue",
-                         color="Total Revenue", text_auto=True, template="plotly_white")
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if meta["has_product"]:
+        with instrument.span("chart:top_products"):
+            fig_bar = charts.cached_figure(
+                _figure_key(cache_key, "top_products"),
+                lambda: px.bar(aggs.top_products(5), x=PRODUCT_COL, y="Total Revenue",
+                               color="Total Revenue", text_auto=True, template="plotly_white"))
+            st.plotly_chart(fig_bar, use_container_width=True)
     else:
-        st.info(f"Cannot generate Top Products. '{product_col}' or 'Total Revenue' column missing.")
+        st.info(f"Cannot generate Top Products. '{PRODUCT_COL}' column missing.")
 
     # ==== 3. Region-wise Revenue ====
     st.subheader("📍 Revenue by Region")
-    if region_col in df.columns and "Total Revenue" in df.columns:
-        region_rev = df.groupby(region_col)["Total Revenue"].sum().reset_index()
-        fig_region = px.pie(region_rev, names=region_col, values="Total Revenue",
-                             template="plotly_white", title="Revenue Contribution by Region")
-        st.plotly_chart(fig_region, use_container_width=True)
+    if meta["has_region"]:
+        with instrument.span("chart:region_revenue"):
+            fig_region = charts.cached_figure(
+                _figure_key(cache_key, "region_revenue"),
+                lambda: px.pie(charts.top_n_with_other(aggs.region_revenue(), REGION_COL, "Total Revenue"),
+                               names=REGION_COL, values="Total Revenue",
+                               template="plotly_white", title="Revenue Contribution by Region"))
+            st.plotly_chart(fig_region, use_container_width=True)
     else:
-        st.info(f"'{region_col}' column not found in your data or 'Total Revenue' is missing. Skipping Region-wise Revenue visualization.")
+        st.info(f"'{REGION_COL}' column not found in your data. Skipping Region-wise Revenue visualization.")
 
 
     # ==== 4. New vs Repeat Customers ====
     st.subheader("👥 Customer Type Breakdown")
-    if customer_id_col in df.columns:
-        customer_counts = df[customer_id_col].value_counts()
-        new_customers = (customer_counts == 1).sum()
-        repeat_customers = (customer_counts > 1).sum()
-        fig_customers = px.pie(names=["New", "Repeat"], values=[new_customers, repeat_customers],
-                                template="plotly_white", title="New vs Repeat Customers")
-        st.plotly_chart(fig_customers, use_container_width=True)
+    if meta["has_customer"]:
+        def build_customers():
+            new_customers, repeat_customers = aggs.customer_split()
+            return px.pie(names=["New", "Repeat"], values=[new_customers, repeat_customers],
+                          template="plotly_white", title="New vs Repeat Customers")
+
+        with instrument.span("chart:customers"):
+            fig_customers = charts.cached_figure(_figure_key(cache_key, "customers"), build_customers)
+            st.plotly_chart(fig_customers, use_container_width=True)
+    else:
+        st.info(f"'{CUSTOMER_ID_COL}' column not found in your data. Skipping Customer Type Breakdown visualization.")
+
+
+    # ==== 5. Cohorts & RFM ====
+    st.subheader("🧭 Cohort Retention")
+    if aggs.activity is not None:
+        cohort_customers, cohort_matrix = aggs.cohort_state()
+
+        def build_retention():
+            retention, _ = cohorts.cohort_tables(cohort_matrix)
+            retention.index = retention.index.strftime("%b %Y")
+            return px.imshow(retention * 100, text_auto=".0f", aspect="auto", color_continuous_scale="Blues",
+                             labels={"x": "Months since first purchase", "y": "First purchase", "color": "Active (%)"},
+                             template="plotly_white")
+
+        def build_segments():
+            segments = cohorts.segment_summary(cohorts.rfm(cohort_customers))
+            return px.bar(segments, x="Segment", y="Customers", color="Total Revenue",
+                          text_auto=True, template="plotly_white", title="Customers by RFM Segment")
+
+        with instrument.span("chart:cohorts"):
+            fig_retention = charts.cached_figure(_figure_key(cache_key, "retention"), build_retention)
+            st.plotly_chart(fig_retention, use_container_width=True)
+            fig_segments = charts.cached_figure(_figure_key(cache_key, "rfm_segments"), build_segments)
+            st.plotly_chart(fig_segments, use_container_width=True)
     else:
-        st.info(f"'{customer_id_col}' column not found in your data. Skipping Customer Type Breakdown visualization.")
+        st.info(f"Cohorts need both '{CUSTOMER_ID_COL}' and '{ORDER_DATE_COL}'. Skipping Cohort Retention.")
 
 
-    # ==== 5. KPIs ====
+    # ==== 6. KPIs ====
     st.markdown("---")
     col1, col2 = st.columns(2)
-
-    if "Total Revenue" in df.columns:
-        avg_order_value = df["Total Revenue"].mean()
-        col1.metric("📦 Average Order Value", f"₹{avg_order_value:,.2f}")
-
-        col2.metric("📈 Total Revenue", f"₹{df['Total Revenue'].sum():,.0f}")
-    else:
-        st.info("Cannot display KPIs. 'Total Revenue' column missing.")
-
+    col1.metric("📦 Average Order Value", f"₹{aggs.average_order_value:,.2f}")
+    col2.metric("📈 Total Revenue", f"₹{aggs.total_revenue:,.0f}")
+
+
+def _figure_key(cache_key, chart, *variant):
+    return None if cache_key is None else (cache_key, chart) + variant
+
+
+def show_comparison(loaded, cache_key=None):
+    """Render stage of the comparison view: `loaded` maps upload names (oldest
+    first) to their Aggregates; deltas are between consecutive uploads."""
+    import compare
+    st.header("🔀 Upload Comparison")
+
+    summary = compare.period_summary(loaded)
+    st.dataframe(summary.style.format({
+        "Total Revenue": "₹{:,.0f}", "Orders": "{:,}", "Average Order Value": "₹{:,.2f}",
+        "Total Revenue Δ%": "{:+.1f}%", "Orders Δ%": "{:+.1f}%", "Average Order Value Δ%": "{:+.1f}%",
+    }, na_rep="—"), hide_index=True, use_container_width=True)
+
+    with instrument.span("chart:compare_revenue"):
+        fig_totals = charts.cached_figure(
+            _figure_key(cache_key, "compare_revenue"),
+            lambda: px.bar(summary, x="File", y="Total Revenue", text_auto=True, template="plotly_white",
+                           labels={"Total Revenue": "Revenue (₹)"}, title="Revenue per Upload"))
+        st.plotly_chart(fig_totals, use_container_width=True)
+
+    names = list(loaded)
+    for dimension, flag, icon in ((PRODUCT_COL, "has_product", "🏆"), (REGION_COL, "has_region", "📍")):
+        st.subheader(f"{icon} {dimension} Revenue by Upload")
+        if not any(aggs.meta[flag] for aggs in loaded.values()):
+            st.info(f"'{dimension}' column not found in the selected uploads.")
+            continue
+        table = compare.dimension_deltas(loaded, dimension)
+
+        def build_dimension(table=table, dimension=dimension):
+            top = table.head(charts.MAX_CATEGORIES)[names].rename_axis(dimension).reset_index()
+            long = top.melt(id_vars=dimension, var_name="File", value_name="Total Revenue")
+            return px.bar(long, x=dimension, y="Total Revenue", color="File", barmode="group",
+                          template="plotly_white", labels={"Total Revenue": "Revenue (₹)"})
+
+        with instrument.span(f"chart:compare_{dimension}"):
+            fig = charts.cached_figure(_figure_key(cache_key, "compare", dimension), build_dimension)
+            st.plotly_chart(fig, use_container_width=True)
+        if len(names) >= 2:
+            st.caption(f"Change from '{names[-2]}' to '{names[-1]}'")
+            st.dataframe(table[["Δ", "Δ%"]].style.format({"Δ": "₹{:+,.0f}", "Δ%": "{:+.1f}%"}, na_rep="new"),
+                         use_container_width=True)